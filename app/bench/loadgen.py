@@ -0,0 +1,415 @@
+# app/bench/loadgen.py
+import asyncio
+import logging
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Literal, Optional
+
+import cv2
+import httpx
+import numpy as np
+import psutil
+from pydantic import BaseModel, Field
+
+from app.cfg.config import BASE_DIR
+from app.core.frame_trace import latency_summary
+from app.core.video_source import SyntheticVideoSource
+
+API_PREFIX = "/api/detection"
+_BOUNDARY = b"--frame\r\n"
+
+
+class LoadConfig(BaseModel):
+    """HTTP 负载测试的参数。"""
+    url: Optional[str] = Field(None, description="目标服务地址，不填时在本机启动一个使用合成后端的 uvicorn 子进程")
+    source: Optional[str] = Field(None, description="视频源，不填时生成一段本地 MJPEG 视频文件")
+    churn_workers: int = Field(4, ge=0, description="并发执行 start → 观看 → stop 循环的工作协程数")
+    churn_hold_seconds: float = Field(1.0, ge=0.0, description="每个循环中观看画面的时长（秒）")
+    viewer_streams: int = Field(1, ge=0, description="为长连接观看者启动的视频流数")
+    viewers: int = Field(8, ge=0, description="长连接 MJPEG 观看者数（平均分配到各视频流）")
+    duration_seconds: float = Field(30.0, gt=0.0, description="施压时长（秒）")
+    inference_mode: Literal["sync", "pipelined", "scheduled"] = Field("pipelined", description="本地服务的推理模式")
+    latency_ms: float = Field(20.0, ge=0.0, description="本地服务合成后端的推理延迟（毫秒）")
+    video_fps: float = Field(15.0, gt=0.0, description="生成的视频文件帧率")
+    video_width: int = Field(640, ge=16, description="生成的视频文件帧宽")
+    video_height: int = Field(360, ge=16, description="生成的视频文件帧高")
+    settle_seconds: float = Field(10.0, ge=0.0, description="施压结束后等待线程与子进程回落的最长时间（秒）")
+    request_timeout_seconds: float = Field(15.0, gt=0.0, description="单个请求的超时时间（秒）")
+    keep_workdir: bool = Field(False, description="结束后保留临时工作目录（生成的视频文件与本地服务日志）")
+
+
+def make_sample_video(path: Path, seconds: float, fps: float, width: int, height: int) -> Path:
+    """用合成视频源的画面生成一段 MJPEG/AVI 文件，作为不依赖摄像头的本地文件源。"""
+    source = SyntheticVideoSource(f"synthetic://{width}x{height}@0?motion=0.1")
+    source.open()
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"无法创建视频文件: {path}")
+    try:
+        for _ in range(max(int(seconds * fps), 1)):
+            source.grab()
+            writer.write(source.retrieve()[1])
+    finally:
+        writer.release()
+        source.release()
+    return path
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class LocalServer:
+    """在子进程中启动真实的 FastAPI 应用（uvicorn + 合成推理后端），供负载测试使用。"""
+
+    def __init__(self, config: LoadConfig, log_path: Path):
+        self.config = config
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.log_path = log_path
+        self.process: Optional[subprocess.Popen] = None
+
+    def start(self, max_streams: int, timeout: float = 60.0):
+        env = {
+            **os.environ,
+            "HAILO__BACKEND": "synthetic",
+            "HAILO__SYNTHETIC_LATENCY_MS": str(self.config.latency_ms),
+            "APP__INFERENCE_MODE": self.config.inference_mode,
+            "APP__MAX_STREAMS": str(max_streams),
+            "LOGGING__LEVEL": os.environ.get("LOGGING__LEVEL", "WARNING"),
+        }
+        if self.config.inference_mode != "scheduled":
+            # 非调度模式下每路流独占一个模型实例
+            env["APP__MAX_CONCURRENT_TASKS"] = str(max_streams)
+        log = open(self.log_path, "wb")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(self.port),
+             "--log-level", "warning"],
+            cwd=BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+        log.close()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"本地服务启动失败（退出码 {self.process.returncode}），日志: {self.log_path}")
+            try:
+                if httpx.get(f"{self.url}{API_PREFIX}/health", timeout=1.0).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.5)
+        self.stop()
+        raise RuntimeError(f"本地服务在 {timeout:.0f}s 内未就绪，日志: {self.log_path}")
+
+    def resources(self) -> Dict[str, int]:
+        """
+        服务进程当前的线程数、（递归的）子进程数，以及共享线程池已创建的工作线程数。
+        共享线程池按需创建线程且不回收，其增长有上限，不算作泄漏。
+        """
+        process = psutil.Process(self.process.pid)
+        stats = httpx.get(f"{self.url}{API_PREFIX}/workers/stats", timeout=5.0).json()["data"]
+        return {"threads": process.num_threads(), "children": len(process.children(recursive=True)),
+                "pool_workers": sum(pool["workers"] for pool in stats["pools"].values())}
+
+    def stop(self, timeout: float = 20.0) -> Optional[int]:
+        """优雅关闭（SIGTERM，触发应用的关闭流程），超时后强制结束；返回退出码，强制结束时为 None。"""
+        if self.process is None or self.process.poll() is not None:
+            return self.process.returncode if self.process is not None else None
+        self.process.terminate()
+        try:
+            code = self.process.wait(timeout=timeout)
+            # uvicorn 完成优雅关闭后会重新抛出收到的信号
+            return 0 if code == -signal.SIGTERM else code
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+            return None
+
+
+class _Recorder:
+    """按端点记录请求耗时与失败。"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, Dict[str, int]] = {}
+
+    def ok(self, endpoint: str, seconds: float):
+        self.latencies.setdefault(endpoint, []).append(seconds)
+
+    def fail(self, endpoint: str, reason: str):
+        errors = self.errors.setdefault(endpoint, {})
+        errors[reason] = errors.get(reason, 0) + 1
+
+
+class LoadGenerator:
+    """
+    通过 HTTP 驱动真实服务：`churn_workers` 个协程反复 start → 打开画面直到首帧 → 观看片刻 → stop，
+    另有 `viewers` 个长连接观看者持续读取 MJPEG 画面。记录各请求耗时、首帧时间与每个观看者的实际帧率。
+    """
+
+    def __init__(self, config: LoadConfig, base_url: str, source: str):
+        self.config = config
+        self.base_url = base_url.rstrip("/") + API_PREFIX
+        self.source = source
+        self.recorder = _Recorder()
+        self.ttff: List[float] = []
+        self.viewer_results: List[dict] = []
+        self.cycles = 0
+
+    async def _start_stream(self, client: httpx.AsyncClient) -> Optional[str]:
+        started = time.monotonic()
+        try:
+            response = await client.post(f"{self.base_url}/streams/start", json={"source": self.source})
+        except httpx.HTTPError as e:
+            self.recorder.fail("start", type(e).__name__)
+            return None
+        if not response.is_success:
+            self.recorder.fail("start", f"HTTP {response.status_code}")
+            return None
+        self.recorder.ok("start", time.monotonic() - started)
+        return response.json()["data"]["stream_id"]
+
+    async def _stop_stream(self, client: httpx.AsyncClient, stream_id: str):
+        started = time.monotonic()
+        try:
+            response = await client.post(f"{self.base_url}/streams/stop/{stream_id}")
+        except httpx.HTTPError as e:
+            self.recorder.fail("stop", type(e).__name__)
+            return
+        if not response.is_success:
+            self.recorder.fail("stop", f"HTTP {response.status_code}")
+            return
+        self.recorder.ok("stop", time.monotonic() - started)
+
+    async def _watch(self, client: httpx.AsyncClient, stream_id: str, seconds: float) -> dict:
+        """读取 MJPEG 画面 `seconds` 秒（或直到流结束），按分隔符计数帧。"""
+        opened = time.monotonic()
+        deadline = opened + seconds
+        frames, first_at, last_at, tail, reason = 0, None, None, b"", "timeout"
+        try:
+            async with client.stream("GET", f"{self.base_url}/streams/feed/{stream_id}") as response:
+                if response.status_code != 200:
+                    return {"frames": 0, "error": f"HTTP {response.status_code}"}
+                async for chunk in response.aiter_bytes():
+                    now = time.monotonic()
+                    data = tail + chunk
+                    count = data.count(_BOUNDARY)
+                    if count:
+                        frames += count
+                        first_at = first_at or now
+                        last_at = now
+                    tail = data[-(len(_BOUNDARY) - 1):]
+                    if now >= deadline:
+                        break
+                else:
+                    reason = "ended"
+        except httpx.HTTPError as e:
+            reason = type(e).__name__
+        span = (last_at - first_at) if first_at is not None and last_at is not None else 0.0
+        return {
+            "frames": frames,
+            "ttff_ms": round((first_at - opened) * 1000, 2) if first_at is not None else None,
+            "fps": round((frames - 1) / span, 2) if frames > 1 and span > 0 else 0.0,
+            "closed_by": reason,
+        }
+
+    async def _churn_worker(self, client: httpx.AsyncClient, deadline: float):
+        while time.monotonic() < deadline:
+            stream_id = await self._start_stream(client)
+            if stream_id is None:
+                await asyncio.sleep(0.5)
+                continue
+            watched = await self._watch(client, stream_id, self.config.churn_hold_seconds)
+            if watched.get("ttff_ms") is not None:
+                self.ttff.append(watched["ttff_ms"] / 1000)
+            else:
+                self.recorder.fail("feed", watched.get("error") or "no frame")
+            await self._stop_stream(client, stream_id)
+            self.cycles += 1
+
+    async def _viewer(self, client: httpx.AsyncClient, stream_id: str, seconds: float):
+        result = await self._watch(client, stream_id, seconds)
+        self.viewer_results.append({"stream_id": stream_id, **result})
+
+    async def churn_round(self):
+        """预热：以满并发执行一轮循环，使服务端的线程池等惰性资源在测量基线之前达到稳态。"""
+        async with self._client() as client:
+            concurrency = self.config.churn_workers + (self.config.viewer_streams if self.config.viewers else 0)
+            await asyncio.gather(*(self._one_cycle(client) for _ in range(concurrency)))
+
+    async def _one_cycle(self, client: httpx.AsyncClient):
+        stream_id = await self._start_stream(client)
+        if stream_id is not None:
+            await self._watch(client, stream_id, 0.5)
+            await self._stop_stream(client, stream_id)
+
+    def _client(self) -> httpx.AsyncClient:
+        connections = self.config.churn_workers + self.config.viewers + 8
+        return httpx.AsyncClient(timeout=self.config.request_timeout_seconds,
+                                 limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections))
+
+    async def run(self):
+        async with self._client() as client:
+            viewer_streams = [sid for sid in [await self._start_stream(client)
+                                              for _ in range(self.config.viewer_streams if self.config.viewers else 0)]
+                              if sid is not None]
+            deadline = time.monotonic() + self.config.duration_seconds
+            tasks = [self._churn_worker(client, deadline) for _ in range(self.config.churn_workers)]
+            if viewer_streams:
+                tasks += [self._viewer(client, viewer_streams[i % len(viewer_streams)], self.config.duration_seconds)
+                          for i in range(self.config.viewers)]
+            await asyncio.gather(*tasks)
+            for stream_id in viewer_streams:
+                await self._stop_stream(client, stream_id)
+
+    async def active_streams(self) -> Optional[int]:
+        async with self._client() as client:
+            try:
+                response = await client.get(f"{self.base_url}/streams")
+                return response.json()["data"]["active_streams_count"]
+            except (httpx.HTTPError, KeyError, ValueError):
+                return None
+
+    def results(self) -> dict:
+        fps = [v["fps"] for v in self.viewer_results if v.get("frames")]
+        return {
+            "cycles": self.cycles,
+            "requests": {endpoint: latency_summary(values) for endpoint, values in self.recorder.latencies.items()},
+            "errors": self.recorder.errors,
+            "time_to_first_frame": latency_summary(self.ttff),
+            "viewers": {
+                "count": len(self.viewer_results),
+                "fps_min": round(min(fps), 2) if fps else None,
+                "fps_mean": round(float(np.mean(fps)), 2) if fps else None,
+                "fps_max": round(max(fps), 2) if fps else None,
+                "details": self.viewer_results,
+            },
+        }
+
+
+def _threads_leaked(baseline: Dict[str, int], current: Dict[str, int]) -> int:
+    growth = current["pool_workers"] - baseline["pool_workers"]
+    return max(current["threads"] - baseline["threads"] - growth, 0)
+
+
+def _settle(server: LocalServer, baseline: Dict[str, int], seconds: float) -> Dict[str, int]:
+    """等待服务进程的线程数（不含共享线程池新增的工作线程）与子进程数回落到基线，返回最终值。"""
+    deadline = time.monotonic() + seconds
+    current = server.resources()
+    while time.monotonic() < deadline and (_threads_leaked(baseline, current) > 0
+                                           or current["children"] > baseline["children"]):
+        time.sleep(0.5)
+        current = server.resources()
+    return current
+
+
+def run_load(config: LoadConfig, log=print) -> dict:
+    """
+    执行一次负载测试并返回结果（本地模式下包含线程 / 子进程泄漏检查与服务退出码）。
+    生成的视频文件与服务日志放在临时工作目录中，结束后删除；要求保留或测试出错时保留，便于排查。
+    """
+    # 每个请求一条的 httpx 访问日志会淹没结果输出
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    workdir = Path(tempfile.mkdtemp(prefix="detection-load-"))
+    keep = config.keep_workdir
+    try:
+        return _run_load(config, workdir, log)
+    except Exception:
+        keep = True
+        raise
+    finally:
+        if keep:
+            log(f"📁 已保留工作目录: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _run_load(config: LoadConfig, workdir: Path, log) -> dict:
+    source = config.source
+    if source is None:
+        # 文件源按实时速度播放，长度需覆盖整个施压过程
+        seconds = config.duration_seconds + config.settle_seconds + 30
+        source = str(make_sample_video(workdir / "load_source.avi", seconds, config.video_fps,
+                                       config.video_width, config.video_height))
+        log(f"🎞️  已生成本地视频文件: {source} ({seconds:.0f}s)")
+
+    server = None
+    base_url = config.url
+    if base_url is None:
+        server = LocalServer(config, workdir / "server.log")
+        max_streams = config.churn_workers * 2 + config.viewer_streams + 2
+        server.start(max_streams=max_streams)
+        base_url = server.url
+        log(f"🚀 本地服务已启动: {base_url}（推理模式 {config.inference_mode}，日志 {server.log_path}）")
+
+    generator = LoadGenerator(config, base_url, source)
+    try:
+        baseline = None
+        if server is not None:
+            asyncio.run(generator.churn_round())
+            time.sleep(1.0)
+            baseline = server.resources()
+            generator = LoadGenerator(config, base_url, source)
+        log(f"⏱️  施压 {config.duration_seconds:.0f}s：{config.churn_workers} 个启停循环，"
+            f"{config.viewers} 个观看者 / {config.viewer_streams} 路流")
+        started = time.monotonic()
+        asyncio.run(generator.run())
+        result = {"base_url": base_url, "source": source, "elapsed_seconds": round(time.monotonic() - started, 2), **generator.results()}
+        result["leaked_streams"] = asyncio.run(generator.active_streams())
+        if server is not None:
+            after = _settle(server, baseline, config.settle_seconds)
+            result["leaks"] = {
+                "threads_baseline": baseline["threads"],
+                "threads_after": after["threads"],
+                "pool_workers_baseline": baseline["pool_workers"],
+                "pool_workers_after": after["pool_workers"],
+                "threads_leaked": _threads_leaked(baseline, after),
+                "children_baseline": baseline["children"],
+                "children_after": after["children"],
+                "children_leaked": max(after["children"] - baseline["children"], 0),
+            }
+    finally:
+        if server is not None:
+            exit_code = server.stop()
+            log(f"🛑 本地服务已关闭（退出码 {exit_code}）")
+    if server is not None:
+        result["server_exit_code"] = exit_code
+    return result
+
+
+def format_load_result(result: dict) -> List[str]:
+    lines = [f"  启停循环: {result['cycles']} 次，耗时 {result['elapsed_seconds']}s"]
+    for endpoint, stats in result["requests"].items():
+        lines.append(f"  {endpoint:<6} n={stats['count']:<5} p50/p95/p99/max = "
+                     f"{stats['p50_ms']}/{stats['p95_ms']}/{stats['p99_ms']}/{stats['max_ms']} ms")
+    ttff = result["time_to_first_frame"]
+    lines.append(f"  首帧时间 n={ttff['count']:<5} p50/p95/p99/max = "
+                 f"{ttff['p50_ms']}/{ttff['p95_ms']}/{ttff['p99_ms']}/{ttff['max_ms']} ms")
+    viewers = result["viewers"]
+    lines.append(f"  观看者 {viewers['count']} 个，实际帧率 最低/平均/最高 = "
+                 f"{viewers['fps_min']}/{viewers['fps_mean']}/{viewers['fps_max']} fps")
+    if result["errors"]:
+        lines.append(f"  ⚠️ 失败请求: {result['errors']}")
+    leaks = result.get("leaks")
+    problems = []
+    if result.get("leaked_streams"):
+        problems.append(f"{result['leaked_streams']} 路流未停止")
+    if leaks:
+        if leaks["threads_leaked"]:
+            problems.append(f"线程 {leaks['threads_baseline']} → {leaks['threads_after']}"
+                            f"（共享线程池 {leaks['pool_workers_baseline']} → {leaks['pool_workers_after']}）")
+        if leaks["children_leaked"]:
+            problems.append(f"子进程 {leaks['children_baseline']} → {leaks['children_after']}")
+    if result.get("server_exit_code") not in (None, 0):
+        problems.append(f"服务退出码 {result['server_exit_code']}")
+    lines.append(f"  ❌ 资源泄漏: {'，'.join(problems)}" if problems else "  ✅ 未发现泄漏的视频流、线程或子进程")
+    return lines
@@ -0,0 +1,102 @@
+# app/bench/report.py
+import json
+import os
+import platform
+import subprocess
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.cfg.config import BASE_DIR
+
+
+def git_revision() -> Optional[str]:
+    """当前代码的提交号（工作区有未提交修改时带 '-dirty' 后缀），不在 git 仓库中时为 None。"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                                text=True, timeout=5, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=BASE_DIR,
+                               capture_output=True, text=True, timeout=5).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def build_report(suite: str, scenarios: List[dict]) -> dict:
+    """组装结果文档：运行环境元数据 + 各场景的参数与结果。"""
+    return {
+        "suite": suite,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_revision": git_revision(),
+        "host": {
+            "hostname": platform.node(),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "scenarios": scenarios,
+    }
+
+
+def default_output_path(output_dir: Path, report: dict) -> Path:
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    revision = report.get("git_revision") or "norev"
+    return output_dir / f"bench_{report['suite']}_{stamp}_{revision}.json"
+
+
+def write_report(report: dict, path: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def load_report(path: Path) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _pipeline_p95(result: dict) -> Optional[float]:
+    return result.get("latency", {}).get("pipeline", {}).get("p95_ms")
+
+
+def format_result(name: str, result: dict) -> str:
+    """单个场景结果的一行摘要。"""
+    if "error" in result:
+        return f"  ❌ {name}: {result['error']}"
+    latency = result["latency"]["pipeline"]
+    resources = result["resources"]
+    return (f"  ✅ {name}\n"
+            f"     吞吐 {result['throughput_fps']:8.2f} fps (每路 {result['per_stream_fps']:.2f}) "
+            f"丢帧率 {result['drop_rate'] * 100:5.2f}% "
+            f"延迟 p50/p95/p99 {latency['p50_ms'] or 0:.1f}/{latency['p95_ms'] or 0:.1f}/{latency['p99_ms'] or 0:.1f} ms "
+            f"CPU {resources['cpu_percent']:.0f}% RSS {resources['rss_mb_peak']:.0f} MB")
+
+
+def _delta(current: Optional[float], baseline: Optional[float]) -> str:
+    if current is None or baseline is None:
+        return "     -"
+    if baseline == 0:
+        return "     -" if current == 0 else "   new"
+    return f"{(current - baseline) / baseline * 100:+6.1f}%"
+
+
+def compare_reports(current: dict, baseline: dict) -> List[str]:
+    """按场景名对比两次结果（吞吐、p95 延迟、丢帧率、CPU、峰值 RSS），返回逐行文本。"""
+    baseline_results: Dict[str, dict] = {s["name"]: s["result"] for s in baseline.get("scenarios", [])}
+    lines = [f"📊 对比基线 {baseline.get('git_revision') or '?'} ({baseline.get('created_at', '?')}) → "
+             f"{current.get('git_revision') or '?'}",
+             f"  {'吞吐':>8} {'p95':>8} {'丢帧率':>8} {'CPU':>8} {'RSS':>8}  场景"]
+    for scenario in current.get("scenarios", []):
+        result, base = scenario["result"], baseline_results.get(scenario["name"])
+        if base is None or "error" in result or "error" in base:
+            lines.append(f"  {'(无可对比的基线结果)':<44}  {scenario['name']}")
+            continue
+        lines.append(
+            f"  {_delta(result['throughput_fps'], base['throughput_fps']):>8} "
+            f"{_delta(_pipeline_p95(result), _pipeline_p95(base)):>8} "
+            f"{(result['drop_rate'] - base['drop_rate']) * 100:+7.2f}pt "
+            f"{_delta(result['resources']['cpu_percent'], base['resources']['cpu_percent']):>8} "
+            f"{_delta(result['resources']['rss_mb_peak'], base['resources']['rss_mb_peak']):>8}  {scenario['name']}"
+        )
+    return lines
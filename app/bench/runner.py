@@ -0,0 +1,248 @@
+# app/bench/runner.py
+import asyncio
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import psutil
+
+from app.bench.scenarios import BenchScenario
+from app.cfg.config import AppSettings
+from app.cfg.logging import app_logger
+from app.core.broadcaster import FrameBroadcaster
+from app.core.frame_pool import FrameMemoryBudget
+from app.core.frame_trace import latency_summary
+from app.core.inference_scheduler import InferenceScheduler
+from app.core.model_manager import ModelPool
+from app.core.pipeline import VideoStreamPipeline
+from app.core.worker_pool import WorkerPools
+
+# 汇总分位数的延迟分段（见 app.core.frame_trace.SEGMENTS）
+LATENCY_SEGMENTS = ("decode", "queue", "infer", "postprocess", "deliver", "pipeline", "end_to_end")
+
+
+def scenario_settings(settings: AppSettings, scenario: BenchScenario) -> AppSettings:
+    """在基础配置上套用场景参数：合成后端、邮箱容量、推理模式，以及覆盖整个计量时长的追踪窗口。"""
+    frames_per_stream = (scenario.fps or 200.0) * (scenario.warmup_seconds + scenario.duration_seconds)
+    app = settings.app.model_copy(update={
+        "inference_mode": scenario.inference_mode,
+        "stage_mailbox_capacity": scenario.queue_size,
+        "analysis_fps": 0.0,
+        "adaptive_fps_enabled": False,
+        "motion_gate_enabled": scenario.motion_gate,
+        "alarm_enabled": False,
+        "recording_enabled": False,
+        "trace_export_enabled": False,
+        "trace_window_frames": int(min(max(frames_per_stream * 1.2, 1000), 100000)),
+    })
+    hailo = settings.hailo.model_copy(update={
+        "backend": "synthetic",
+        "fallback_backend": None,
+        "synthetic_latency_ms": scenario.latency_ms,
+        "synthetic_latency_jitter_ms": scenario.latency_jitter_ms,
+        "synthetic_latency_distribution": scenario.latency_distribution,
+    })
+    return settings.model_copy(update={"app": app, "hailo": hailo})
+
+
+class _Viewers:
+    """
+    模拟观看者：在独立线程的事件循环中订阅各流的广播器，与 MJPEG 推送一样逐帧读取，
+    每读到一帧即视为已写出（记录首个写出时刻），流结束时自动退出。
+    """
+
+    def __init__(self, pipelines: List[VideoStreamPipeline], per_stream: int):
+        self.pipelines = pipelines
+        self.per_stream = per_stream
+        self.frames_delivered = 0
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._main()), name="BenchViewers", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait(timeout=5.0)
+
+    def join(self, timeout: float = 5.0):
+        self._thread.join(timeout=timeout)
+
+    async def _watch(self, pipeline: VideoStreamPipeline):
+        subscription = pipeline.broadcaster.subscribe()
+        pipeline.add_subscriber()
+        try:
+            while await subscription.next_frame() is not None:
+                pipeline.tracer.on_write(subscription.cursor)
+                self.frames_delivered += 1
+        finally:
+            subscription.close()
+            pipeline.remove_subscriber()
+
+    async def _main(self):
+        tasks = [asyncio.create_task(self._watch(p)) for p in self.pipelines for _ in range(self.per_stream)]
+        await asyncio.sleep(0)
+        self._ready.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _counters(pipelines: List[VideoStreamPipeline]) -> Dict[str, int]:
+    """各流计数器之和。"""
+    totals: Dict[str, int] = {}
+    for p in pipelines:
+        values = {
+            "frames_offered": p.frames_decoded,
+            "frames_inferred": p.inference_stats.frames_completed,
+            "frames_analysed": p.frames_analysed,
+            "frames_encoded": p.frames_encoded,
+            "dropped_preprocess": p.preprocess_queue.dropped_count,
+            "dropped_inference": p.inference_queue.dropped_count,
+            "dropped_postprocess": p.postprocess_queue.dropped_count,
+            "dropped_stale": p.stale_dropped,
+        }
+        for key, value in values.items():
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+class _ResourceSampler:
+    """在计量期间按固定间隔采样本进程的 RSS；CPU 占用按计量首尾的 CPU 时间差计算。"""
+
+    def __init__(self, interval: float = 0.25):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.rss: List[int] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="BenchSampler", daemon=True)
+        self._cpu_start = 0.0
+        self._wall_start = 0.0
+
+    def _cpu_seconds(self) -> float:
+        times = self.process.cpu_times()
+        return times.user + times.system
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.rss.append(self.process.memory_info().rss)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._cpu_start, self._wall_start = self._cpu_seconds(), time.monotonic()
+        self._thread.start()
+
+    def stop(self) -> dict:
+        cpu = self._cpu_seconds() - self._cpu_start
+        wall = max(time.monotonic() - self._wall_start, 1e-9)
+        self._stop.set()
+        self._thread.join()
+        rss = np.array(self.rss or [self.process.memory_info().rss], dtype=np.float64) / 2 ** 20
+        return {
+            # 100 表示占满一个 CPU 核心
+            "cpu_percent": round(cpu / wall * 100, 1),
+            "cpu_seconds": round(cpu, 3),
+            "rss_mb_mean": round(float(rss.mean()), 1),
+            "rss_mb_peak": round(float(rss.max()), 1),
+        }
+
+
+def run_scenario(settings: AppSettings, scenario: BenchScenario) -> dict:
+    """在当前进程中运行一个场景，返回该场景的计量结果。"""
+    settings = scenario_settings(settings, scenario)
+    pool_size = scenario.effective_pool_size
+    # 模型实例数只由场景决定；非调度模式下每路流独占一个模型实例，
+    # pipelined 模式的推理循环常驻推理线程池，线程数与模型实例数一致
+    app_update = {"max_concurrent_tasks": pool_size}
+    if scenario.inference_mode != "scheduled":
+        app_update["inference_pool_workers"] = pool_size
+    settings = settings.model_copy(update={"app": settings.app.model_copy(update=app_update)})
+    ModelPool.reset_instance()
+    model_pool = ModelPool(settings=settings, pool_size=pool_size)
+    scheduler: Optional[InferenceScheduler] = None
+    worker_pools = WorkerPools(settings)
+    worker_pools.start()
+    pipelines: List[VideoStreamPipeline] = []
+    viewers: Optional[_Viewers] = None
+    try:
+        if scenario.inference_mode == "scheduled":
+            scheduler = InferenceScheduler(settings=settings, model_pool=model_pool)
+            scheduler.start()
+        budget = FrameMemoryBudget(int(settings.app.frame_pool_memory_budget_mb * 2 ** 20))
+        for i in range(scenario.streams):
+            pipeline = VideoStreamPipeline(
+                settings=settings,
+                stream_id=f"bench-{i}",
+                video_source=scenario.source,
+                broadcaster=FrameBroadcaster(settings.app.stream_max_queue_size),
+                model_pool=model_pool,
+                worker_pools=worker_pools,
+                scheduler=scheduler,
+                frame_budget=budget,
+            )
+            if not pipeline.start():
+                raise RuntimeError(f"视频流 bench-{i} 未能启动（模型池大小 {pool_size}）")
+            pipelines.append(pipeline)
+        if scenario.viewers:
+            viewers = _Viewers(pipelines, scenario.viewers)
+            viewers.start()
+
+        time.sleep(scenario.warmup_seconds)
+        for pipeline in pipelines:
+            pipeline.tracer.reset()
+        sampler = _ResourceSampler()
+        before = _counters(pipelines)
+        started_at = time.monotonic()
+        sampler.start()
+        time.sleep(scenario.duration_seconds)
+        after = _counters(pipelines)
+        elapsed = time.monotonic() - started_at
+        latency = {
+            segment: latency_summary(np.concatenate([p.tracer.samples(segment) for p in pipelines]))
+            for segment in LATENCY_SEGMENTS
+        }
+        resources = sampler.stop()
+        pools = worker_pools.get_stats()["pools"]
+    finally:
+        for pipeline in pipelines:
+            pipeline.stop()
+        if viewers is not None:
+            viewers.join()
+        worker_pools.stop()
+        if scheduler is not None:
+            scheduler.stop()
+        model_pool.dispose()
+        ModelPool.reset_instance()
+
+    delta = {key: after[key] - before[key] for key in after}
+    offered = delta["frames_offered"]
+    dropped = sum(value for key, value in delta.items() if key.startswith("dropped_"))
+    return {
+        "duration_seconds": round(elapsed, 3),
+        "pool_size": pool_size,
+        "offered_fps": round(offered / elapsed, 2),
+        "throughput_fps": round(delta["frames_analysed"] / elapsed, 2),
+        "per_stream_fps": round(delta["frames_analysed"] / elapsed / scenario.streams, 2),
+        "inferred_fps": round(delta["frames_inferred"] / elapsed, 2),
+        "drop_rate": round(dropped / offered, 4) if offered else 0.0,
+        "counters": delta,
+        "latency": latency,
+        "resources": resources,
+        # 共享线程池自场景启动（含预热）以来的利用率
+        "worker_pools": {name: {"workers": stats["workers"], "utilisation": stats["utilisation"],
+                                "avg_queue_wait_ms": stats["avg_queue_wait_ms"]}
+                         for name, stats in pools.items()},
+    }
+
+
+def run_suite(settings: AppSettings, scenarios: List[BenchScenario], on_result=None) -> List[dict]:
+    """依次运行场景（场景之间互不重叠），每完成一个场景回调一次 `on_result(scenario, result)`。"""
+    results = []
+    for index, scenario in enumerate(scenarios, 1):
+        app_logger.info(f"【基准测试】({index}/{len(scenarios)}) {scenario.name}")
+        try:
+            result = run_scenario(settings, scenario)
+        except Exception as e:
+            app_logger.error(f"【基准测试】场景 {scenario.name} 运行失败: {e}", exc_info=True)
+            result = {"error": str(e)}
+        entry = {"name": scenario.name, "params": scenario.model_dump(), "result": result}
+        results.append(entry)
+        if on_result is not None:
+            on_result(scenario, result)
+    return results
@@ -0,0 +1,110 @@
+# app/bench/scenarios.py
+import itertools
+from typing import Dict, List, Literal, Optional, Sequence
+
+from pydantic import BaseModel, Field
+
+# scheduled 模式下默认的模型实例数；固定取值而不读取本机配置，使结果可以跨机器、跨提交对比
+SCHEDULED_POOL_SIZE = 2
+
+
+class BenchScenario(BaseModel):
+    """单个基准测试场景：合成视频源 × 合成推理后端 × 流水线参数。"""
+    streams: int = Field(1, ge=1, description="同时运行的视频流数")
+    width: int = Field(1280, ge=16, description="合成视频源的帧宽（像素）")
+    height: int = Field(720, ge=16, description="合成视频源的帧高（像素）")
+    fps: float = Field(25.0, ge=0.0, description="合成视频源的帧率，0表示不节流（尽可能快）")
+    motion: float = Field(0.1, ge=0.0, le=1.0, description="运动色块占画面面积的比例")
+    queue_size: int = Field(2, ge=1, description="流水线相邻阶段之间邮箱的容量（帧）")
+    inference_mode: Literal["sync", "pipelined", "scheduled"] = Field("pipelined", description="推理阶段的执行模式")
+    pool_size: Optional[int] = Field(None, ge=1, description=f"模型实例数，不填时 sync/pipelined 为流数，scheduled 为 {SCHEDULED_POOL_SIZE}")
+    latency_ms: float = Field(20.0, ge=0.0, description="合成后端的推理延迟（中位数，毫秒）")
+    latency_jitter_ms: float = Field(5.0, ge=0.0, description="合成后端延迟的抖动（毫秒）")
+    latency_distribution: Literal["uniform", "normal", "lognormal"] = Field("lognormal", description="合成后端延迟的分布")
+    viewers: int = Field(1, ge=0, description="每路流登记的观看者数，大于 0 时每帧都要绘制并编码 JPEG")
+    motion_gate: bool = Field(False, description="是否启用运动门控")
+    warmup_seconds: float = Field(2.0, ge=0.0, description="开始计量前的预热时长（秒）")
+    duration_seconds: float = Field(10.0, gt=0.0, description="计量时长（秒）")
+
+    @property
+    def name(self) -> str:
+        """场景名由决定结果的参数组成，用于跨提交对比时匹配同一场景。"""
+        return (f"streams={self.streams},res={self.width}x{self.height},fps={self.fps:g},queue={self.queue_size},"
+                f"mode={self.inference_mode},latency={self.latency_ms:g}ms,viewers={self.viewers},motion={self.motion:g}"
+                + (",gate" if self.motion_gate else ""))
+
+    @property
+    def effective_pool_size(self) -> int:
+        """实际使用的模型实例数。"""
+        if self.pool_size is not None:
+            return self.pool_size
+        return SCHEDULED_POOL_SIZE if self.inference_mode == "scheduled" else self.streams
+
+    @property
+    def source(self) -> str:
+        return f"synthetic://{self.width}x{self.height}@{self.fps:g}?motion={self.motion:g}"
+
+
+RESOLUTIONS = {
+    "360p": (640, 360),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+
+
+def parse_resolution(value: str) -> tuple:
+    """解析 '720p' 或 '1280x720' 形式的分辨率。"""
+    value = value.strip().lower()
+    if value in RESOLUTIONS:
+        return RESOLUTIONS[value]
+    width, sep, height = value.partition("x")
+    if not sep:
+        raise ValueError(f"无法解析分辨率: '{value}'，可用 {list(RESOLUTIONS)} 或 <宽>x<高>")
+    return int(width), int(height)
+
+
+def sweep(base: BenchScenario, axes: Dict[str, Sequence]) -> List[BenchScenario]:
+    """对给定的参数轴做笛卡尔积，其余参数取 `base` 的值。轴 'resolution' 的取值为 (宽, 高)。"""
+    names = list(axes)
+    scenarios = []
+    for values in itertools.product(*(axes[n] for n in names)):
+        update = {}
+        for name, value in zip(names, values):
+            if name == "resolution":
+                update["width"], update["height"] = value
+            else:
+                update[name] = value
+        scenarios.append(base.model_copy(update=update))
+    return scenarios
+
+
+def one_at_a_time(base: BenchScenario, axes: Dict[str, Sequence]) -> List[BenchScenario]:
+    """逐个参数轴扫描（其余参数保持 `base`），重复的场景只保留一个。"""
+    scenarios: Dict[str, BenchScenario] = {}
+    for name, values in axes.items():
+        for scenario in sweep(base, {name: values}):
+            scenarios.setdefault(scenario.name, scenario)
+    return list(scenarios.values())
+
+
+def build_suite(name: str, base: Optional[BenchScenario] = None) -> List[BenchScenario]:
+    """
+    内置的场景集：
+    - smoke: 单个基准场景，用于快速验证；
+    - default: 以基准场景为中心，分别扫描流数、邮箱容量与分辨率；
+    - full: 流数 × 邮箱容量 × 分辨率的完整笛卡尔积。
+    """
+    base = base or BenchScenario()
+    if name == "smoke":
+        return [base]
+    axes = {
+        "streams": [1, 2, 4, 8],
+        "queue_size": [1, 2, 4],
+        "resolution": [RESOLUTIONS["360p"], RESOLUTIONS["720p"], RESOLUTIONS["1080p"]],
+    }
+    if name == "default":
+        return one_at_a_time(base, axes)
+    if name == "full":
+        return sweep(base, axes)
+    raise ValueError(f"未知的场景集: '{name}'，可选值: ['smoke', 'default', 'full']")
@@ -2,7 +2,7 @@
 import os
 import yaml
 from pathlib import Path
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 from functools import lru_cache
 from pydantic import BaseModel, Field, BeforeValidator, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -25,6 +25,14 @@ FilePath = Annotated[Path, BeforeValidator(lambda v: Path(v) if isinstance(v, st
 
 
 # --- 配置模型定义 ---
+class AlarmClassRule(BaseModel):
+    """按类别覆盖的告警判定参数，未填写的字段使用 AppConfig 中的全局值。"""
+    window_frames: Optional[int] = Field(None, ge=1, le=1024, description="N-of-M 判定的窗口长度 M（推理帧数）")
+    confirm_frames: Optional[int] = Field(None, ge=1, description="窗口内至少出现的帧数 N")
+    min_box_area_ratio: Optional[float] = Field(None, ge=0.0, le=1.0, description="计入判定的检测框占整帧面积的最小比例")
+    min_duration_seconds: Optional[float] = Field(None, ge=0.0, description="确认状态需持续的最短时长（秒）")
+
+
 class AppConfig(BaseModel):
     title: str = "烟火检测服务 (Hailo版)"
     description: str = "基于FastAPI和Hailo-8模型构建的实时烟火检测服务"
@@ -32,8 +40,79 @@ class AppConfig(BaseModel):
     debug: bool = False
     stream_default_lifetime_minutes: int = Field(10, description="视频流默认生命周期（分钟），-1表示永久")
     stream_cleanup_interval_seconds: int = Field(60, description="后台清理过期视频流的运行间隔（秒）")
-    stream_max_queue_size: int = Field(120, description="为视频流提供一个更充裕的缓冲区，以应对客户端网络抖动")
+    stream_max_queue_size: int = Field(120, ge=1, description="每个视频流广播环形缓冲区保留的已编码帧数，用于吸收观看者的网络抖动；落后更多的观看者直接跳到最新帧")
     max_concurrent_tasks: int = Field(2, ge=1, description="系统支持的最大并发视频流处理路数")
+    inference_mode: Literal["sync", "pipelined", "scheduled"] = Field(
+        "pipelined",
+        description="推理阶段模式：'sync' 逐帧阻塞调用 predict；'pipelined' 通过 predict_batch 流式喂帧，使多帧同时在设备上流水执行；"
+                    "'scheduled' 由全局推理调度器持有所有模型实例，跨流组成微批，流数量不再受模型实例数限制"
+    )
+    inference_inflight_depth: int = Field(4, ge=1, description="pipelined 模式下每个模型实例允许同时在途的最大帧数")
+    analysis_fps: float = Field(0.0, ge=0.0, description="每路视频流默认的目标分析帧率，0表示分析源的每一帧；可在启动流时单独覆盖")
+    source_type: Literal["opencv", "ffmpeg"] = Field(
+        "opencv",
+        description="默认视频源类型：'opencv' 使用 cv2.VideoCapture 全分辨率解码；'ffmpeg' 使用 ffmpeg 子进程在解码器内降帧与缩放"
+    )
+    ffmpeg_path: str = Field("ffmpeg", description="ffmpeg 可执行文件路径")
+    ffprobe_path: str = Field("ffprobe", description="ffprobe 可执行文件路径")
+    ffmpeg_scale_width: int = Field(1280, ge=0, description="ffmpeg 视频源输出宽度（保持宽高比，仅缩小不放大），0表示保持源分辨率")
+    stage_mailbox_capacity: int = Field(2, ge=1, description="流水线相邻阶段之间 latest-wins 邮箱的容量（帧），满时丢弃最旧的帧")
+    frame_max_age_ms: float = Field(1000.0, ge=0.0, description="帧在送入推理前允许的最大帧龄（毫秒），超过则丢弃；0表示不限制")
+    frame_pool_slots: int = Field(12, ge=0, description="每个视频流预分配的帧缓冲槽位数，0表示不使用缓冲池")
+    frame_pool_memory_budget_mb: float = Field(2048.0, ge=0.0, description="所有视频流帧缓冲池共享的内存预算（MB），超出后按帧临时分配")
+    motion_gate_enabled: bool = Field(False, description="是否默认启用运动门控：画面无明显变化的帧不送推理，沿用最近一次的检测结果；可在启动流时单独覆盖")
+    motion_gate_method: Literal["diff", "mog2"] = Field("diff", description="运动门控的变化量算法：'diff' 与上次推理帧做帧差；'mog2' 背景建模")
+    motion_gate_width: int = Field(160, ge=16, description="运动门控计算变化量时使用的缩小后灰度图宽度（像素）")
+    motion_gate_threshold: float = Field(0.01, ge=0.0, le=1.0, description="变化像素占比超过该值的帧才送推理")
+    motion_gate_pixel_threshold: int = Field(25, ge=0, le=255, description="'diff' 模式下灰度差超过该值的像素计为变化像素")
+    motion_gate_keepalive_seconds: float = Field(5.0, ge=0.0, description="静止场景下至少每隔多少秒强制推理一帧")
+    adaptive_fps_enabled: bool = Field(False, description="是否默认启用检测驱动的自适应分析帧率：平时低帧率分析，出现疑似目标时升到高帧率；可在启动流时单独覆盖")
+    adaptive_idle_fps: float = Field(1.0, gt=0.0, description="自适应帧率空闲时的分析帧率（帧/秒）")
+    adaptive_active_fps: float = Field(10.0, gt=0.0, description="自适应帧率升频后的分析帧率（帧/秒）")
+    adaptive_suspicion_threshold: float = Field(
+        0.25, ge=0.0, le=1.0,
+        description="疑似目标阈值，应低于 confidence_threshold；任意检测框得分达到该值即触发升频（该框本身不作为正式检测结果）"
+    )
+    adaptive_hold_seconds: float = Field(30.0, ge=0.0, description="最后一次出现疑似目标后保持高帧率的时长（秒）")
+    adaptive_decay_seconds: float = Field(10.0, ge=0.0, description="保持期结束后从高帧率线性回落到空闲帧率的时长（秒）")
+    tracker_enabled: bool = Field(False, description="是否默认启用多目标跟踪：推理帧更新轨迹，未推理的帧输出预测框，检测结果带稳定的 track_id；可在启动流时单独覆盖")
+    tracker_iou_threshold: float = Field(0.3, ge=0.0, le=1.0, description="检测框与轨迹预测框匹配所需的最小 IoU")
+    tracker_max_age_seconds: float = Field(1.0, ge=0.0, description="轨迹连续未匹配超过该时长（秒）即删除，期间以预测框继续输出")
+    tracker_min_hits: int = Field(1, ge=1, description="轨迹被匹配多少次后才确认并输出")
+    tiling_enabled: bool = Field(False, description="是否默认启用分块推理：高分辨率帧切成相互重叠的图块分别推理，提升远处小目标的检出率；可在启动流时单独覆盖")
+    tiling_tile_size: int = Field(0, ge=0, description="图块边长（像素），0表示使用模型输入尺寸（模型 JSON 的 PRE_PROCESS）；指定了网格行列数的方向上不生效")
+    tiling_grid_cols: int = Field(0, ge=0, description="图块网格列数，0表示按图块边长与重叠比例自动决定")
+    tiling_grid_rows: int = Field(0, ge=0, description="图块网格行数，0表示按图块边长与重叠比例自动决定")
+    tiling_overlap: float = Field(0.2, ge=0.0, lt=0.9, description="相邻图块的最小重叠比例")
+    tiling_full_frame: bool = Field(True, description="分块推理时是否额外做一次整帧推理，兼顾跨越多个图块的大目标")
+    alarm_enabled: bool = Field(False, description="是否默认启用时域告警引擎：把逐帧检测结果平滑为去抖的 start / update / clear 告警事件；可在启动流时单独覆盖")
+    alarm_window_frames: int = Field(10, ge=1, le=1024, description="告警 N-of-M 判定的窗口长度 M（推理帧数）")
+    alarm_confirm_frames: int = Field(3, ge=1, description="窗口内至少出现该类别的帧数 N，大于 M 时按 M 处理")
+    alarm_min_box_area_ratio: float = Field(0.0, ge=0.0, le=1.0, description="计入告警判定的检测框占整帧面积的最小比例，0表示不限制")
+    alarm_min_duration_seconds: float = Field(1.0, ge=0.0, description="N-of-M 确认状态需连续保持的最短时长（秒），之后才发出 start 事件")
+    alarm_clear_seconds: float = Field(10.0, ge=0.0, description="告警连续多少秒未再确认才发出 clear 事件（去抖）")
+    alarm_update_interval_seconds: float = Field(30.0, gt=0.0, description="告警持续期间发出 update 事件的间隔（秒）")
+    alarm_class_rules: Dict[str, AlarmClassRule] = Field(
+        {}, description="按类别覆盖的告警判定参数，如 {\"smoke\": {\"confirm_frames\": 5, \"min_duration_seconds\": 3}}"
+    )
+    recording_enabled: bool = Field(False, description="是否默认启用告警录像：持续缓存最近的已编码帧，告警时连同告警前后的画面写成片段；启用后同时启用告警引擎；可在启动流时单独覆盖")
+    recording_dir: FilePath = Field(DATA_DIR / "clips", description="录像片段与索引数据库的存放目录")
+    recording_pre_event_seconds: float = Field(10.0, ge=0.0, description="片段包含告警开始前的时长（秒），即预录环形缓冲区保留的时长")
+    recording_post_event_seconds: float = Field(10.0, ge=0.0, description="所有告警清除后继续录制的时长（秒）")
+    recording_max_clip_seconds: float = Field(300.0, gt=0.0, description="单个片段的最长时长（秒），超出后接续新片段")
+    recording_fps: float = Field(10.0, gt=0.0, description="录像帧率上限（帧/秒），分析帧率更高时按此限速编码入缓冲区")
+    recording_buffer_memory_mb: float = Field(64.0, gt=0.0, description="每个视频流预录环形缓冲区的内存上限（MB），超出时提前淘汰最旧的帧")
+    recording_writer_max_pending_mb: float = Field(256.0, gt=0.0, description="录像写入线程允许积压的最大数据量（MB），磁盘跟不上时丢弃新帧而不是阻塞流水线")
+    trace_window_frames: int = Field(1000, ge=10, le=100000, description="每个视频流计算分段延迟 p50/p95/p99 的滚动窗口长度（帧数）")
+    trace_export_enabled: bool = Field(False, description="是否把抽样的逐帧原始追踪记录导出到 JSONL 文件，供离线分析")
+    trace_export_path: FilePath = Field(DATA_DIR / "traces" / "frame_traces.jsonl", description="逐帧追踪记录的导出文件（追加写入）")
+    trace_export_sample_rate: float = Field(0.01, gt=0.0, le=1.0, description="导出追踪记录的抽样比例（0~1）")
+    max_streams: int = Field(64, ge=1, description="允许同时运行的视频流上限（scheduled 模式下流数量可远大于模型实例数）")
+    scheduler_max_batch_size: int = Field(8, ge=1, description="scheduled 模式下跨流微批的最大帧数")
+    scheduler_batch_timeout_ms: float = Field(20.0, ge=0.0, description="scheduled 模式下微批的最长等待时间（毫秒），超时即使未凑满也会发出")
+    io_pool_workers: int = Field(0, ge=0, description="共享读帧（解码）线程池的线程数上限，0表示与 max_streams 相同；实时源的 grab 会阻塞等待下一帧，上限宜不少于同时运行的实时源数")
+    cpu_pool_workers: int = Field(0, ge=0, description="共享 CPU 线程池（预处理、绘制与 JPEG 编码）的线程数上限，0表示 CPU 核心数")
+    inference_pool_workers: int = Field(0, ge=0, description="sync / pipelined 模式下共享推理线程池的线程数上限，0表示与 max_concurrent_tasks 相同；scheduled 模式下不使用")
 
 
 class ServerConfig(BaseModel):
@@ -70,6 +149,33 @@ class HailoConfig(BaseModel):
     confidence_threshold: float = Field(0.5, ge=0.0, le=1.0, description="目标检测置信度阈值")
     # IOU阈值通常在 DeGirum 模型内部或服务器端处理，这里可以保留用于后处理（如果需要）
     iou_threshold: float = Field(0.4, ge=0.0, le=1.0, description="非极大值抑制（NMS）的IOU阈值")
+    class_confidence_thresholds: Dict[str, float] = Field(
+        {}, description="按类别覆盖的置信度阈值，如 {\"smoke\": 0.35}；未列出的类别使用 confidence_threshold"
+    )
+    min_box_area: float = Field(0.0, ge=0.0, description="检测框的最小面积（像素²），更小的框被丢弃；0表示不限制")
+
+    # --- 推理后端选择 ---
+    backend: Literal["degirum", "onnx", "synthetic"] = Field(
+        "degirum",
+        description="推理后端：'degirum' 使用 Hailo-8 加速卡；'onnx' 使用 ONNX Runtime CPU 推理；'synthetic' 为无需模型的合成后端（用于压测）。"
+    )
+    fallback_backend: Optional[Literal["onnx", "synthetic"]] = Field(
+        None,
+        description="主后端加载失败（如加速卡缺失）时自动切换的备用后端，不填(null)则直接报错。"
+    )
+    onnx_model_path: FilePath = Field(MODEL_ZOO_DIR / "smoke_fire.onnx", description="ONNX Runtime 后端使用的 YOLOv8 ONNX 模型路径")
+    onnx_providers: List[str] = Field(["CPUExecutionProvider"], description="ONNX Runtime 执行提供者的优先级列表")
+    onnx_num_threads: int = Field(0, ge=0, description="ONNX Runtime 每个会话的算子内线程数，0表示由运行时自动决定")
+    synthetic_latency_ms: float = Field(20.0, ge=0.0, description="合成后端每次推理的模拟延迟（毫秒）")
+    synthetic_latency_jitter_ms: float = Field(0.0, ge=0.0, description="合成后端延迟的随机抖动幅度（毫秒）")
+    synthetic_latency_distribution: Literal["uniform", "normal", "lognormal"] = Field(
+        "uniform",
+        description="合成后端延迟的分布：'uniform' 在 ±抖动内均匀分布；'normal' 以抖动为标准差的正态分布；"
+                    "'lognormal' 以设定延迟为中位数、抖动近似为标准差的对数正态分布（长尾，接近真实设备）"
+    )
+    synthetic_detection_rate: float = Field(0.3, ge=0.0, le=1.0, description="合成后端单帧产生检测结果的概率")
+    synthetic_max_detections: int = Field(3, ge=0, description="合成后端单帧最多生成的检测框数量")
+    synthetic_seed: Optional[int] = Field(None, description="合成后端随机数种子，便于复现")
 
     @model_validator(mode='after')
     def ensure_zoo_dir_exists(self) -> 'HailoConfig':
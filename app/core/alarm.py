@@ -0,0 +1,277 @@
+# app/core/alarm.py
+import threading
+import time
+import uuid
+from typing import Callable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.cfg.logging import app_logger
+from app.core.detections import DetectionBatch
+from app.core.frame_trace import wall_time
+
+# 代表性快照按最高得分更新，但两次重新编码之间至少间隔该秒数
+_SNAPSHOT_MIN_INTERVAL = 1.0
+
+
+class AlarmEngine:
+    """
+    单路流的时域告警引擎：把逐帧的检测结果平滑为去抖后的告警事件。
+
+    每个类别独立判定（参数可按类别覆盖）：
+    - N-of-M 确认：最近 `window_frames` 个推理帧中至少 `confirm_frames` 帧出现该类别，才算“确认”；
+      面积占整帧比例小于 `min_box_area_ratio` 的框不计入。
+    - 持续性：确认状态连续保持 `min_duration_seconds` 后才发出 `start` 事件。
+    - 去抖：告警期间每隔 `update_interval_seconds` 发出一次 `update`；
+      连续 `clear_seconds` 未再确认才发出 `clear`，短暂漏检不会反复开关告警。
+
+    状态保存在按类别的定长数组中（M 帧的命中环形缓冲区、计数、时间戳），
+    每帧的判定对所有类别一次性向量化完成，单路流占用的内存与运行时长无关。
+    事件通过 `on_event(event, now)` 回调，`now` 为产生事件的帧的时刻（与 `observe` 的 `now` 同一时钟）。
+    每个活动告警保留一张代表性快照（得分最高的一帧，JPEG 由调用方按需编码）。
+    `observe` 只在推理过的帧上由后处理线程调用；查询接口可从其他线程调用，二者以锁保护。
+    快照的绘制与编码在锁外进行，不阻塞查询接口。
+    """
+    START = "start"
+    UPDATE = "update"
+    CLEAR = "clear"
+
+    def __init__(self, stream_id: str, names: Sequence[str], window_frames: int = 10, confirm_frames: int = 3,
+                 min_box_area_ratio: float = 0.0, min_duration_seconds: float = 1.0, clear_seconds: float = 10.0,
+                 update_interval_seconds: float = 30.0,
+                 class_rules: Optional[Mapping[str, Mapping[str, float]]] = None,
+                 on_event: Optional[Callable[[dict, float], None]] = None):
+        self.stream_id = stream_id
+        self.names = list(names)
+        self.clear_seconds = clear_seconds
+        self.update_interval_seconds = update_interval_seconds
+        self.on_event = on_event
+
+        # 按类别展开的判定参数，class_rules 中的字段覆盖全局默认值
+        num_classes = len(self.names)
+        rules = [dict((class_rules or {}).get(name, {})) for name in self.names]
+        self.window = np.array([int(r.get("window_frames", window_frames)) for r in rules], np.int32).reshape(-1)
+        self.window = np.maximum(self.window, 1)
+        confirm = np.array([int(r.get("confirm_frames", confirm_frames)) for r in rules], np.int32).reshape(-1)
+        self.confirm = np.clip(confirm, 1, self.window)
+        self.min_area_ratio = np.array([r.get("min_box_area_ratio", min_box_area_ratio) for r in rules],
+                                       np.float64).reshape(-1)
+        self.min_duration = np.array([r.get("min_duration_seconds", min_duration_seconds) for r in rules],
+                                     np.float64).reshape(-1)
+
+        self._lock = threading.Lock()
+        depth = int(self.window.max()) if num_classes else 1
+        self._ring = np.zeros((depth, num_classes), dtype=bool)
+        self._pos = 0
+        self._counts = np.zeros(num_classes, np.int32)
+        self._pending_since = np.full(num_classes, np.nan)
+        self._last_confirmed = np.full(num_classes, np.nan)
+        self._last_emitted = np.full(num_classes, np.nan)
+        # 各类别最近一次命中的得分（告警开始的那一帧未必命中）
+        self._last_score = np.zeros(num_classes, np.float32)
+        self._active = np.zeros(num_classes, dtype=bool)
+        self._alarms: List[Optional[dict]] = [None] * num_classes
+        self._images: List[Optional[bytes]] = [None] * num_classes
+
+        self.frames_observed = 0
+        self.alarms_started = 0
+        self.alarms_cleared = 0
+        self.events_emitted = 0
+
+    def observe(self, detections: DetectionBatch, frame_shape: Sequence[int], now: Optional[float] = None,
+                snapshot: Optional[Callable[[], Optional[bytes]]] = None) -> List[dict]:
+        """
+        用一个推理帧的检测结果（已按置信度过滤）推进所有类别的状态，返回本帧产生的告警事件。
+        `snapshot` 在需要更新代表性快照时才被调用，返回该帧的 JPEG 字节。
+        """
+        now = time.monotonic() if now is None else now
+        num_classes = len(self.names)
+        hits = np.zeros(num_classes, dtype=bool)
+        best = np.full(num_classes, -1, np.int64)
+        if len(detections) and num_classes:
+            class_ids = detections.class_ids
+            valid = (class_ids >= 0) & (class_ids < num_classes)
+            frame_area = float(frame_shape[0]) * float(frame_shape[1])
+            if frame_area > 0:
+                area_ratio = detections.areas / frame_area
+                valid &= area_ratio >= self.min_area_ratio[np.clip(class_ids, 0, num_classes - 1)]
+            index = np.flatnonzero(valid)
+            if index.size:
+                # 按得分升序写入，同一类别最后写入的即为得分最高的框
+                index = index[np.argsort(detections.scores[index], kind="stable")]
+                hits[class_ids[index]] = True
+                best[class_ids[index]] = index
+
+        events = []
+        # 需要更新快照的告警：(类别, alarm_id)，在锁外编码后再写回
+        pending_snapshots: List[Tuple[int, str]] = []
+        with self._lock:
+            self.frames_observed += 1
+            # N-of-M：各类别窗口长度不同，移出窗口的是 window 帧之前写入的那一格
+            classes = np.arange(num_classes)
+            leaving = self._ring[(self._pos - self.window) % len(self._ring), classes]
+            self._counts += hits.astype(np.int32) - leaving.astype(np.int32)
+            self._ring[self._pos] = hits
+            self._last_score[hits] = detections.scores[best[hits]]
+            self._pos = (self._pos + 1) % len(self._ring)
+
+            confirmed = self._counts >= self.confirm
+            self._last_confirmed[confirmed] = now
+            pending = confirmed & np.isnan(self._pending_since)
+            self._pending_since[pending] = now
+            self._pending_since[~confirmed & ~self._active] = np.nan
+
+            starts = ~self._active & confirmed & (now - self._pending_since >= self.min_duration)
+            clears = self._active & (now - self._last_confirmed >= self.clear_seconds)
+            updates = self._active & ~clears & (now - self._last_emitted >= self.update_interval_seconds)
+
+            # 活动告警的得分统计与快照
+            for c in np.flatnonzero(self._active & hits).tolist():
+                self._record_hit(c, detections, int(best[c]), now, pending_snapshots)
+            for c in np.flatnonzero(starts).tolist():
+                events.append(self._start(c, detections, int(best[c]), now, pending_snapshots))
+            for c in np.flatnonzero(updates).tolist():
+                events.append(self._emit(c, self.UPDATE, now))
+            for c in np.flatnonzero(clears).tolist():
+                events.append(self._clear(c, now, f"{self.clear_seconds:g}s 内未再确认"))
+
+        if pending_snapshots and snapshot is not None:
+            image = snapshot()
+            with self._lock:
+                for c, alarm_id in pending_snapshots:
+                    # 编码期间告警可能已被清除（如流停止）
+                    if self._alarms[c] is not None and self._alarms[c]["alarm_id"] == alarm_id:
+                        self._images[c] = image
+        for event in events:
+            self._dispatch(event, now)
+        return events
+
+    def _start(self, c: int, detections: DetectionBatch, best: int, now: float,
+               pending_snapshots: List[Tuple[int, str]]) -> dict:
+        self._active[c] = True
+        self.alarms_started += 1
+        self._alarms[c] = {
+            "alarm_id": uuid.uuid4().hex,
+            "stream_id": self.stream_id,
+            "label": self.names[c],
+            "state": "active",
+            "started_at": wall_time(self._pending_since[c]),
+            "updated_at": wall_time(now),
+            "cleared_at": None,
+            "duration_seconds": 0.0,
+            "peak_score": round(float(self._last_score[c]), 4),
+            "last_score": round(float(self._last_score[c]), 4),
+            "hit_frames": 0,
+            "snapshot": None,
+        }
+        self._images[c] = None
+        self._record_hit(c, detections, best, now, pending_snapshots)
+        return self._emit(c, self.START, now)
+
+    def _record_hit(self, c: int, detections: DetectionBatch, best: int, now: float,
+                    pending_snapshots: List[Tuple[int, str]]):
+        """
+        记录活动告警的一次命中；得分创新高且距上次快照足够久时更新快照元数据，
+        并把该告警加入 `pending_snapshots`，由 `observe` 在锁外编码图像。
+        """
+        alarm = self._alarms[c]
+        if alarm is None or best < 0:
+            return
+        score = float(detections.scores[best])
+        alarm["hit_frames"] += 1
+        alarm["last_score"] = round(score, 4)
+        alarm["peak_score"] = max(alarm["peak_score"], round(score, 4))
+        current = alarm["snapshot"]
+        if current is not None and (score <= current["score"] or now - current["_ts"] < _SNAPSHOT_MIN_INTERVAL):
+            return
+        box = np.round(detections.boxes[best].astype(np.float64), 1).tolist()
+        alarm["snapshot"] = {
+            "frame_id": detections.frame_id,
+            "timestamp": wall_time(now),
+            "score": round(score, 4),
+            "bbox": box,
+            "_ts": now,
+        }
+        pending_snapshots.append((c, alarm["alarm_id"]))
+
+    def _clear(self, c: int, now: float, reason: str) -> dict:
+        self._active[c] = False
+        self._pending_since[c] = np.nan
+        self.alarms_cleared += 1
+        alarm = self._alarms[c]
+        alarm["state"] = "cleared"
+        alarm["cleared_at"] = wall_time(now)
+        event = self._emit(c, self.CLEAR, now, reason)
+        self._alarms[c] = None
+        self._images[c] = None
+        return event
+
+    def _emit(self, c: int, kind: str, now: float, reason: Optional[str] = None) -> dict:
+        alarm = self._alarms[c]
+        alarm["updated_at"] = wall_time(now)
+        alarm["duration_seconds"] = round(max(alarm["updated_at"] - alarm["started_at"], 0.0), 3)
+        self._last_emitted[c] = now
+        self.events_emitted += 1
+        event = {"type": "alarm", "event": kind, "alarm": self._public(alarm)}
+        if reason is not None:
+            event["reason"] = reason
+        return event
+
+    @staticmethod
+    def _public(alarm: dict) -> dict:
+        """对外输出的告警副本（去掉内部字段）。"""
+        public = dict(alarm)
+        if alarm["snapshot"] is not None:
+            public["snapshot"] = {k: v for k, v in alarm["snapshot"].items() if not k.startswith("_")}
+        return public
+
+    def _dispatch(self, event: dict, now: float):
+        alarm = event["alarm"]
+        app_logger.info(f"【告警 {self.stream_id}】{alarm['label']} {event['event']}"
+                        f"（峰值 {alarm['peak_score']:.2f}，持续 {alarm['duration_seconds']:.1f}s）"
+                        + (f"：{event['reason']}" if "reason" in event else ""))
+        if self.on_event is not None:
+            try:
+                self.on_event(event, now)
+            except Exception as e:
+                app_logger.error(f"【告警 {self.stream_id}】事件回调失败: {e}")
+
+    def close(self, now: Optional[float] = None) -> List[dict]:
+        """流结束时清除所有活动告警。"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            events = [self._clear(c, now, "视频流已停止") for c in np.flatnonzero(self._active).tolist()]
+        for event in events:
+            self._dispatch(event, now)
+        return events
+
+    def active_alarms(self) -> List[dict]:
+        with self._lock:
+            return [self._public(alarm) for alarm in self._alarms if alarm is not None]
+
+    def snapshot_image(self, alarm_id: str) -> Optional[bytes]:
+        """返回指定活动告警的代表性快照 JPEG，告警不存在或尚无快照时返回 None。"""
+        with self._lock:
+            for alarm, image in zip(self._alarms, self._images):
+                if alarm is not None and alarm["alarm_id"] == alarm_id:
+                    return image
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "frames_observed": self.frames_observed,
+                "alarms_started": self.alarms_started,
+                "alarms_cleared": self.alarms_cleared,
+                "events_emitted": self.events_emitted,
+                "active_alarms": int(self._active.sum()),
+                "classes": {
+                    name: {
+                        "window_frames": int(self.window[c]),
+                        "confirm_frames": int(self.confirm[c]),
+                        "hit_frames": int(self._counts[c]),
+                        "active": bool(self._active[c]),
+                    }
+                    for c, name in enumerate(self.names)
+                },
+            }
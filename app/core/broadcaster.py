@@ -0,0 +1,138 @@
+# app/core/broadcaster.py
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Deque, Optional, Set, Tuple
+
+
+class FrameBroadcaster:
+    """
+    单个视频流的逐帧数据广播器（已编码的 JPEG 帧，或序列化后的检测结果事件）。
+    后处理线程每处理一帧就 `publish` 一次，广播器保留最近 `capacity` 帧组成的环形缓冲区，
+    并为每一帧分配递增的序号。每个观看者持有各自的游标（上次读到的序号），
+    互不争抢：同一帧 JPEG 只编码一次，即可同时送给任意多个观看者。
+    观看者落后超过环形缓冲区长度时直接跳到最新帧，慢客户端不会拖累其他观看者或流水线。
+    发布与结束时通过 `loop.call_soon_threadsafe` 唤醒各观看者所在事件循环中等待的协程，无需轮询。
+    """
+
+    def __init__(self, capacity: int = 30):
+        if capacity < 1:
+            raise ValueError("广播环形缓冲区容量必须至少为 1")
+        self.capacity = capacity
+        self._ring: Deque[Tuple[int, Any]] = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._closed = False
+        self._subscriptions: Set["FrameSubscription"] = set()
+        self.published = 0
+
+    def publish(self, data: Any) -> Optional[int]:
+        """发布一帧数据（由后处理线程调用，永不阻塞），返回分配的序号；广播器已关闭时返回 None。"""
+        with self._lock:
+            if self._closed:
+                return None
+            self._seq += 1
+            seq = self._seq
+            self._ring.append((self._seq, data))
+            self.published += 1
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.notify()
+        return seq
+
+    def close(self):
+        """标记流已结束（可重复调用）。观看者读完剩余帧后即结束推送。"""
+        with self._lock:
+            self._closed = True
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.notify()
+
+    def subscribe(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> "FrameSubscription":
+        """在当前（或指定的）事件循环中创建一个观看者订阅，从最新帧开始读取。"""
+        subscription = FrameSubscription(self, loop or asyncio.get_running_loop())
+        with self._lock:
+            subscription.cursor = max(self._seq - 1, 0)
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: "FrameSubscription"):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    @property
+    def subscription_count(self) -> int:
+        return len(self._subscriptions)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def latest_seq(self) -> int:
+        return self._seq
+
+    @property
+    def backlog(self) -> int:
+        """最慢的观看者尚未读取的帧数（不超过环形缓冲区中的帧数），即输出端的积压深度。"""
+        with self._lock:
+            cursors = [s.cursor for s in self._subscriptions]
+            if not cursors:
+                return 0
+            return min(self._seq - min(cursors), len(self._ring))
+
+    def read_after(self, cursor: int) -> Tuple[Optional[int], Optional[Any], int]:
+        """
+        读取序号大于 `cursor` 的下一帧。
+        返回 (序号, 数据, 跳过的帧数)；暂无新帧时序号与数据均为 None。
+        """
+        with self._lock:
+            if not self._ring or self._seq <= cursor:
+                return None, None, 0
+            oldest_seq = self._ring[0][0]
+            if cursor + 1 >= oldest_seq:
+                seq, data = self._ring[cursor + 1 - oldest_seq]
+                return seq, data, 0
+            # 游标已落出环形缓冲区：跳到最新帧
+            seq, data = self._ring[-1]
+            return seq, data, max(seq - cursor - 1, 0)
+
+
+class FrameSubscription:
+    """
+    单个观看者的订阅：持有游标，并在所属事件循环中等待新帧。
+    广播器在工作线程中调用 `notify()`，经 `call_soon_threadsafe` 在事件循环内设置事件，
+    从而在帧发布后立即唤醒 `next_frame()`。
+    """
+
+    def __init__(self, broadcaster: FrameBroadcaster, loop: asyncio.AbstractEventLoop):
+        self.broadcaster = broadcaster
+        self.cursor = 0
+        self.skipped = 0
+        self._loop = loop
+        self._event = asyncio.Event()
+
+    def notify(self):
+        """线程安全地唤醒等待中的协程。"""
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            # 事件循环已关闭（应用正在退出）
+            pass
+
+    async def next_frame(self) -> Optional[Any]:
+        """等待并返回下一帧；流结束时返回 None。"""
+        while True:
+            # 先清除事件再读取，保证读取之后发布的帧一定能唤醒下面的 wait
+            self._event.clear()
+            seq, data, lost = self.broadcaster.read_after(self.cursor)
+            if seq is not None:
+                self.cursor = seq
+                self.skipped += lost
+                return data
+            if self.broadcaster.closed:
+                return None
+            await self._event.wait()
+
+    def close(self):
+        self.broadcaster.unsubscribe(self)
@@ -0,0 +1,161 @@
+# app/core/clip_recorder.py
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.cfg.logging import app_logger
+from app.core.clip_writer import ClipWriter
+from app.core.frame_trace import wall_time
+
+
+class EncodedFrameRing:
+    """
+    按时长与字节数双重限定的已编码帧环形缓冲区：保留最近 `seconds` 秒的 JPEG 帧，
+    总字节数超过 `max_bytes` 时同样从最旧的帧开始淘汰。帧为不可变的 bytes，读取时无需拷贝。
+    """
+
+    def __init__(self, seconds: float, max_bytes: int):
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self._frames: Deque[Tuple[float, bytes]] = deque()
+        self.total_bytes = 0
+        self.frames_buffered = 0
+        self.frames_evicted = 0
+
+    def append(self, ts: float, frame: bytes):
+        self._frames.append((ts, frame))
+        self.total_bytes += len(frame)
+        self.frames_buffered += 1
+        frames = self._frames
+        while frames and (frames[0][0] < ts - self.seconds or self.total_bytes > self.max_bytes):
+            self.total_bytes -= len(frames.popleft()[1])
+            self.frames_evicted += 1
+
+    def since(self, ts: float) -> List[Tuple[float, bytes]]:
+        """返回时间戳不早于 `ts` 的所有 (时间戳, 帧)（由旧到新）。"""
+        return [item for item in self._frames if item[0] >= ts]
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    @property
+    def span_seconds(self) -> float:
+        return self._frames[-1][0] - self._frames[0][0] if len(self._frames) > 1 else 0.0
+
+
+class ClipRecorder:
+    """
+    单路流的告警录像：持续把已编码帧（按 `fps` 限速）放入预录环形缓冲区；
+    告警开始时取出最近 `pre_event_seconds` 秒的帧作为片段开头，之后的帧持续追加，
+    直到所有相关告警清除后再录 `post_event_seconds` 秒；片段最长 `max_clip_seconds`，
+    超出时结束当前片段，若告警仍在则无预录地接续一个新片段。
+    期间的多个告警（不同类别）合并进同一个片段。文件写入交给共享的 `ClipWriter` 线程。
+    `on_frame` / `on_alarm_event` 由后处理线程调用，`close` 在流水线停止、工作线程退出后调用。
+    """
+
+    def __init__(self, stream_id: str, source: str, writer: ClipWriter, pre_event_seconds: float = 10.0,
+                 post_event_seconds: float = 10.0, max_clip_seconds: float = 300.0, fps: float = 10.0,
+                 max_buffer_bytes: int = 64 * 2 ** 20):
+        self.stream_id = stream_id
+        self.source = source
+        self.writer = writer
+        self.pre_event_seconds = pre_event_seconds
+        self.post_event_seconds = post_event_seconds
+        self.max_clip_seconds = max_clip_seconds
+        self.frame_interval = 1.0 / fps if fps > 0 else 0.0
+        self.ring = EncodedFrameRing(pre_event_seconds, max_buffer_bytes)
+
+        self._lock = threading.Lock()
+        self._last_frame_ts: Optional[float] = None
+        self._clip: Optional[dict] = None
+        self._clip_started_ts = 0.0
+        self._active_alarms: Dict[str, str] = {}  # alarm_id -> 类别
+        self._stop_at: Optional[float] = None
+        self.clips_started = 0
+
+    def wants_frame(self, ts: float) -> bool:
+        """按录像帧率限速：距上一帧不足一个帧间隔的帧不必编码入缓冲区。"""
+        return self._last_frame_ts is None or ts - self._last_frame_ts >= self.frame_interval * 0.999
+
+    def on_frame(self, ts: float, frame: bytes):
+        """放入一帧已编码的 JPEG（`ts` 为帧的采集时刻，`time.monotonic()`）。"""
+        with self._lock:
+            self._last_frame_ts = ts
+            self.ring.append(ts, frame)
+            if self._clip is None:
+                return
+            self.writer.append(self._clip["clip_id"], frame)
+            if self._stop_at is not None and ts >= self._stop_at:
+                self._finish(ts)
+            elif ts - self._clip_started_ts >= self.max_clip_seconds:
+                self._finish(ts)
+                if self._active_alarms:
+                    self._begin(ts, pre_roll=False)
+
+    def on_alarm_event(self, event: dict, now: float):
+        """
+        处理告警引擎的事件：start 开始（或延续）片段，所有告警 clear 后开始计算后录时长。
+        `now` 为产生事件的帧的采集时刻，与 `on_frame` 的 `ts` 同一时钟，预录与后录都以帧时间计算。
+        """
+        alarm = event["alarm"]
+        with self._lock:
+            if event["event"] == "start":
+                self._active_alarms[alarm["alarm_id"]] = alarm["label"]
+                self._stop_at = None
+                if self._clip is None:
+                    self._begin(now, pre_roll=True)
+                else:
+                    self._clip["alarm_ids"].append(alarm["alarm_id"])
+                    if alarm["label"] not in self._clip["labels"]:
+                        self._clip["labels"].append(alarm["label"])
+            elif event["event"] == "clear":
+                self._active_alarms.pop(alarm["alarm_id"], None)
+                if not self._active_alarms and self._clip is not None:
+                    self._stop_at = now + self.post_event_seconds
+
+    def _begin(self, now: float, pre_roll: bool):
+        pre_frames = self.ring.since(now - self.pre_event_seconds) if pre_roll else []
+        first_ts = pre_frames[0][0] if pre_frames else now
+        self._clip = {
+            "clip_id": uuid.uuid4().hex,
+            "stream_id": self.stream_id,
+            "source": self.source,
+            "started_at": wall_time(first_ts),
+            "alarm_ids": list(self._active_alarms),
+            "labels": list(dict.fromkeys(self._active_alarms.values())),
+        }
+        self._clip_started_ts = now
+        self._stop_at = None
+        self.clips_started += 1
+        self.writer.open_clip(dict(self._clip), [frame for _, frame in pre_frames])
+        app_logger.info(f"【录像 {self.stream_id}】开始片段 {self._clip['clip_id']}（预录 {len(pre_frames)} 帧）。")
+
+    def _finish(self, now: float):
+        clip, self._clip = self._clip, None
+        self._stop_at = None
+        ended_at = wall_time(now)
+        self.writer.close_clip(clip["clip_id"], ended_at=ended_at, alarm_ids=clip["alarm_ids"], labels=clip["labels"])
+        app_logger.info(f"【录像 {self.stream_id}】片段 {clip['clip_id']} 已结束。")
+
+    def close(self):
+        """流结束：立即结束正在录制的片段。"""
+        with self._lock:
+            self._active_alarms.clear()
+            if self._clip is not None:
+                self._finish(time.monotonic())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "recording": self._clip is not None,
+                "current_clip_id": self._clip["clip_id"] if self._clip is not None else None,
+                "clips_started": self.clips_started,
+                "buffer_frames": len(self.ring),
+                "buffer_seconds": round(self.ring.span_seconds, 2),
+                "buffer_mb": round(self.ring.total_bytes / 2 ** 20, 2),
+                "buffer_budget_mb": round(self.ring.max_bytes / 2 ** 20, 2),
+                "frames_buffered": self.ring.frames_buffered,
+                "frames_evicted": self.ring.frames_evicted,
+            }
@@ -0,0 +1,257 @@
+# app/core/clip_writer.py
+import json
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Sequence
+
+from app.cfg.logging import app_logger
+
+INDEX_FILENAME = "index.sqlite3"
+
+_COLUMNS = ("clip_id", "stream_id", "source", "path", "status", "started_at", "ended_at", "alarm_ids", "labels",
+            "frames", "bytes", "frames_dropped")
+
+
+class ClipIndex:
+    """
+    告警录像片段的 SQLite 索引。写入只发生在录像写入线程中，查询来自 API 请求，共用一个连接并以锁串行化。
+    启动时把上次进程异常退出而停留在 'recording' 状态的记录标记为 'interrupted'。
+    """
+
+    def __init__(self, db_path: Path):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS clips ("
+                " clip_id TEXT PRIMARY KEY, stream_id TEXT NOT NULL, source TEXT, path TEXT NOT NULL,"
+                " status TEXT NOT NULL, started_at REAL NOT NULL, ended_at REAL,"
+                " alarm_ids TEXT NOT NULL DEFAULT '[]', labels TEXT NOT NULL DEFAULT '[]',"
+                " frames INTEGER NOT NULL DEFAULT 0, bytes INTEGER NOT NULL DEFAULT 0,"
+                " frames_dropped INTEGER NOT NULL DEFAULT 0)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS clips_stream_started ON clips (stream_id, started_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS clips_started ON clips (started_at)")
+            self._conn.execute("UPDATE clips SET status = 'interrupted' WHERE status = 'recording'")
+
+    def insert(self, clip: dict):
+        row = {**clip, "alarm_ids": json.dumps(clip.get("alarm_ids", [])), "labels": json.dumps(clip.get("labels", []))}
+        columns = [c for c in _COLUMNS if c in row]
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT INTO clips ({', '.join(columns)}) VALUES ({', '.join(':' + c for c in columns)})",
+                {c: row[c] for c in columns},
+            )
+
+    def update(self, clip_id: str, **fields):
+        for key in ("alarm_ids", "labels"):
+            if key in fields:
+                fields[key] = json.dumps(fields[key])
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE clips SET {', '.join(f'{k} = :{k}' for k in fields)} WHERE clip_id = :clip_id",
+                               {**fields, "clip_id": clip_id})
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> dict:
+        clip = dict(row)
+        clip["alarm_ids"] = json.loads(clip["alarm_ids"])
+        clip["labels"] = json.loads(clip["labels"])
+        return clip
+
+    def get(self, clip_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM clips WHERE clip_id = ?", (clip_id,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def query(self, stream_id: Optional[str] = None, label: Optional[str] = None, since: Optional[float] = None,
+              until: Optional[float] = None, limit: int = 50, offset: int = 0) -> List[dict]:
+        """按流、类别与开始时间范围查询片段，按开始时间倒序。"""
+        where, params = [], []
+        if stream_id is not None:
+            where.append("stream_id = ?")
+            params.append(stream_id)
+        if label is not None:
+            where.append("labels LIKE ?")
+            params.append(f'%{json.dumps(label)}%')
+        if since is not None:
+            where.append("started_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("started_at < ?")
+            params.append(until)
+        sql = "SELECT * FROM clips" + (f" WHERE {' AND '.join(where)}" if where else "")
+        sql += " ORDER BY started_at DESC LIMIT ? OFFSET ?"
+        with self._lock:
+            rows = self._conn.execute(sql, (*params, limit, offset)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _OpenClip:
+    __slots__ = ("file", "frames", "bytes")
+
+    def __init__(self, file: BinaryIO):
+        self.file = file
+        self.frames = 0
+        self.bytes = 0
+
+
+class ClipWriter:
+    """
+    所有视频流共享的录像写入线程。流水线只把已编码的 JPEG 帧（bytes，不可变，无需拷贝）放入队列，
+    文件写入与索引更新都在本线程完成，磁盘 I/O 不会阻塞任何流水线线程。
+    片段以 MJPEG 裸流（JPEG 帧首尾相接）写入，不重新编码，可由 ffplay / VLC 直接播放，
+    也可用 `ffmpeg -f mjpeg -r <fps> -i clip.mjpeg -c copy clip.avi` 无损封装。
+    队列中待写入的字节数超过 `max_pending_bytes`（磁盘跟不上）时，新追加的帧被丢弃并计入片段的 frames_dropped。
+    片段索引由调用方持有并负责关闭，写入线程启动前后都可用于查询。
+    """
+
+    def __init__(self, clips_dir: Path, index: ClipIndex, max_pending_bytes: int = 256 * 2 ** 20):
+        self.clips_dir = clips_dir
+        self.clips_dir.mkdir(parents=True, exist_ok=True)
+        self.index = index
+        self.max_pending_bytes = max_pending_bytes
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._pending_bytes = 0
+        self._pending_lock = threading.Lock()
+        self._dropped: Dict[str, int] = {}
+        self._open: Dict[str, _OpenClip] = {}
+        self._thread: Optional[threading.Thread] = None
+
+        self.clips_written = 0
+        self.bytes_written = 0
+        self.frames_dropped = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="ClipWriter", daemon=True)
+        self._thread.start()
+        app_logger.info(f"录像写入线程已启动，片段目录: {self.clips_dir}")
+
+    def stop(self, timeout: float = 10.0):
+        """写完队列中剩余的数据后停止。"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+        self._thread = None
+        app_logger.info("录像写入线程已停止。")
+
+    def _reserve(self, frames: Sequence[bytes]) -> bool:
+        size = sum(len(f) for f in frames)
+        with self._pending_lock:
+            if self._pending_bytes + size > self.max_pending_bytes:
+                return False
+            self._pending_bytes += size
+            return True
+
+    def open_clip(self, clip: dict, frames: Sequence[bytes]):
+        """开始一个片段并写入预录帧。`clip` 为索引记录（至少包含 clip_id、stream_id、started_at）。"""
+        if not self._reserve(frames):
+            self._drop(clip["clip_id"], len(frames))
+            frames = []
+        self._queue.put(("open", clip, list(frames)))
+
+    def append(self, clip_id: str, frame: bytes):
+        if not self._reserve((frame,)):
+            self._drop(clip_id, 1)
+            return
+        self._queue.put(("append", clip_id, frame))
+
+    def close_clip(self, clip_id: str, **fields):
+        """结束片段，`fields` 为需要写回索引的字段（如 ended_at、alarm_ids、labels）。"""
+        self._queue.put(("close", clip_id, fields))
+
+    def _drop(self, clip_id: str, count: int):
+        with self._pending_lock:
+            self._dropped[clip_id] = self._dropped.get(clip_id, 0) + count
+            self.frames_dropped += count
+
+    def _write(self, clip: _OpenClip, frames: Sequence[bytes]):
+        for frame in frames:
+            clip.file.write(frame)
+            clip.frames += 1
+            clip.bytes += len(frame)
+        size = sum(len(f) for f in frames)
+        self.bytes_written += size
+        with self._pending_lock:
+            self._pending_bytes -= size
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            op, key, payload = item
+            try:
+                if op == "open":
+                    self._handle_open(key, payload)
+                elif op == "append":
+                    clip = self._open.get(key)
+                    if clip is not None:
+                        self._write(clip, (payload,))
+                    else:
+                        self._write_discarded((payload,))
+                elif op == "close":
+                    self._handle_close(key, payload)
+            except Exception as e:
+                app_logger.error(f"录像写入线程处理 {op} 失败: {e}")
+        # 正常关闭前，流水线已结束各自的片段；仍未结束的（如写入失败）标记为中断
+        for clip_id in list(self._open):
+            self._handle_close(clip_id, {"status": "interrupted", "ended_at": round(time.time(), 3)})
+
+    def _write_discarded(self, frames: Sequence[bytes]):
+        with self._pending_lock:
+            self._pending_bytes -= sum(len(f) for f in frames)
+
+    def _handle_open(self, clip: dict, frames: List[bytes]):
+        clip_id = clip["clip_id"]
+        stream_dir = self.clips_dir / clip["stream_id"]
+        stream_dir.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(clip["started_at"]))
+        path = stream_dir / f"{stamp}_{clip_id[:8]}.mjpeg"
+        try:
+            handle = _OpenClip(open(path, "wb"))
+        except OSError as e:
+            self._write_discarded(frames)
+            app_logger.error(f"无法创建录像文件 {path}: {e}")
+            return
+        try:
+            self.index.insert({**clip, "path": str(path), "status": "recording"})
+        except Exception:
+            handle.file.close()
+            self._write_discarded(frames)
+            raise
+        self._open[clip_id] = handle
+        self._write(handle, frames)
+
+    def _handle_close(self, clip_id: str, fields: dict):
+        clip = self._open.pop(clip_id, None)
+        if clip is None:
+            return
+        clip.file.close()
+        with self._pending_lock:
+            dropped = self._dropped.pop(clip_id, 0)
+        self.clips_written += 1
+        self.index.update(clip_id, **{"status": "complete", **fields, "frames": clip.frames, "bytes": clip.bytes,
+                                      "frames_dropped": dropped})
+
+    def stats(self) -> dict:
+        with self._pending_lock:
+            pending = self._pending_bytes
+        return {
+            "clips_dir": str(self.clips_dir),
+            "open_clips": len(self._open),
+            "clips_written": self.clips_written,
+            "bytes_written": self.bytes_written,
+            "pending_mb": round(pending / 2 ** 20, 2),
+            "frames_dropped": self.frames_dropped,
+        }
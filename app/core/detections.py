@@ -0,0 +1,156 @@
+# app/core/detections.py
+from typing import Dict, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+
+class DetectionBatch:
+    """
+    单帧检测结果的紧凑容器，由连续的 numpy 数组承载：
+    `boxes` 为 float32 的 Nx4 (x1, y1, x2, y2)，`scores` 为 float32，`class_ids` 为 int32，
+    另记录所属的 `frame_id`，类别名称表 `names` 在同一流的所有批次之间共享；
+    经过多目标跟踪后还带有 int64 的 `track_ids`（未跟踪时为 None）。
+    推理后端的输出（DeGirum 风格的字典列表）只在进入流水线时转换一次，
+    之后的过滤、绘制、跟踪、序列化与统计都直接基于数组完成，不再逐框查字典。
+    """
+    __slots__ = ("boxes", "scores", "class_ids", "frame_id", "names", "track_ids")
+
+    def __init__(self, boxes: np.ndarray, scores: np.ndarray, class_ids: np.ndarray,
+                 frame_id: int = -1, names: Sequence[str] = (), track_ids: Optional[np.ndarray] = None):
+        self.boxes = np.ascontiguousarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.scores = np.ascontiguousarray(scores, dtype=np.float32).reshape(-1)
+        self.class_ids = np.ascontiguousarray(class_ids, dtype=np.int32).reshape(-1)
+        self.frame_id = frame_id
+        self.names = names
+        self.track_ids = None if track_ids is None else np.ascontiguousarray(track_ids, dtype=np.int64).reshape(-1)
+
+    @classmethod
+    def from_arrays(cls, boxes: np.ndarray, scores: np.ndarray, class_ids: np.ndarray,
+                    frame_id: int, names: Sequence[str], track_ids: Optional[np.ndarray] = None) -> "DetectionBatch":
+        """直接包装已是正确类型（float32/int32/int64）与形状的数组，跳过校验与拷贝。"""
+        batch = cls.__new__(cls)
+        batch.boxes, batch.scores, batch.class_ids = boxes, scores, class_ids
+        batch.frame_id, batch.names, batch.track_ids = frame_id, names, track_ids
+        return batch
+
+    @classmethod
+    def empty(cls, frame_id: int = -1, names: Sequence[str] = ()) -> "DetectionBatch":
+        return cls(np.empty((0, 4), np.float32), np.empty(0, np.float32), np.empty(0, np.int32), frame_id, names)
+
+    @classmethod
+    def from_dicts(cls, detections: Optional[List[dict]], frame_id: int = -1,
+                   names: Sequence[str] = ()) -> "DetectionBatch":
+        """
+        从推理后端返回的字典列表（含 'bbox'、'score'、'category_id'、'label'）一次性转换。
+        缺少 category_id 时按 label 在 `names` 中查找，找不到则记为 -1。
+        """
+        if isinstance(detections, DetectionBatch):
+            detections.frame_id = frame_id
+            return detections
+        if not detections:
+            return cls.empty(frame_id, names)
+
+        detections = [d for d in detections if d.get('bbox')]
+        if not detections:
+            return cls.empty(frame_id, names)
+        name_to_id = {name: i for i, name in enumerate(names)}
+        boxes = np.array([d['bbox'] for d in detections], dtype=np.float32)
+        scores = np.array([d.get('score', 0.0) for d in detections], dtype=np.float32)
+        class_ids = np.array(
+            [d['category_id'] if d.get('category_id') is not None else name_to_id.get(d.get('label'), -1)
+             for d in detections],
+            dtype=np.int32,
+        )
+        return cls(boxes, scores, class_ids, frame_id, names)
+
+    def for_frame(self, frame_id: int) -> "DetectionBatch":
+        """返回共享同一组数组、但归属于另一帧的批次（用于沿用上一帧的检测结果）。"""
+        return DetectionBatch.from_arrays(self.boxes, self.scores, self.class_ids, frame_id, self.names,
+                                          self.track_ids)
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def __bool__(self) -> bool:
+        return len(self.scores) > 0
+
+    def select(self, index: Union[np.ndarray, slice]) -> "DetectionBatch":
+        """按布尔掩码或下标数组选出子集，返回新的批次（数组为拷贝）。"""
+        return DetectionBatch.from_arrays(self.boxes[index], self.scores[index], self.class_ids[index],
+                                          self.frame_id, self.names,
+                                          self.track_ids[index] if self.track_ids is not None else None)
+
+    @property
+    def areas(self) -> np.ndarray:
+        wh = np.maximum(self.boxes[:, 2:4] - self.boxes[:, 0:2], 0.0)
+        return wh[:, 0] * wh[:, 1]
+
+    @property
+    def labels(self) -> List[str]:
+        names = self.names
+        return [names[c] if 0 <= c < len(names) else str(c) for c in self.class_ids.tolist()]
+
+    def label_of(self, class_id: int) -> str:
+        return self.names[class_id] if 0 <= class_id < len(self.names) else str(class_id)
+
+    def filter_scores(self, thresholds: Union[float, Mapping[str, float], np.ndarray],
+                      default: float = 0.0) -> "DetectionBatch":
+        """
+        按置信度过滤。`thresholds` 可以是统一阈值、{类别名: 阈值}（未列出的类别使用 `default`），
+        或由 `score_threshold_table` 预先生成的阈值表（每帧都要过滤时应预先生成并复用）。
+        """
+        if not len(self):
+            return self
+        if isinstance(thresholds, Mapping):
+            thresholds = score_threshold_table(self.names, thresholds, default)
+        if isinstance(thresholds, np.ndarray):
+            # 未知类别（-1 或越界）映射到表尾的默认阈值
+            unknown = len(thresholds) - 1
+            ids = self.class_ids
+            if ids.min() < 0 or ids.max() >= unknown:
+                ids = np.where((ids >= 0) & (ids < unknown), ids, unknown)
+            keep = self.scores >= thresholds[ids]
+        else:
+            keep = self.scores >= thresholds
+        return self if keep.all() else self.select(keep)
+
+    def filter_min_area(self, min_area: float) -> "DetectionBatch":
+        """丢弃面积（像素²）小于 `min_area` 的检测框。"""
+        if not len(self) or min_area <= 0:
+            return self
+        keep = self.areas >= min_area
+        return self if keep.all() else self.select(keep)
+
+    def count_by_label(self) -> Dict[str, int]:
+        """按类别统计检测框数量。"""
+        if not len(self):
+            return {}
+        ids = self.class_ids
+        if ids.min() >= 0:
+            counts = np.bincount(ids).tolist()
+            return {self.label_of(i): n for i, n in enumerate(counts) if n}
+        ids, counts = np.unique(ids, return_counts=True)
+        return {self.label_of(int(i)): int(n) for i, n in zip(ids, counts)}
+
+    def to_dicts(self) -> List[dict]:
+        """转换为可 JSON 序列化的字典列表（用于事件推送等对外输出）；跟踪后的批次额外带有 'track_id'。"""
+        boxes = np.round(self.boxes.astype(np.float64), 1).tolist()
+        scores = np.round(self.scores.astype(np.float64), 4).tolist()
+        dicts = [
+            {"bbox": box, "score": score, "category_id": class_id, "label": label}
+            for box, score, class_id, label in zip(boxes, scores, self.class_ids.tolist(), self.labels)
+        ]
+        if self.track_ids is not None:
+            for det, track_id in zip(dicts, self.track_ids.tolist()):
+                det["track_id"] = track_id
+        return dicts
+
+
+def score_threshold_table(names: Sequence[str], thresholds: Mapping[str, float], default: float) -> np.ndarray:
+    """
+    把 {类别名: 阈值} 展开为按 class_id 索引的阈值数组，末尾多出一项作为未知类别的默认阈值。
+    """
+    table = np.full(len(names) + 1, default, dtype=np.float32)
+    for i, name in enumerate(names):
+        table[i] = thresholds.get(name, default)
+    return table
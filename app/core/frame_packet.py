@@ -0,0 +1,41 @@
+# app/core/frame_packet.py
+import time
+from typing import Optional
+
+import numpy as np
+
+from app.core.detections import DetectionBatch
+from app.core.frame_pool import FrameSlot
+from app.core.frame_trace import FrameTrace
+
+
+class FramePacket:
+    """
+    在流水线各阶段之间传递的帧数据包。
+    `capture_ts` 为读帧时刻的 `time.monotonic()`，用于计算帧龄并丢弃过期帧；`pts` 为该帧在源时间轴上的时间戳（秒）。
+    若帧数组来自帧缓冲池，`slot` 为对应槽位；数据包不再被需要时（编码完成或被丢弃）必须调用 `release()`。
+    `roi` 为预处理阶段取到的感兴趣区域快照，保证同一帧的裁剪与结果过滤使用同一组多边形。
+    `trace` 记录该帧经过各阶段的时刻（`grabbed_ts` 为开始解码的时刻），用于分段延迟统计。
+    """
+    __slots__ = ("frame_id", "frame", "capture_ts", "detections", "slot", "pts", "roi", "trace")
+
+    def __init__(self, frame_id: int, frame: np.ndarray, capture_ts: Optional[float] = None,
+                 slot: Optional[FrameSlot] = None, pts: Optional[float] = None, grabbed_ts: Optional[float] = None):
+        self.frame_id = frame_id
+        self.frame = frame
+        self.capture_ts = capture_ts if capture_ts is not None else time.monotonic()
+        self.detections: Optional[DetectionBatch] = None
+        self.slot = slot
+        self.pts = pts
+        self.roi = None
+        self.trace = FrameTrace(self.capture_ts, grabbed_ts)
+
+    def release(self):
+        """把帧数组归还到缓冲池。可重复调用。"""
+        slot, self.slot = self.slot, None
+        if slot is not None:
+            slot.release()
+
+    def age(self, now: Optional[float] = None) -> float:
+        """帧自采集以来经过的秒数。"""
+        return (now if now is not None else time.monotonic()) - self.capture_ts
@@ -0,0 +1,135 @@
+# app/core/frame_pool.py
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.cfg.logging import app_logger
+
+
+class FrameMemoryBudget:
+    """
+    所有视频流共享的帧缓冲内存预算。
+    每个流的缓冲池在分配槽位前先向预算申请字节数，预算不足时该流只能分配更少的槽位，
+    超出部分退回到按帧临时分配，从而给整个进程的帧内存设定上限。
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, nbytes: int) -> bool:
+        with self._lock:
+            if self.used_bytes + nbytes > self.budget_bytes:
+                return False
+            self.used_bytes += nbytes
+            return True
+
+    def release(self, nbytes: int):
+        with self._lock:
+            self.used_bytes = max(self.used_bytes - nbytes, 0)
+
+
+class FrameSlot:
+    """缓冲池中的一个槽位，持有一块可复用的帧数组。"""
+    __slots__ = ("pool", "array", "generation")
+
+    def __init__(self, pool: "FrameBufferPool", array: np.ndarray, generation: int):
+        self.pool = pool
+        self.array = array
+        self.generation = generation
+
+    def release(self):
+        self.pool.release(self)
+
+
+class FrameBufferPool:
+    """
+    单个视频流的预分配帧缓冲池，槽位数固定。
+    读帧线程把帧直接解码进空闲槽位的数组（`cap.retrieve(image=...)`），
+    帧在后处理完成编码（或在任一阶段被丢弃）后归还槽位，稳态下不再为每帧分配新的大数组。
+    分辨率变化时整池按新尺寸重建；没有空闲槽位时 `acquire` 返回 None，由调用方临时分配。
+    """
+
+    def __init__(self, name: str, slot_count: int, budget: Optional[FrameMemoryBudget] = None):
+        self.name = name
+        self.slot_count = slot_count
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._free: List[FrameSlot] = []
+        self._shape: Optional[Tuple[int, ...]] = None
+        self._generation = 0
+        self._allocated_slots = 0
+        self._reserved_bytes = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.reused = 0
+        self.fallback_allocations = 0
+        self.bytes_avoided = 0
+
+    def _configure(self, shape: Tuple[int, ...]):
+        """按新的帧尺寸重建缓冲池。调用方需持有锁。"""
+        self._free.clear()
+        if self.budget is not None and self._reserved_bytes:
+            self.budget.release(self._reserved_bytes)
+        self._reserved_bytes = 0
+        self._generation += 1
+        self._shape = shape
+
+        frame_bytes = int(np.prod(shape))
+        slots = self.slot_count
+        if self.budget is not None:
+            while slots > 0 and not self.budget.reserve(slots * frame_bytes):
+                slots -= 1
+            if slots < self.slot_count:
+                app_logger.warning(f"【帧缓冲池 {self.name}】内存预算不足，仅分配 {slots}/{self.slot_count} 个槽位。")
+        self._reserved_bytes = slots * frame_bytes
+        self._allocated_slots = slots
+        self._free = [FrameSlot(self, np.empty(shape, dtype=np.uint8), self._generation) for _ in range(slots)]
+
+    def acquire(self, shape: Tuple[int, ...]) -> Optional[FrameSlot]:
+        """获取一个指定尺寸的空闲槽位；没有空闲槽位时返回 None。"""
+        with self._lock:
+            if shape != self._shape:
+                self._configure(shape)
+            if not self._free:
+                self.fallback_allocations += 1
+                return None
+            slot = self._free.pop()
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+            self.reused += 1
+            self.bytes_avoided += slot.array.nbytes
+            return slot
+
+    def release(self, slot: FrameSlot):
+        """归还槽位。尺寸变化前分配的旧槽位直接丢弃。"""
+        with self._lock:
+            self.in_use = max(self.in_use - 1, 0)
+            if slot.generation == self._generation and len(self._free) < self._allocated_slots:
+                self._free.append(slot)
+
+    def close(self):
+        """释放全部槽位，并把预留的内存归还给全局预算。"""
+        with self._lock:
+            self._free.clear()
+            if self.budget is not None and self._reserved_bytes:
+                self.budget.release(self._reserved_bytes)
+            self._reserved_bytes = 0
+            self._allocated_slots = 0
+            self._generation += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "slots": self._allocated_slots,
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                "reused": self.reused,
+                "fallback_allocations": self.fallback_allocations,
+                "allocated_mb": round(self._reserved_bytes / 2 ** 20, 2),
+                "allocation_avoided_mb": round(self.bytes_avoided / 2 ** 20, 2),
+                "budget_used_mb": round(self.budget.used_bytes / 2 ** 20, 2) if self.budget else None,
+                "budget_total_mb": round(self.budget.budget_bytes / 2 ** 20, 2) if self.budget else None,
+            }
@@ -0,0 +1,221 @@
+# app/core/frame_trace.py
+import json
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Sequence, TextIO, Union
+
+import numpy as np
+
+from app.cfg.logging import app_logger
+
+
+def wall_time(ts: float) -> float:
+    """把 `time.monotonic()` 时刻换算为墙钟时间（Unix 秒）。"""
+    return round(time.time() - (time.monotonic() - ts), 3)
+
+
+def latency_summary(seconds: Union[np.ndarray, Sequence[float]]) -> dict:
+    """一组耗时（秒，忽略 NaN）的样本数、均值、p50/p95/p99 与最大值（毫秒），没有样本时各统计值为 None。"""
+    values = np.asarray(seconds, dtype=np.float64).reshape(-1)
+    values = values[~np.isnan(values)] * 1000
+    if not values.size:
+        return {"count": 0, "mean_ms": None, "p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    p50, p95, p99 = np.percentile(values, (50, 95, 99))
+    return {
+        "count": int(values.size),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+class FrameTrace:
+    """
+    随帧数据包在各阶段之间传递的追踪记录，各字段为对应时刻的 `time.monotonic()`，未经过的阶段为 None：
+    - grabbed: 读帧线程 grab 完成、开始解码；captured: 解码完成（即数据包的 capture_ts）；
+    - dequeued: 推理线程从推理邮箱取出；infer_start / infer_end: 提交推理与结果返回；
+    - encode_end: 后处理完成（需要输出画面时为 JPEG 编码完成）；first_write: 首个观看者把该帧写出到连接。
+    """
+    __slots__ = ("grabbed", "captured", "dequeued", "infer_start", "infer_end", "encode_end", "first_write")
+
+    def __init__(self, captured: float, grabbed: Optional[float] = None):
+        self.grabbed = grabbed if grabbed is not None else captured
+        self.captured = captured
+        self.dequeued: Optional[float] = None
+        self.infer_start: Optional[float] = None
+        self.infer_end: Optional[float] = None
+        self.encode_end: Optional[float] = None
+        self.first_write: Optional[float] = None
+
+
+# 分段定义：(名称, 起点字段, 终点字段)，任一端缺失的分段不计入
+SEGMENTS = (
+    ("decode", "grabbed", "captured"),          # 解码
+    ("queue", "captured", "dequeued"),          # 预处理与排队等待推理
+    ("infer", "infer_start", "infer_end"),      # 推理（调度模式下含调度器排队）
+    ("postprocess", "infer_end", "encode_end"), # 后处理排队、绘制与编码
+    ("deliver", "encode_end", "first_write"),   # 广播到首个观看者写出
+    ("pipeline", "grabbed", "encode_end"),      # 流水线内总耗时
+    ("end_to_end", "grabbed", "first_write"),   # 读帧到观看者写出
+)
+_SEGMENT_NAMES = tuple(name for name, _, _ in SEGMENTS)
+
+
+class TraceExporter:
+    """
+    逐帧追踪记录的 JSONL 导出（所有视频流共享一个文件）。
+    只有抽样命中的帧才会写入，写入为带缓冲的追加，不做逐行 flush；停止时关闭文件。
+    """
+
+    def __init__(self, path: Path, sample_rate: float):
+        self.path = path
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self._file: Optional[TextIO] = None
+        self.records_written = 0
+
+    def sampled(self) -> bool:
+        return random.random() < self.sample_rate
+
+    def write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                try:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    self._file = open(self.path, "a", encoding="utf-8")
+                except OSError as e:
+                    app_logger.error(f"无法打开追踪记录导出文件 {self.path}: {e}")
+                    self.sample_rate = 0.0
+                    return
+                app_logger.info(f"逐帧追踪记录导出到: {self.path}（抽样比例 {self.sample_rate:g}）")
+            self._file.write(line)
+            self.records_written += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class FrameTracer:
+    """
+    单路流的逐帧延迟统计：帧完成后把各分段耗时写入 [window, 分段数] 的滚动窗口（一次整行赋值），
+    查询时对窗口按列求 p50/p95/p99。
+    发布给观看者的帧暂存在按广播序号索引的待写出表中，首个观看者写出时补全 first_write 后才计入窗口；
+    表的长度以广播环形缓冲区容量为上限，始终无人写出的帧被挤出时按未写出计入。
+    广播器发布时即唤醒观看者，观看者可能先于 `finish` 写出该帧，此时写出时刻先记在同样有界的表中，由 `finish` 取用。
+    `finish` 由后处理线程调用，`on_write` 由观看者所在的事件循环调用，二者以锁保护。
+    """
+
+    def __init__(self, stream_id: str, window: int = 1000, pending_capacity: int = 30,
+                 exporter: Optional[TraceExporter] = None):
+        self.stream_id = stream_id
+        self.window = window
+        self.pending_capacity = pending_capacity
+        self.exporter = exporter
+        self._lock = threading.Lock()
+        self._samples = np.full((window, len(SEGMENTS)), np.nan, dtype=np.float64)
+        self._pos = 0
+        self._pending: Dict[int, tuple] = {}
+        self._early_writes: Dict[int, float] = {}
+        self.frames_traced = 0
+
+    def finish(self, frame_id: int, trace: FrameTrace, pts: Optional[float] = None, seq: Optional[int] = None):
+        """
+        一帧在后处理阶段完成；`seq` 为该帧 JPEG 在广播器中的序号（未发布给观看者时为 None）。
+        发布给观看者的帧应在发布前标记 encode_end，未标记时取当前时刻。
+        """
+        if trace.encode_end is None:
+            trace.encode_end = time.monotonic()
+        if seq is None:
+            self._record(frame_id, trace, pts)
+            return
+        with self._lock:
+            evicted = None
+            trace.first_write = self._early_writes.pop(seq, None)
+            if trace.first_write is None:
+                self._pending[seq] = (frame_id, trace, pts)
+                if len(self._pending) > self.pending_capacity:
+                    evicted = self._pending.pop(next(iter(self._pending)))
+        if trace.first_write is not None:
+            self._record(frame_id, trace, pts)
+        if evicted is not None:
+            self._record(*evicted)
+
+    def on_write(self, seq: int):
+        """观看者已把序号为 `seq` 的帧写出到连接；只有首个写出的观看者会被记录。"""
+        now = time.monotonic()
+        with self._lock:
+            item = self._pending.pop(seq, None)
+            if item is None:
+                # 尚未 finish（或已被其他观看者写出）：先记下时刻，表满时淘汰最旧的
+                self._early_writes.setdefault(seq, now)
+                if len(self._early_writes) > self.pending_capacity:
+                    self._early_writes.pop(next(iter(self._early_writes)))
+        if item is not None:
+            item[1].first_write = now
+            self._record(*item)
+
+    def _record(self, frame_id: int, trace: FrameTrace, pts: Optional[float]):
+        row = [
+            getattr(trace, end) - getattr(trace, start)
+            if getattr(trace, start) is not None and getattr(trace, end) is not None else np.nan
+            for _, start, end in SEGMENTS
+        ]
+        with self._lock:
+            self._samples[self._pos] = row
+            self._pos = (self._pos + 1) % self.window
+            self.frames_traced += 1
+        if self.exporter is not None and self.exporter.sampled():
+            self.exporter.write(self._export_record(frame_id, trace, pts, row))
+
+    def _export_record(self, frame_id: int, trace: FrameTrace, pts: Optional[float], row) -> dict:
+        origin = trace.grabbed
+        return {
+            "stream_id": self.stream_id,
+            "frame_id": frame_id,
+            "pts": round(pts, 3) if pts is not None else None,
+            # grab 时刻的墙钟时间（Unix 秒）
+            "timestamp": wall_time(origin),
+            # 各时刻相对 grab 的偏移（毫秒）
+            "trace_ms": {
+                field: round((getattr(trace, field) - origin) * 1000, 3) if getattr(trace, field) is not None else None
+                for field in FrameTrace.__slots__
+            },
+            "segments_ms": {
+                name: round(value * 1000, 3) if value == value else None for name, value in zip(_SEGMENT_NAMES, row)
+            },
+        }
+
+    def samples(self, segment: str) -> np.ndarray:
+        """返回滚动窗口内某一分段的全部样本（秒），供跨流汇总分位数使用。"""
+        column = _SEGMENT_NAMES.index(segment)
+        with self._lock:
+            values = self._samples[:, column].copy()
+        return values[~np.isnan(values)]
+
+    def reset(self):
+        """清空滚动窗口（如基准测试预热结束时）。"""
+        with self._lock:
+            self._samples.fill(np.nan)
+            self._pos = 0
+
+    def stats(self) -> dict:
+        """各分段在滚动窗口内的样本数、均值、p50/p95/p99 与最大值（毫秒）。"""
+        with self._lock:
+            samples = self._samples.copy()
+            pending = len(self._pending)
+            traced = self.frames_traced
+        segments = {name: latency_summary(samples[:, i]) for i, name in enumerate(_SEGMENT_NAMES)}
+        return {
+            "window_frames": self.window,
+            "frames_traced": traced,
+            "pending_writes": pending,
+            "segments": segments,
+        }
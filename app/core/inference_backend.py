@@ -0,0 +1,328 @@
+# app/core/inference_backend.py
+import json
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Type, Union
+
+import cv2
+import numpy as np
+
+from app.cfg.config import AppSettings, MODEL_ZOO_DIR
+from app.cfg.logging import app_logger
+from app.core.detections import DetectionBatch
+from app.core.postprocess import postprocess_yolov8
+
+
+class InferenceResult:
+    """
+    统一的推理结果容器。
+    与 DeGirum 的 `InferenceResults` 保持相同的访问方式（`.results`），
+    这样流水线无需关心底层使用的是哪一种推理后端。
+    每个检测结果是一个字典：{'bbox': [x1, y1, x2, y2], 'score': float, 'category_id': int, 'label': str}；
+    自带向量化后处理的后端（如 ONNX Runtime）也可以直接返回 DetectionBatch，流水线会原样接收。
+    """
+    __slots__ = ("results", "info")
+
+    def __init__(self, results: Union[List[dict], DetectionBatch], info: Any = None):
+        self.results = results
+        self.info = info
+
+
+def load_model_labels(settings: AppSettings) -> List[str]:
+    """
+    读取模型仓库中与检测模型配套的标签文件，返回按 category_id 排序的类别名称列表。
+    DeGirum 后端直接使用该文件；CPU 后端也据此保证类别顺序与 Hailo 模型一致。
+    找不到标签文件时，回退到配置中的 `class_names`。
+    """
+    model_dir = MODEL_ZOO_DIR / settings.hailo.detection_model_name
+    for labels_path in sorted(model_dir.glob("labels_*.json")):
+        try:
+            with open(labels_path, "r", encoding="utf-8") as f:
+                labels = json.load(f)
+            return [labels[k] for k in sorted(labels, key=int)]
+        except Exception as e:
+            app_logger.warning(f"读取标签文件 {labels_path} 失败: {e}，将使用配置中的 class_names。")
+    return list(settings.hailo.class_names)
+
+
+def load_model_input_size(settings: AppSettings) -> Tuple[int, int]:
+    """
+    读取模型仓库中检测模型 JSON 的 `PRE_PROCESS`，返回模型输入尺寸 (宽, 高)。
+    找不到或解析失败时回退到 (640, 640)。
+    """
+    model_dir = MODEL_ZOO_DIR / settings.hailo.detection_model_name
+    model_json = model_dir / f"{settings.hailo.detection_model_name}.json"
+    try:
+        with open(model_json, "r", encoding="utf-8") as f:
+            pre_process = json.load(f)["PRE_PROCESS"][0]
+        return int(pre_process["InputW"]), int(pre_process["InputH"])
+    except Exception as e:
+        app_logger.warning(f"读取模型输入尺寸失败 ({model_json}): {e}，将使用 640x640。")
+        return 640, 640
+
+
+def backend_score_threshold(settings: AppSettings) -> float:
+    """
+    推理后端输出检测框的最低得分：取 confidence_threshold、按类别阈值与自适应帧率疑似阈值中的最小值。
+    低于正式阈值的框也会到达流水线，用于判定疑似目标；正式阈值（含按类别阈值）由流水线统一过滤。
+    """
+    hailo = settings.hailo
+    return min([hailo.confidence_threshold, settings.app.adaptive_suspicion_threshold,
+                *hailo.class_confidence_thresholds.values()])
+
+
+class InferenceBackend(ABC):
+    """
+    推理后端的抽象基类。
+    ModelPool 中的每一个“模型实例”都是一个后端对象，VideoStreamPipeline 只通过此接口与之交互。
+    """
+    name: str = "base"
+
+    def __init__(self, settings: AppSettings):
+        self.settings = settings
+        self.hailo_settings = settings.hailo
+        self.labels = load_model_labels(settings)
+        self.score_threshold = backend_score_threshold(settings)
+
+    @abstractmethod
+    def predict(self, frame: np.ndarray) -> InferenceResult:
+        """对单帧（BGR, HWC, uint8）执行推理，返回原始帧坐标系下的检测结果。"""
+
+    def predict_batch(self, source: Iterable[Tuple[np.ndarray, Any]]) -> Iterator[InferenceResult]:
+        """
+        流式批量推理（与 DeGirum `predict_batch` 语义一致）。
+        从 `source` 逐个取出 (frame, info)，按输入顺序产出结果，`result.info` 为对应帧的 info。
+        默认实现逐帧调用 `predict`，没有流水并行；支持多帧在途的后端应重写此方法。
+        """
+        for frame, info in source:
+            result = self.predict(frame)
+            result.info = info
+            yield result
+
+    def close(self):
+        """释放后端持有的资源。默认无操作。"""
+
+    def _make_detection(self, box, score: float, class_id: int) -> dict:
+        """构造与 DeGirum 输出格式一致的检测结果字典。"""
+        class_id = int(class_id)
+        label = self.labels[class_id] if 0 <= class_id < len(self.labels) else str(class_id)
+        return {
+            'bbox': [float(v) for v in box],
+            'score': float(score),
+            'category_id': class_id,
+            'label': label,
+        }
+
+
+class DegirumBackend(InferenceBackend):
+    """基于 DeGirum PySDK 的 Hailo-8 推理后端。"""
+    name = "degirum"
+
+    def __init__(self, settings: AppSettings):
+        super().__init__(settings)
+        # 延迟导入：在没有安装 DeGirum / Hailo 运行时的机器上，其它后端依然可用
+        import degirum as dg
+
+        model = dg.load_model(
+            model_name=self.hailo_settings.detection_model_name,
+            inference_host_address=dg.LOCAL,
+            zoo_url=self.hailo_settings.zoo_url,
+            image_backend='opencv'
+        )
+        if not model:
+            raise ConnectionError("dg.load_model 返回 None，无法加载模型。")
+
+        # 在模型加载后，将其作为对象属性进行设置
+        # 这种模式更符合Pythonic的风格，即将对象创建和配置分离
+        try:
+            model.confidence_threshold = self.score_threshold
+            # 注意：属性名通常是 'nms_threshold' 而不是 'iou_threshold'
+            model.nms_threshold = self.hailo_settings.iou_threshold
+        except Exception as e:
+            app_logger.error(f"设置模型推理参数时出错: {e}。将使用模型的默认阈值。")
+
+        # predict_batch 模式下，设备内部帧队列的深度决定了同时在途的帧数
+        try:
+            model.frame_queue_depth = settings.app.inference_inflight_depth
+        except Exception as e:
+            app_logger.warning(f"设置模型帧队列深度时出错: {e}。将使用模型的默认值。")
+
+        self.model = model
+
+    def predict(self, frame: np.ndarray) -> InferenceResult:
+        result = self.model.predict(frame)
+        return InferenceResult(result.results)
+
+    def predict_batch(self, source: Iterable[Tuple[np.ndarray, Any]]) -> Iterator[InferenceResult]:
+        # DeGirum 在内部线程中消费 source，使多帧同时在 Hailo 上流水执行，结果按输入顺序返回
+        for result in self.model.predict_batch(source):
+            yield InferenceResult(result.results, result.info)
+
+    def close(self):
+        self.model = None
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """
+    基于 ONNX Runtime 的 CPU 推理后端。
+    预处理（Letterbox）逻辑来自 `test/onnx_test.py::YOLO_ONNX_Detector`，后处理（解码 + 按类别 NMS）
+    使用 `app.core.postprocess` 的向量化实现，直接产出 DetectionBatch。
+    模型为 Ultralytics 导出的 YOLOv8 ONNX（输出形状 [1, 4 + num_classes, num_proposals]）。
+    """
+    name = "onnx"
+
+    def __init__(self, settings: AppSettings):
+        super().__init__(settings)
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("onnxruntime 未安装，请运行 'pip install onnxruntime'。") from e
+
+        model_path = Path(self.hailo_settings.onnx_model_path)
+        if not model_path.is_file():
+            raise FileNotFoundError(f"ONNX 模型文件不存在: {model_path}")
+
+        available = ort.get_available_providers()
+        providers = [p for p in self.hailo_settings.onnx_providers if p in available] or ['CPUExecutionProvider']
+
+        options = ort.SessionOptions()
+        if self.hailo_settings.onnx_num_threads > 0:
+            options.intra_op_num_threads = self.hailo_settings.onnx_num_threads
+
+        self.session = ort.InferenceSession(str(model_path), sess_options=options, providers=providers)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # 例如 [1, 3, 640, 640]；动态维度时回退到 640
+        self.input_height = model_input.shape[2] if isinstance(model_input.shape[2], int) else 640
+        self.input_width = model_input.shape[3] if isinstance(model_input.shape[3], int) else 640
+        self.conf_threshold = self.score_threshold
+        self.iou_threshold = self.hailo_settings.iou_threshold
+        app_logger.info(f"ONNX Runtime 后端已加载: {model_path.name}，设备: {self.session.get_providers()[0]}")
+
+    def _preprocess(self, image: np.ndarray):
+        """对输入图像进行预处理 (Letterbox)"""
+        img_h, img_w = image.shape[:2]
+
+        # 计算缩放比例，并保持宽高比
+        scale = min(self.input_width / img_w, self.input_height / img_h)
+        new_w, new_h = int(img_w * scale), int(img_h * scale)
+        resized_img = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+        # 创建一个灰色画布，并将缩放后的图像粘贴到中心
+        padded_img = np.full((self.input_height, self.input_width, 3), 114, dtype=np.uint8)
+        dw, dh = (self.input_width - new_w) // 2, (self.input_height - new_h) // 2
+        padded_img[dh:dh + new_h, dw:dw + new_w, :] = resized_img
+
+        # 转换 BGR -> RGB, HWC -> CHW, 归一化, 并增加batch维度
+        input_tensor = np.ascontiguousarray(padded_img[:, :, ::-1].transpose(2, 0, 1), dtype=np.float32)
+        input_tensor /= 255.0
+        return input_tensor[np.newaxis, ...], scale, dw, dh
+
+    def _postprocess(self, output: np.ndarray, scale: float, dw: int, dh: int) -> DetectionBatch:
+        """对模型输出进行后处理：置信度过滤、坐标还原与按类别 NMS。"""
+        return postprocess_yolov8(
+            output, self.conf_threshold, self.iou_threshold,
+            scales=np.array([scale]), pads=np.array([[dw, dh]]), names=self.labels,
+        )[0]
+
+    def predict(self, frame: np.ndarray) -> InferenceResult:
+        input_tensor, scale, dw, dh = self._preprocess(frame)
+        outputs = self.session.run(None, {self.input_name: input_tensor})
+        return InferenceResult(self._postprocess(outputs[0], scale, dw, dh))
+
+    def close(self):
+        self.session = None
+
+
+class SyntheticBackend(InferenceBackend):
+    """
+    合成推理后端：不依赖任何模型文件或硬件，按配置模拟推理延迟并生成随机检测框。
+    用于在 CI / 预发布节点上对流水线进行基准测试和压测。
+    """
+    name = "synthetic"
+
+    def __init__(self, settings: AppSettings):
+        super().__init__(settings)
+        self.latency_s = self.hailo_settings.synthetic_latency_ms / 1000.0
+        self.jitter_s = self.hailo_settings.synthetic_latency_jitter_ms / 1000.0
+        self.distribution = self.hailo_settings.synthetic_latency_distribution
+        self.detection_rate = self.hailo_settings.synthetic_detection_rate
+        self.max_detections = self.hailo_settings.synthetic_max_detections
+        self.rng = np.random.default_rng(self.hailo_settings.synthetic_seed)
+
+    def _next_latency(self) -> float:
+        latency = self.latency_s
+        if self.jitter_s <= 0:
+            return latency
+        if self.distribution == "normal":
+            latency += self.rng.normal(0.0, self.jitter_s)
+        elif self.distribution == "lognormal" and latency > 0:
+            latency *= float(np.exp(self.rng.normal(0.0, self.jitter_s / latency)))
+        else:
+            latency += self.rng.uniform(-self.jitter_s, self.jitter_s)
+        return max(latency, 0.0)
+
+    def _generate_detections(self, frame: np.ndarray) -> List[dict]:
+        if self.max_detections <= 0 or self.rng.random() >= self.detection_rate:
+            return []
+
+        img_h, img_w = frame.shape[:2]
+        count = int(self.rng.integers(1, self.max_detections + 1))
+        # 随机生成左上角与宽高，保证框落在图像范围内
+        wh = self.rng.uniform(0.05, 0.3, size=(count, 2)) * (img_w, img_h)
+        xy1 = self.rng.uniform(0.0, 1.0, size=(count, 2)) * ((img_w, img_h) - wh)
+        boxes = np.concatenate([xy1, xy1 + wh], axis=1)
+        scores = self.rng.uniform(self.score_threshold, 1.0, size=count)
+        class_ids = self.rng.integers(0, max(len(self.labels), 1), size=count)
+        return [self._make_detection(b, s, c) for b, s, c in zip(boxes, scores, class_ids)]
+
+    def predict(self, frame: np.ndarray) -> InferenceResult:
+        latency = self._next_latency()
+        if latency > 0:
+            time.sleep(latency)
+        return InferenceResult(self._generate_detections(frame))
+
+    def predict_batch(self, source: Iterable[Tuple[np.ndarray, Any]]) -> Iterator[InferenceResult]:
+        """
+        模拟硬件流水线：喂帧线程持续提交，每帧在提交后经过设定延迟即可返回，
+        因此多帧可同时在途，结果仍按提交顺序产出。在途帧数由 source 一侧控制。
+        """
+        pending: queue.Queue = queue.Queue()
+        done = object()
+
+        def feeder():
+            try:
+                for frame, info in source:
+                    pending.put((time.monotonic() + self._next_latency(), frame, info))
+            finally:
+                pending.put(done)
+
+        threading.Thread(target=feeder, name="synthetic-feeder", daemon=True).start()
+        while True:
+            item = pending.get()
+            if item is done:
+                break
+            ready_at, frame, info = item
+            delay = ready_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            yield InferenceResult(self._generate_detections(frame), info)
+
+
+BACKENDS: Dict[str, Type[InferenceBackend]] = {
+    DegirumBackend.name: DegirumBackend,
+    OnnxRuntimeBackend.name: OnnxRuntimeBackend,
+    SyntheticBackend.name: SyntheticBackend,
+}
+
+
+def create_inference_backend(settings: AppSettings, backend_name: Optional[str] = None) -> InferenceBackend:
+    """根据配置（或显式指定的名称）创建一个推理后端实例。"""
+    name = (backend_name or settings.hailo.backend).lower()
+    backend_cls = BACKENDS.get(name)
+    if backend_cls is None:
+        raise ValueError(f"未知的推理后端: '{name}'，可选值: {list(BACKENDS)}")
+    return backend_cls(settings)
@@ -0,0 +1,286 @@
+# app/core/inference_scheduler.py
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import numpy as np
+
+from app.cfg.config import AppSettings
+from app.cfg.logging import app_logger
+from app.core.inference_backend import InferenceBackend, InferenceResult
+from app.core.model_manager import ModelPool
+
+
+class InferenceRequest:
+    """
+    提交给调度器的推理请求。通常为单帧；分块推理时为同一帧的一组图块（`grouped=True`），
+    组内的图块总是在同一个微批中执行，结果一并返回。
+    """
+    __slots__ = ("stream_id", "frames", "grouped", "info", "callback", "on_dispatch", "submitted_at")
+
+    def __init__(self, stream_id: str, frames: List[np.ndarray], info: Any,
+                 callback: Callable[[Optional[InferenceResult], Any], None], grouped: bool = False,
+                 on_dispatch: Optional[Callable[[], None]] = None):
+        self.stream_id = stream_id
+        self.frames = frames
+        self.grouped = grouped
+        self.info = info
+        self.callback = callback
+        self.on_dispatch = on_dispatch
+        self.submitted_at = time.monotonic()
+
+
+class _StreamSchedulerStats:
+    """调度器视角下单个流的计数器。调用方需持有调度器的锁。"""
+    __slots__ = ("submitted", "completed", "running", "wait_sum", "wait_max")
+
+    def __init__(self):
+        self.submitted = 0
+        self.completed = 0
+        self.running = 0  # 已发出、结果尚未返回的请求数
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+
+
+class InferenceScheduler:
+    """
+    跨流批处理推理调度服务。
+    调度器独占模型池中的全部模型实例，接收任意数量流水线提交的帧，
+    按轮询方式从各流取帧组成微批（达到 `max_batch_size`、所有空闲的流都已提交，或最早请求等待超过 `batch_timeout` 即发出），
+    由每个模型实例对应的工作线程执行推理，并通过回调把结果路由回各自流水线的后处理阶段。
+    为保证单流内结果有序，每个微批中同一个流最多只有一帧。
+    """
+
+    def __init__(self, settings: AppSettings, model_pool: ModelPool):
+        self.settings = settings
+        self.model_pool = model_pool
+        self.max_batch_size = settings.app.scheduler_max_batch_size
+        self.batch_timeout = settings.app.scheduler_batch_timeout_ms / 1000.0
+
+        self._cond = threading.Condition()
+        # 每个流一个待处理队列；OrderedDict 的顺序即轮询顺序
+        self._pending: "OrderedDict[str, Deque[InferenceRequest]]" = OrderedDict()
+        self._pending_count = 0
+        self._running = False
+        self._models: List[InferenceBackend] = []
+        self._workers: List[threading.Thread] = []
+
+        # 统计
+        self._started_at = time.monotonic()
+        self._batches = 0
+        self._frames = 0
+        self._stream_stats: Dict[str, _StreamSchedulerStats] = {}
+
+    def start(self):
+        """从模型池中取出所有模型实例，并为每个实例启动一个工作线程。"""
+        for _ in range(self.model_pool.pool_size):
+            model = self.model_pool.acquire(timeout=5.0)
+            if model is None:
+                break
+            self._models.append(model)
+        if not self._models:
+            raise RuntimeError("推理调度器无法从模型池获取任何模型实例。")
+
+        self._running = True
+        self._started_at = time.monotonic()
+        for i, model in enumerate(self._models):
+            worker = threading.Thread(target=self._worker_loop, args=(model,), name=f"InferenceScheduler-{i}", daemon=True)
+            self._workers.append(worker)
+            worker.start()
+        app_logger.info(f"✅ 推理调度器已启动: {len(self._models)} 个模型实例，"
+                        f"微批上限 {self.max_batch_size}，等待截止 {self.batch_timeout * 1000:.0f}ms。")
+
+    def stop(self):
+        """停止所有工作线程，并把模型实例归还到模型池。"""
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            self._pending.clear()
+            self._pending_count = 0
+            self._cond.notify_all()
+        for worker in self._workers:
+            worker.join(timeout=5.0)
+        self._workers = []
+        for model in self._models:
+            self.model_pool.release(model)
+        self._models = []
+        app_logger.info("✅ 推理调度器已停止，模型实例已归还到池中。")
+
+    def submit(self, stream_id: str, frame: np.ndarray, info: Any,
+               callback: Callable[[Optional[InferenceResult], Any], None],
+               on_dispatch: Optional[Callable[[], None]] = None) -> bool:
+        """
+        提交一帧待推理。结果将在调度器的工作线程中通过 `callback(result, info)` 返回，
+        推理失败时 result 为 None。回调中不应执行阻塞操作。调度器未运行时返回 False。
+        `on_dispatch` 在请求离开调度队列、随微批送入模型时（于工作线程中）调用，便于调用方区分排队与推理时间。
+        """
+        return self._enqueue(InferenceRequest(stream_id, [frame], info, callback, on_dispatch=on_dispatch))
+
+    def submit_group(self, stream_id: str, frames: List[np.ndarray], info: Any,
+                     callback: Callable[[Optional[InferenceResult], Any], None],
+                     on_dispatch: Optional[Callable[[], None]] = None) -> bool:
+        """
+        把同一帧的一组图块作为一个请求提交，这些图块总是放进同一个微批（即使超过微批上限也不拆分）。
+        回调收到的 `result.results` 是按提交顺序排列的各图块结果列表。
+        """
+        return self._enqueue(InferenceRequest(stream_id, list(frames), info, callback, grouped=True,
+                                              on_dispatch=on_dispatch))
+
+    def _enqueue(self, request: InferenceRequest) -> bool:
+        stream_id = request.stream_id
+        with self._cond:
+            if not self._running:
+                return False
+            self._pending.setdefault(stream_id, deque()).append(request)
+            self._pending_count += 1
+            self._stream_stats.setdefault(stream_id, _StreamSchedulerStats()).submitted += 1
+            self._cond.notify()
+        return True
+
+    def cancel(self, stream_id: str):
+        """丢弃某个流所有尚未执行的请求，并移除其统计（流水线停止时调用）。"""
+        with self._cond:
+            pending = self._pending.pop(stream_id, None)
+            if pending:
+                self._pending_count -= len(pending)
+            self._stream_stats.pop(stream_id, None)
+            # 少了一个流，正在等待凑批的工作线程可能已经可以发出微批
+            self._cond.notify_all()
+
+    def _take_batch(self) -> List[InferenceRequest]:
+        """
+        按轮询顺序从每个有待处理帧的流中各取一个请求，直到微批的帧数（图块组按图块数计）达到上限。
+        调用方需持有锁。
+        """
+        batch: List[InferenceRequest] = []
+        batch_frames = 0
+        for stream_id in list(self._pending.keys()):
+            if batch_frames >= self.max_batch_size:
+                break
+            requests = self._pending[stream_id]
+            # 图块组不拆分：放不下时留给下一个微批，除非当前微批还是空的
+            if batch and batch_frames + len(requests[0].frames) > self.max_batch_size:
+                continue
+            batch.append(requests.popleft())
+            batch_frames += len(batch[-1].frames)
+            # 移到末尾，实现各流之间的公平轮询
+            if requests:
+                self._pending.move_to_end(stream_id)
+            else:
+                del self._pending[stream_id]
+        self._pending_count -= len(batch)
+        return batch
+
+    def _ready_frames(self) -> int:
+        """下一个微批最多可以取到的帧数（每个流的队首请求，图块组按图块数计）。调用方需持有锁。"""
+        return sum(len(requests[0].frames) for requests in self._pending.values())
+
+    def _all_streams_ready(self) -> bool:
+        """
+        每个已登记的流要么已有请求在排队，要么有请求正在执行（结果返回前不会再提交）时，继续等待也凑不到更多帧。
+        调用方需持有锁。
+        """
+        return all(stream_id in self._pending or stats.running
+                   for stream_id, stats in self._stream_stats.items())
+
+    def _oldest_submitted_at(self) -> float:
+        return min(requests[0].submitted_at for requests in self._pending.values())
+
+    def _worker_loop(self, model: InferenceBackend):
+        while True:
+            with self._cond:
+                while self._running and self._pending_count == 0:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                # 等待凑满一个微批、所有可能提交的流都已提交，或直到最早的请求达到等待截止时间
+                deadline = self._oldest_submitted_at() + self.batch_timeout
+                while (self._running and self._ready_frames() < self.max_batch_size
+                       and not self._all_streams_ready()):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if not self._running:
+                    return
+                batch = self._take_batch()
+                if not batch:
+                    continue
+                dispatched_at = time.monotonic()
+                self._batches += 1
+                self._frames += sum(len(request.frames) for request in batch)
+                for request in batch:
+                    stats = self._stream_stats.get(request.stream_id)
+                    if stats:
+                        stats.running += 1
+                        wait = dispatched_at - request.submitted_at
+                        stats.wait_sum += wait
+                        stats.wait_max = max(stats.wait_max, wait)
+
+            for request in batch:
+                if request.on_dispatch is not None:
+                    request.on_dispatch()
+            self._run_batch(model, batch)
+
+    def _run_batch(self, model: InferenceBackend, batch: List[InferenceRequest]):
+        completed = 0
+        group_results: List[Any] = []
+        try:
+            # 结果按提交顺序返回，图块组的结果连续到达，收齐后一并回调
+            frames = ((frame, request) for request in batch for frame in request.frames)
+            for result in model.predict_batch(frames):
+                request = result.info
+                if not request.grouped:
+                    completed += 1
+                    self._deliver(request, result)
+                    continue
+                group_results.append(result.results)
+                if len(group_results) == len(request.frames):
+                    completed += 1
+                    self._deliver(request, InferenceResult(group_results))
+                    group_results = []
+        except Exception as e:
+            app_logger.error(f"【推理调度器】批量推理失败 (批大小 {len(batch)}): {e}", exc_info=True)
+            # 结果按提交顺序返回，未返回的请求以 None 通知调用方，避免其一直等待
+            for request in batch[completed:]:
+                self._deliver(request, None)
+
+    def _deliver(self, request: InferenceRequest, result: Optional[InferenceResult]):
+        with self._cond:
+            stats = self._stream_stats.get(request.stream_id)
+            if stats:
+                stats.running = max(stats.running - 1, 0)
+                if result is not None:
+                    stats.completed += 1
+        try:
+            request.callback(result, request.info)
+        except Exception as e:
+            app_logger.error(f"【推理调度器】流 {request.stream_id} 的结果回调出错: {e}")
+
+    def get_stats(self) -> dict:
+        """返回调度器的全局与分流统计。"""
+        with self._cond:
+            wall = max(time.monotonic() - self._started_at, 1e-9)
+            avg_batch = self._frames / self._batches if self._batches else 0.0
+            return {
+                "workers": len(self._workers),
+                "max_batch_size": self.max_batch_size,
+                "batch_timeout_ms": round(self.batch_timeout * 1000, 2),
+                "batches_dispatched": self._batches,
+                "frames_dispatched": self._frames,
+                "avg_batch_size": round(avg_batch, 3),
+                "avg_batch_fill": round(avg_batch / self.max_batch_size, 4),
+                "batches_per_second": round(self._batches / wall, 2),
+                "pending": self._pending_count,
+                "streams": {
+                    stream_id: {
+                        "submitted": stats.submitted,
+                        "completed": stats.completed,
+                        "avg_queue_wait_ms": round(stats.wait_sum / max(stats.completed, 1) * 1000, 2),
+                        "max_queue_wait_ms": round(stats.wait_max * 1000, 2),
+                    }
+                    for stream_id, stats in self._stream_stats.items()
+                },
+            }
@@ -0,0 +1,116 @@
+# app/core/mailbox.py
+import queue
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, List, Optional
+
+
+class LatestMailbox:
+    """
+    “最新优先”（latest-wins）的有界邮箱，用于连接流水线的相邻阶段。
+    与阻塞的 `queue.Queue` 不同，`put` 永不阻塞：邮箱已满时直接丢弃最旧的条目，
+    从而保证下游拿到的始终是最新的帧，并把每个阶段的积压限制在 `capacity` 以内。
+    上游结束时调用 `close()`；下游在邮箱关闭且取空后，`get` 返回 None 作为结束信号。
+    下游以任务方式运行在共享线程池上时，通过 `on_ready` 在放入条目或关闭邮箱后唤醒下游（在锁外调用）。
+    给定 `evictable` 时，邮箱已满会优先挤出满足该条件的最旧条目；没有可挤出的条目而新条目本身可被挤出时，
+    丢弃新条目，使不可挤出的条目不会被低优先级的条目挤掉。
+    """
+
+    def __init__(self, name: str, capacity: int = 1, on_drop: Optional[Callable[[Any], None]] = None,
+                 on_ready: Optional[Callable[[], None]] = None, evictable: Optional[Callable[[Any], bool]] = None):
+        if capacity < 1:
+            raise ValueError("邮箱容量必须至少为 1")
+        self.name = name
+        self.capacity = capacity
+        self._on_drop = on_drop
+        self._on_ready = on_ready
+        self._evictable = evictable
+        self._items: Deque[Any] = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.put_count = 0
+        self.get_count = 0
+        self.dropped_count = 0
+
+    def put(self, item: Any) -> bool:
+        """放入一个条目。返回 False 表示邮箱已关闭，条目未被接收；被丢弃的条目（包括新条目本身）交给 `on_drop`。"""
+        dropped = None
+        with self._cond:
+            if self._closed:
+                return False
+            self.put_count += 1
+            if len(self._items) >= self.capacity:
+                dropped = self._evict(item)
+                self.dropped_count += 1
+            if dropped is not item:
+                self._items.append(item)
+                self._cond.notify()
+        if dropped is not None and self._on_drop is not None:
+            self._on_drop(dropped)
+        if self._on_ready is not None:
+            self._on_ready()
+        return True
+
+    def _evict(self, incoming: Any) -> Any:
+        """邮箱已满时选出要丢弃的条目（可能是新条目本身）并从邮箱中移除。调用方需持有锁。"""
+        if self._evictable is None:
+            return self._items.popleft()
+        for index, item in enumerate(self._items):
+            if self._evictable(item):
+                del self._items[index]
+                return item
+        if self._evictable(incoming):
+            return incoming
+        return self._items.popleft()
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """
+        取出最旧的条目。超时未取到时抛出 `queue.Empty`（与 `queue.Queue` 一致）；
+        邮箱已关闭且为空时返回 None。
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout=timeout):
+                raise queue.Empty
+            if self._items:
+                self.get_count += 1
+                return self._items.popleft()
+            return None
+
+    def get_nowait(self) -> Any:
+        """不等待的 `get`：邮箱为空（且未关闭）时立即抛出 `queue.Empty`。"""
+        return self.get(timeout=0)
+
+    def close(self):
+        """标记上游已结束，唤醒所有等待中的消费者。"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._on_ready is not None:
+            self._on_ready()
+
+    def drain(self) -> List[Any]:
+        """取出并返回所有剩余条目（用于停止时的清理）。"""
+        with self._cond:
+            items = list(self._items)
+            self._items.clear()
+            return items
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def empty(self) -> bool:
+        return not self._items
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def stats(self) -> dict:
+        """返回邮箱的计数快照。"""
+        with self._cond:
+            return {
+                "capacity": self.capacity,
+                "depth": len(self._items),
+                "put": self.put_count,
+                "dropped": self.dropped_count,
+            }
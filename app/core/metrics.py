@@ -0,0 +1,113 @@
+# app/core/metrics.py
+import math
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# 默认的延迟分桶上界（秒），覆盖 1ms 的解码 / 编码到秒级的排队与推理
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """
+    轻量的累计分桶直方图（Prometheus histogram 语义）。
+    `observe` 只做一次二分查找和三次整数 / 浮点累加，不加锁：每个直方图只由一个线程写入
+    （如某一路流的某个阶段线程），抓取线程读到的至多是相差一次观测的快照，对监控无影响。
+    需要多个线程写入同一直方图时，构造时传入 `threadsafe=True` 改为加锁累加。
+    """
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_LATENCY_BUCKETS, threadsafe: bool = False):
+        self.bounds = tuple(sorted(bounds))
+        # 最后一格对应 +Inf
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock() if threadsafe else None
+
+    def observe(self, value: float):
+        if self._lock is None:
+            self.counts[bisect_left(self.bounds, value)] += 1
+            self.sum += value
+            self.count += 1
+            return
+        with self._lock:
+            self.counts[bisect_left(self.bounds, value)] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Tuple[List[Tuple[float, int]], float, int]:
+        """返回 ([(上界, 累计计数)], 总和, 总数)，上界最后一项为 +Inf。"""
+        counts, total, count = list(self.counts), self.sum, self.count
+        cumulative, running = [], 0
+        for bound, n in zip(self.bounds + (math.inf,), counts):
+            running += n
+            cumulative.append((bound, running))
+        return cumulative, total, count
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, object]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """
+    一次抓取的指标集合，按 Prometheus 文本格式（0.0.4）输出。
+    同名指标的所有样本归在一个 HELP / TYPE 下，按首次出现的顺序输出。
+    """
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self, prefix: str = ""):
+        self.prefix = prefix
+        self._families: Dict[str, Tuple[str, str, List[str]]] = {}
+
+    def _family(self, name: str, kind: str, help_text: str) -> List[str]:
+        name = self.prefix + name
+        family = self._families.get(name)
+        if family is None:
+            family = self._families[name] = (kind, help_text, [])
+        return family[2]
+
+    def gauge(self, name: str, help_text: str, value: Optional[float], **labels):
+        if value is None:
+            return
+        self._family(name, "gauge", help_text).append(
+            f"{self.prefix}{name}{_format_labels(labels)} {_format_value(value)}")
+
+    def counter(self, name: str, help_text: str, value: Optional[float], **labels):
+        """计数器的样本名按约定带 `_total` 后缀，`name` 本身不含该后缀。"""
+        if value is None:
+            return
+        self._family(name, "counter", help_text).append(
+            f"{self.prefix}{name}_total{_format_labels(labels)} {_format_value(value)}")
+
+    def histogram(self, name: str, help_text: str, histogram: Histogram, **labels):
+        lines = self._family(name, "histogram", help_text)
+        buckets, total, count = histogram.snapshot()
+        full_name = self.prefix + name
+        for bound, cumulative in buckets:
+            lines.append(f"{full_name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}")
+        lines.append(f"{full_name}_sum{_format_labels(labels)} {_format_value(float(total))}")
+        lines.append(f"{full_name}_count{_format_labels(labels)} {count}")
+
+    def render(self) -> str:
+        out = []
+        for name, (kind, help_text, lines) in self._families.items():
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(lines)
+        return "\n".join(out) + "\n"
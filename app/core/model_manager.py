@@ -1,17 +1,20 @@
 # app/core/model_manager.py
 import queue
 import gc
-import degirum as dg
+import time
 from typing import Optional
 
 from app.cfg.config import AppSettings
 from app.cfg.logging import app_logger
+from app.core.inference_backend import InferenceBackend, create_inference_backend
+from app.core.metrics import Histogram, MetricsRegistry
 from app.core.process_utils import get_all_degirum_worker_pids, cleanup_degirum_workers_by_pids
 
 
 class ModelPool:
     """
-    负责管理 DeGirum 模型实例池的单例类。
+    负责管理推理模型实例池的单例类。
+    池中的每个实例都是一个 `InferenceBackend`（DeGirum/Hailo、ONNX Runtime CPU 或合成后端），由配置决定。
     """
     _instance = None
 
@@ -24,90 +27,115 @@ class ModelPool:
         if hasattr(self, '_initialized') and self._initialized:
             return
 
-        app_logger.info(f"正在初始化 DeGirum 模型池，大小为: {pool_size}...")
         self.settings = settings
         self.pool_size = pool_size
+        self.backend_name = settings.hailo.backend
         self._pool = queue.Queue(maxsize=pool_size)
+        self._models = []
+        self._initial_pids = set()
+        # 获取模型的等待时间（多个流可能同时获取，使用加锁的直方图）与超时次数
+        self.acquire_wait = Histogram(threadsafe=True)
+        self.acquire_timeouts = 0
+        app_logger.info(f"正在初始化模型池，后端: {self.backend_name}，大小为: {pool_size}...")
 
         try:
             self._initial_pids = get_all_degirum_worker_pids()
             app_logger.info(f"启动前检测到 {len(self._initial_pids)} 个残留 DeGirum 进程。")
-
-            for i in range(pool_size):
-
-
-                app_logger.info(f"正在加载模型实例 {i + 1}/{pool_size}...")
-                model = self._create_degirum_model()
-                self._pool.put(model)
-            app_logger.info("✅ DeGirum 模型池已成功加载并填充。")
+            self._fill_pool()
         except Exception as e:
-            app_logger.critical(f"❌ 初始化 DeGirum 模型池失败: {e}", exc_info=True)
-            app_logger.critical("请检查模型名称是否正确，以及 Hailo 设备是否连接并正常工作。")
-            self.dispose()
-            raise RuntimeError(f"模型池初始化失败: {e}") from e
+            fallback = settings.hailo.fallback_backend
+            if not fallback or fallback == self.backend_name:
+                self._fail(e)
+            app_logger.error(f"❌ 使用后端 '{self.backend_name}' 初始化模型池失败: {e}")
+            app_logger.warning(f"⚠️ 将切换到备用推理后端 '{fallback}' 继续提供服务。")
+            self._dispose_models()
+            self.backend_name = fallback
+            try:
+                self._fill_pool()
+            except Exception as fallback_error:
+                self._fail(fallback_error)
 
         self._initialized = True
 
-    def _create_degirum_model(self):
-        """使用配置中的信息加载单个 DeGirum 模型实例。"""
-
-
-        model = dg.load_model(
-            model_name=self.settings.hailo.detection_model_name,
-            inference_host_address=dg.LOCAL,
-            zoo_url=self.settings.hailo.zoo_url,
-            image_backend='opencv'
-        )
-        if not model:
-            raise ConnectionError("dg.load_model 返回 None，无法加载模型。")
-
-        # 在模型加载后，将其作为对象属性进行设置
-        # 这种模式更符合Pythonic的风格，即将对象创建和配置分离
-        try:
-            model.confidence_threshold = self.settings.hailo.confidence_threshold
-            # 注意：属性名通常是 'nms_threshold' 而不是 'iou_threshold'
-            model.nms_threshold = self.settings.hailo.iou_threshold
-        except Exception as e:
-            app_logger.error(f"设置模型推理参数时出错: {e}。将使用模型的默认阈值。")
-
-        return model
-
-    def acquire(self, timeout: float = 2.0) -> Optional[object]:
-        """从池中获取一个模型实例。如果池为空，将等待指定时间。"""
-        # 修改点：在尝试获取模型前打印日志
-        current_available = self._pool.qsize()
-        app_logger.info(f"尝试从模型池获取模型... (当前可用: {current_available}/{self.pool_size})")
+    def _fill_pool(self):
+        """按当前后端加载 pool_size 个模型实例并放入池中。"""
+        for i in range(self.pool_size):
+            app_logger.info(f"正在加载模型实例 {i + 1}/{self.pool_size} (后端: {self.backend_name})...")
+            model = self._create_model()
+            self._models.append(model)
+            self._pool.put(model)
+        app_logger.info(f"✅ 模型池已成功加载并填充 (后端: {self.backend_name})。")
+
+    def _fail(self, e: Exception):
+        app_logger.critical(f"❌ 初始化模型池失败: {e}", exc_info=True)
+        app_logger.critical("请检查模型名称是否正确，以及 Hailo 设备是否连接并正常工作。")
+        self.dispose()
+        raise RuntimeError(f"模型池初始化失败: {e}") from e
+
+    def _create_model(self) -> InferenceBackend:
+        """使用配置中的信息创建单个推理后端实例。"""
+        return create_inference_backend(self.settings, self.backend_name)
+
+    def acquire(self, timeout: float = 2.0) -> Optional[InferenceBackend]:
+        """从池中获取一个模型实例。如果池为空，将等待指定时间。等待时长记入 `acquire_wait` 直方图。"""
+        app_logger.debug(f"尝试从模型池获取模型... (当前可用: {self._pool.qsize()}/{self.pool_size})")
+        started_at = time.monotonic()
         try:
             model = self._pool.get(timeout=timeout)
-            # 成功获取模型后打印日志
-            app_logger.info(f"成功获取模型。 (当前可用: {self._pool.qsize()}/{self.pool_size})")
+            self.acquire_wait.observe(time.monotonic() - started_at)
+            app_logger.debug(f"成功获取模型。 (当前可用: {self._pool.qsize()}/{self.pool_size})")
             return model
         except queue.Empty:
+            self.acquire_wait.observe(time.monotonic() - started_at)
+            self.acquire_timeouts += 1
             app_logger.error(f"在 {timeout}s 内未能从池中获取可用模型，服务可能过载。")
             return None
 
-    def release(self, model):
+    def release(self, model: InferenceBackend):
         """将一个模型实例归还到池中。"""
         try:
             self._pool.put_nowait(model)
-            # 归还模型后打印日志
-            app_logger.info(f"已归还模型到池中。 (当前可用: {self._pool.qsize()}/{self.pool_size})")
+            app_logger.debug(f"已归还模型到池中。 (当前可用: {self._pool.qsize()}/{self.pool_size})")
         except queue.Full:
             app_logger.warning("尝试将模型归还到已满的池中，此实例将被丢弃。")
             del model
 
+    def collect_metrics(self, registry: MetricsRegistry):
+        """把模型池的占用与等待指标写入一次抓取的指标集合。"""
+        available = self._pool.qsize()
+        registry.gauge("model_pool_size", "模型池中的模型实例总数", self.pool_size, backend=self.backend_name)
+        registry.gauge("model_pool_in_use", "已被流水线或调度器取走的模型实例数", max(self.pool_size - available, 0),
+                       backend=self.backend_name)
+        registry.histogram("model_pool_acquire_wait_seconds", "从模型池获取模型实例的等待时间（秒）", self.acquire_wait,
+                           backend=self.backend_name)
+        registry.counter("model_pool_acquire_timeouts", "在超时时间内未能获取模型实例的次数", self.acquire_timeouts,
+                         backend=self.backend_name)
+
+    @classmethod
+    def reset_instance(cls):
+        """丢弃单例，使下一次构造按新的配置重建模型池（基准测试在场景之间使用，调用前应先 dispose）。"""
+        cls._instance = None
+
     def dispose(self):
         """应用关闭时调用的核心清理函数。"""
-        app_logger.warning("正在释放 DeGirum 模型池资源并清理后台进程...")
+        app_logger.warning("正在释放模型池资源并清理后台进程...")
+        self._dispose_models()
         all_current_pids = get_all_degirum_worker_pids()
         pids_to_kill = all_current_pids - self._initial_pids
         cleanup_degirum_workers_by_pids(pids_to_kill, app_logger)
+        gc.collect()
+        app_logger.info("✅ 模型池资源已清理。")
 
+    def _dispose_models(self):
+        """关闭并清空所有已加载的模型实例。"""
         while not self._pool.empty():
             try:
-                model = self._pool.get_nowait()
-                del model
+                self._pool.get_nowait()
             except queue.Empty:
                 break
-        gc.collect()
-        app_logger.info("✅ DeGirum 模型池资源已清理。")
\ No newline at end of file
+        for model in self._models:
+            try:
+                model.close()
+            except Exception as e:
+                app_logger.error(f"关闭模型实例时出错: {e}")
+        self._models = []
\ No newline at end of file
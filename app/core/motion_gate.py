@@ -0,0 +1,83 @@
+# app/core/motion_gate.py
+import time
+from typing import Optional
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    运动门控：在缩小后的灰度图上计算画面变化量，只有变化超过阈值的帧才送去推理，
+    静止场景下大幅减少加速卡的调用次数。为防止长时间静止导致漏检（如缓慢出现的烟雾），
+    距离上一次放行超过 `keepalive_seconds` 时强制放行一帧。
+
+    - 'diff'：与上一次放行帧做帧差。参考帧只在放行时更新，缓慢的渐变会随时间累积并最终触发放行。
+    - 'mog2'：MOG2 背景建模，前景像素占比作为变化量，对光照抖动更鲁棒，开销略高。
+    """
+
+    def __init__(self, method: str = "diff", width: int = 160, threshold: float = 0.01,
+                 pixel_threshold: int = 25, keepalive_seconds: float = 5.0):
+        self.method = method
+        self.width = width
+        self.threshold = threshold
+        self.pixel_threshold = pixel_threshold
+        self.keepalive_seconds = keepalive_seconds
+        self._reference: Optional[np.ndarray] = None
+        self._subtractor = cv2.createBackgroundSubtractorMOG2(history=200, detectShadows=False) \
+            if method == "mog2" else None
+        self._last_forward_ts = 0.0
+
+        self.frames_gated = 0
+        self.frames_forwarded = 0
+        self.frames_skipped = 0
+        self.keepalive_forwarded = 0
+        self.last_score = 0.0
+
+    def _downscale(self, frame: np.ndarray) -> np.ndarray:
+        h, w = frame.shape[:2]
+        if self.width and w > self.width:
+            frame = cv2.resize(frame, (self.width, max(int(h * self.width / w), 1)), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def _score(self, small: np.ndarray) -> float:
+        """返回变化像素的占比（0~1）。首帧视为完全变化。"""
+        if self._subtractor is not None:
+            mask = self._subtractor.apply(small)
+            return float(np.count_nonzero(mask)) / mask.size
+        if self._reference is None or self._reference.shape != small.shape:
+            return 1.0
+        diff = cv2.absdiff(small, self._reference)
+        return float(np.count_nonzero(diff > self.pixel_threshold)) / diff.size
+
+    def should_infer(self, frame: np.ndarray, now: Optional[float] = None) -> bool:
+        """判断该帧是否需要推理，并更新计数。"""
+        now = time.monotonic() if now is None else now
+        self.frames_gated += 1
+        small = self._downscale(frame)
+        self.last_score = self._score(small)
+
+        forward = self.last_score >= self.threshold
+        if not forward and now - self._last_forward_ts >= self.keepalive_seconds:
+            forward = True
+            self.keepalive_forwarded += 1
+
+        if forward:
+            self.frames_forwarded += 1
+            self._last_forward_ts = now
+            self._reference = small
+        else:
+            self.frames_skipped += 1
+        return forward
+
+    def stats(self) -> dict:
+        return {
+            "method": self.method,
+            "frames_gated": self.frames_gated,
+            "frames_inferred": self.frames_forwarded,
+            "frames_skipped": self.frames_skipped,
+            "keepalive_inferred": self.keepalive_forwarded,
+            "skip_ratio": round(self.frames_skipped / self.frames_gated, 4) if self.frames_gated else 0.0,
+            "last_score": round(self.last_score, 5),
+        }
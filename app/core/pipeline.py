@@ -1,15 +1,35 @@
 # app/core/pipeline.py
-import asyncio
+import json
 import threading
 import time
 import cv2
 import queue
-from typing import List
+from typing import Dict, Optional, Sequence
 
 from app.cfg.config import AppSettings
 from app.cfg.logging import app_logger
+from app.core.alarm import AlarmEngine
+from app.core.broadcaster import FrameBroadcaster
+from app.core.clip_recorder import ClipRecorder
+from app.core.clip_writer import ClipWriter
+from app.core.detections import DetectionBatch, score_threshold_table
+from app.core.inference_backend import InferenceBackend, InferenceResult, load_model_input_size, load_model_labels
+from app.core.frame_packet import FramePacket
+from app.core.frame_pool import FrameBufferPool, FrameMemoryBudget
+from app.core.frame_trace import FrameTracer, TraceExporter, wall_time
+from app.core.inference_scheduler import InferenceScheduler
+from app.core.mailbox import LatestMailbox
+from app.core.metrics import Histogram, MetricsRegistry
 from app.core.model_manager import ModelPool
-from app.core.processing import draw_detections
+from app.core.motion_gate import MotionGate
+from app.core.pipeline_stats import InferenceStats
+from app.core.processing import draw_detections, draw_roi
+from app.core.rate_controller import AdaptiveRateController
+from app.core.roi import Polygon, RegionOfInterest
+from app.core.tiling import FrameTiler
+from app.core.tracker import MultiObjectTracker
+from app.core.video_source import VideoSource, create_video_source, is_file_source
+from app.core.worker_pool import StageTask, WorkerPools
 
 
 class VideoStreamPipeline:
@@ -17,98 +37,331 @@ class VideoStreamPipeline:
     封装一个视频流的完整处理流水线。
     采用【参考人脸识别】的四阶段串行处理模式：
     T1: Reader -> T2: Preprocessor -> T3: Inference -> T4: Postprocessor
+    各阶段不再独占线程，而是作为任务运行在全局共享的有界线程池上（见 `WorkerPools`）：
+    上游向邮箱放入帧时唤醒下游阶段，每次执行处理一帧后让出线程，同一阶段同时最多只有一次执行。
     """
 
     def __init__(self, settings: AppSettings, stream_id: str, video_source: str,
-                 output_queue: asyncio.Queue, model_pool: ModelPool):
+                 broadcaster: FrameBroadcaster, model_pool: ModelPool, worker_pools: WorkerPools,
+                 scheduler: Optional[InferenceScheduler] = None,
+                 analysis_fps: Optional[float] = None,
+                 source_type: Optional[str] = None,
+                 frame_budget: Optional[FrameMemoryBudget] = None,
+                 motion_gate: Optional[bool] = None,
+                 adaptive_fps: Optional[bool] = None,
+                 tracking: Optional[bool] = None,
+                 tiled: Optional[bool] = None,
+                 rois: Optional[Sequence[Polygon]] = None,
+                 alarms: Optional[bool] = None,
+                 alarm_broadcaster: Optional[FrameBroadcaster] = None,
+                 recording: Optional[bool] = None,
+                 clip_writer: Optional[ClipWriter] = None,
+                 trace_exporter: Optional[TraceExporter] = None):
         self.settings = settings
         self.hailo_settings = settings.hailo
         self.stream_id = stream_id
         self.video_source = video_source
-        self.output_queue = output_queue  # Web端消费的最终队列
+        self.broadcaster = broadcaster  # 已编码帧的广播器，Web端每个观看者各自持有游标
+        # 纯检测结果事件的广播器（SSE / WebSocket），不含图像，每帧只序列化一次
+        self.event_broadcaster = FrameBroadcaster(settings.app.stream_max_queue_size)
         self.model_pool = model_pool
+        # 'scheduled' 模式下，流水线不独占模型，而是把帧提交给全局推理调度器
+        self.scheduler = scheduler
 
-        # 流水线持有的模型实例
-        self.model = None
+        # 流水线持有的模型实例（推理后端由配置决定：DeGirum/Hailo、ONNX Runtime CPU 或合成后端）
+        self.model: Optional[InferenceBackend] = None
 
-        # 线程管理
+        # 阶段任务管理
         self.stop_event = threading.Event()
-        self.threads: List[threading.Thread] = []
-        # 新增：用于指示所有线程是否已成功启动的事件
-        self.threads_started_event = threading.Event()
-
-        # 连接各个处理阶段的中间队列
-        self.preprocess_queue = queue.Queue(maxsize=30)
-        self.inference_queue = queue.Queue(maxsize=30)
-        self.postprocess_queue = queue.Queue(maxsize=30)
-
-        self.cap = None  # 视频捕获对象
-
-    def start(self):
-        """启动流水线，包括获取模型、打开视频源和启动所有工作线程。"""
+        # 用于指示流水线是否已成功启动（模型就绪、视频源已打开、各阶段已投递）的事件
+        self.started_event = threading.Event()
+
+        # 推理阶段模式与统计
+        self.inference_mode = settings.app.inference_mode
+        # 'scheduled' 模式下每个流同时只有一帧在途，以保证结果有序
+        self.inflight_depth = settings.app.inference_inflight_depth if self.inference_mode == "pipelined" else 1
+        self._inflight = 0
+        self._inflight_lock = threading.Lock()
+        self._inference_ending = False
+        self._inference_ended = False
+
+        # 各阶段在共享线程池上的任务：读帧（解码）在 I/O 池，预处理与后处理（绘制、编码）在 CPU 池，
+        # 推理在推理池；scheduled 模式下推理由调度器的工作线程执行，帧在放入推理邮箱时直接提交，没有推理任务
+        self.worker_pools = worker_pools
+        stage_specs = {
+            "reader": (worker_pools.io, self._read_step),
+            "preprocess": (worker_pools.cpu, self._preprocess_step),
+        }
+        if self.inference_mode != "scheduled":
+            stage_specs["inference"] = (worker_pools.inference, self._sync_inference_step
+                                        if self.inference_mode == "sync" else self._pipelined_inference_step)
+        stage_specs["postprocess"] = (worker_pools.cpu, self._postprocess_step)
+        self.stages: Dict[str, StageTask] = {
+            name: StageTask(f"{stream_id}-{name}", pool, step, worker_pools.timer, self._on_stage_done)
+            for name, (pool, step) in stage_specs.items()
+        }
+        self._reader_state: Optional[_ReaderState] = None
+        # 各阶段的延迟直方图（/metrics 导出）：每个直方图只由对应阶段的一个线程写入，无需加锁
+        self.stage_latency: Dict[str, Histogram] = {
+            stage: Histogram() for stage in ("read", "infer", "postprocess", "encode")
+        }
+        self.inference_stats = InferenceStats(self.inference_mode, self.inflight_depth,
+                                              latency_histogram=self.stage_latency["infer"])
+        # 逐帧追踪：每帧记录经过各阶段的时刻，滚动统计分段延迟的分位数，可抽样导出原始记录
+        self.tracer = FrameTracer(stream_id, settings.app.trace_window_frames, broadcaster.capacity, trace_exporter)
+
+        # 连接各个处理阶段的 latest-wins 邮箱：下游跟不上时丢弃旧帧，而不是无限积压
+        # 被挤出邮箱的帧同样要把缓冲区归还到帧缓冲池
+        # 放入帧或关闭邮箱时唤醒下游阶段；pipelined 模式的推理循环持续阻塞读取邮箱，无需唤醒
+        mailbox_capacity = settings.app.stage_mailbox_capacity
+        inference_ready = {"sync": self.stages["inference"].wake if self.inference_mode == "sync" else None,
+                           "pipelined": None, "scheduled": self._submit_scheduled}[self.inference_mode]
+        self.preprocess_queue = LatestMailbox("preprocess", mailbox_capacity, on_drop=FramePacket.release,
+                                              on_ready=self.stages["preprocess"].wake)
+        self.inference_queue = LatestMailbox("inference", mailbox_capacity, on_drop=FramePacket.release,
+                                             on_ready=inference_ready)
+        # 后处理邮箱中被运动门控跳过的帧（尚无检测结果）优先被挤出，不会挤掉携带新检测结果的推理帧
+        self.postprocess_queue = LatestMailbox("postprocess", mailbox_capacity, on_drop=FramePacket.release,
+                                               on_ready=self.stages["postprocess"].wake,
+                                               evictable=lambda packet: packet.detections is None)
+        # 预分配的帧缓冲池：读帧线程解码进复用的数组，后处理编码完成后归还
+        self.frame_pool = FrameBufferPool(stream_id, settings.app.frame_pool_slots, frame_budget)
+        # 帧龄上限：超过此时长的帧在推理前被丢弃，保证端到端延迟有界
+        self.frame_max_age = settings.app.frame_max_age_ms / 1000.0
+        self.stale_dropped = 0
+
+        # 目标分析帧率：未单独指定时使用全局默认值，0 表示分析源的每一帧
+        self.analysis_fps = analysis_fps if analysis_fps is not None else settings.app.analysis_fps
+        # 视频源（OpenCV 或 FFmpeg 子进程），可按流单独选择
+        self.source_type = source_type or settings.app.source_type
+        self.source: Optional[VideoSource] = None
+        self.is_file_source = is_file_source(video_source)
+        self.frames_grabbed = 0
+        self.frames_decoded = 0
+        self.frames_skipped = 0
+
+        # 可选的自适应分析帧率：平时以空闲帧率分析，出现疑似目标时升频，读帧线程逐帧按控制器给出的帧率采样
+        adaptive_enabled = adaptive_fps if adaptive_fps is not None else settings.app.adaptive_fps_enabled
+        self.rate_controller = AdaptiveRateController(
+            stream_id,
+            idle_fps=settings.app.adaptive_idle_fps,
+            active_fps=settings.app.adaptive_active_fps,
+            suspicion_threshold=settings.app.adaptive_suspicion_threshold,
+            hold_seconds=settings.app.adaptive_hold_seconds,
+            decay_seconds=settings.app.adaptive_decay_seconds,
+        ) if adaptive_enabled else None
+        if self.rate_controller is not None:
+            self.analysis_fps = self.rate_controller.idle_fps
+
+        # 按需编码：只有存在订阅者（视频画面观看者等）时才绘制检测框并编码 JPEG，
+        # 无人观看时后处理阶段只统计分析过的帧，检测结果照常产出（启用告警录像时仍按录像帧率编码）
+        self._subscribers = 0
+        self._subscribers_lock = threading.Lock()
+        self.frames_analysed = 0
+        self.frames_encoded = 0
+
+        # 可选的运动门控：静止场景的帧不送推理，沿用最近一次推理的检测结果
+        gate_enabled = motion_gate if motion_gate is not None else settings.app.motion_gate_enabled
+        self.motion_gate = MotionGate(
+            method=settings.app.motion_gate_method,
+            width=settings.app.motion_gate_width,
+            threshold=settings.app.motion_gate_threshold,
+            pixel_threshold=settings.app.motion_gate_pixel_threshold,
+            keepalive_seconds=settings.app.motion_gate_keepalive_seconds,
+        ) if gate_enabled else None
+        self.last_detections = DetectionBatch.empty(names=())
+        self._last_output_frame_id = -1
+
+        # 可选的多目标跟踪：推理帧更新轨迹，未推理的帧输出外推的预测框，对外输出的检测结果带稳定的 track_id
+        tracking_enabled = tracking if tracking is not None else settings.app.tracker_enabled
+        self.tracker = MultiObjectTracker(
+            iou_threshold=settings.app.tracker_iou_threshold,
+            max_age_seconds=settings.app.tracker_max_age_seconds,
+            min_hits=settings.app.tracker_min_hits,
+        ) if tracking_enabled else None
+
+        # 检测结果统一转换为 DetectionBatch；类别表与模型标签文件一致，按类别阈值与最小面积在转换后一次性过滤。
+        # 推理后端按最低的阈值（含疑似阈值）输出，正式的置信度阈值在这里统一应用
+        self.class_names = load_model_labels(settings)
+        self.class_thresholds = score_threshold_table(self.class_names, settings.hailo.class_confidence_thresholds,
+                                                      settings.hailo.confidence_threshold)
+        self.min_box_area = settings.hailo.min_box_area
+
+        # 可选的感兴趣区域：推理只在多边形外接矩形内进行，中心点不在多边形内的检测框被丢弃；可在运行时整体替换
+        self.roi: Optional[RegionOfInterest] = RegionOfInterest(rois) if rois else None
+        self.frame_shape = None
+
+        # 可选的分块推理：每帧切成重叠图块（另加可选的整帧）作为一批推理，结果在整帧坐标下跨图块 NMS 合并
+        tiling_enabled = tiled if tiled is not None else settings.app.tiling_enabled
+        if tiling_enabled:
+            tile_size = settings.app.tiling_tile_size
+            self.tiler: Optional[FrameTiler] = FrameTiler(
+                tile_size=(tile_size, tile_size) if tile_size > 0 else load_model_input_size(settings),
+                grid=(settings.app.tiling_grid_cols, settings.app.tiling_grid_rows),
+                overlap=settings.app.tiling_overlap,
+                full_frame=settings.app.tiling_full_frame,
+                iou_threshold=settings.hailo.iou_threshold,
+            )
+        else:
+            self.tiler = None
+        self.detection_counts: Dict[str, int] = {}
+
+        # 可选的告警录像：持续把已编码帧放入预录环形缓冲区，告警时由共享的写入线程把告警前后的画面写成片段
+        recording_enabled = recording if recording is not None else settings.app.recording_enabled
+        self.clip_recorder = ClipRecorder(
+            stream_id,
+            video_source,
+            clip_writer,
+            pre_event_seconds=settings.app.recording_pre_event_seconds,
+            post_event_seconds=settings.app.recording_post_event_seconds,
+            max_clip_seconds=settings.app.recording_max_clip_seconds,
+            fps=settings.app.recording_fps,
+            max_buffer_bytes=int(settings.app.recording_buffer_memory_mb * 2 ** 20),
+        ) if recording_enabled and clip_writer is not None else None
+
+        # 可选的时域告警引擎：推理帧的检测结果经 N-of-M 确认与去抖后产生告警事件，发布到全局告警广播器
+        # 录像由告警触发，启用录像时告警引擎同时启用
+        self.alarm_broadcaster = alarm_broadcaster
+        alarms_enabled = alarms if alarms is not None else settings.app.alarm_enabled
+        alarms_enabled = alarms_enabled or self.clip_recorder is not None
+        self.alarm_engine = AlarmEngine(
+            stream_id,
+            self.class_names,
+            window_frames=settings.app.alarm_window_frames,
+            confirm_frames=settings.app.alarm_confirm_frames,
+            min_box_area_ratio=settings.app.alarm_min_box_area_ratio,
+            min_duration_seconds=settings.app.alarm_min_duration_seconds,
+            clear_seconds=settings.app.alarm_clear_seconds,
+            update_interval_seconds=settings.app.alarm_update_interval_seconds,
+            class_rules={name: rule.model_dump(exclude_none=True)
+                         for name, rule in settings.app.alarm_class_rules.items()},
+            on_event=self._on_alarm_event,
+        ) if alarms_enabled else None
+
+    def add_subscriber(self) -> int:
+        """登记一个需要编码画面的订阅者，返回当前订阅者数量。"""
+        with self._subscribers_lock:
+            self._subscribers += 1
+            return self._subscribers
+
+    def remove_subscriber(self) -> int:
+        """注销一个订阅者，返回当前订阅者数量。"""
+        with self._subscribers_lock:
+            self._subscribers = max(self._subscribers - 1, 0)
+            return self._subscribers
+
+    @property
+    def subscriber_count(self) -> int:
+        return self._subscribers
+
+    def set_roi(self, rois: Optional[Sequence[Polygon]]):
+        """运行时更新感兴趣区域（空列表或 None 表示整帧），从预处理阶段取到的下一帧开始生效。"""
+        self.roi = RegionOfInterest(rois) if rois else None
+        app_logger.info(f"【流水线 {self.stream_id}】感兴趣区域已更新: {len(rois) if rois else 0} 个多边形。")
+
+    @staticmethod
+    def _model_input(packet: FramePacket):
+        """送入模型的图像：设置了感兴趣区域时为其外接矩形的裁剪视图，否则为整帧。"""
+        return packet.roi.crop(packet.frame) if packet.roi is not None else packet.frame
+
+    @property
+    def is_running(self) -> bool:
+        """流水线已启动且尚未停止（视频源结束或阶段出错时流水线会自行停止）。"""
+        return self.started_event.is_set() and not self.stop_event.is_set()
+
+    def start(self) -> bool:
+        """
+        启动流水线：获取模型、打开视频源，并把各阶段任务投递到共享线程池。
+        不阻塞等待流水线结束，返回是否启动成功；启动失败时已释放所有资源。
+        """
         app_logger.info(f"【流水线 {self.stream_id}】正在启动，并尝试获取模型...")
         try:
-            # 1. 从模型池中获取一个模型实例供整个流水线使用
-            self.model = self.model_pool.acquire(timeout=5.0)
-            if self.model is None:
-                app_logger.error(f"❌【流水线 {self.stream_id}】启动失败：无法从模型池中获取可用模型。")
-                return
-
-            app_logger.info(f"【流水线 {self.stream_id}】成功获取模型，准备打开视频源...")
+            # 1. 从模型池中获取一个模型实例供整个流水线使用（调度模式下由调度器统一持有模型）
+            if self.inference_mode == "scheduled":
+                if self.scheduler is None:
+                    app_logger.error(f"❌【流水线 {self.stream_id}】启动失败：调度模式下未提供推理调度器。")
+                    self.stop()
+                    return False
+            else:
+                self.model = self.model_pool.acquire(timeout=5.0)
+                if self.model is None:
+                    app_logger.error(f"❌【流水线 {self.stream_id}】启动失败：无法从模型池中获取可用模型。")
+                    self.stop()
+                    return False
+                app_logger.info(f"【流水线 {self.stream_id}】成功获取模型，准备打开视频源...")
 
             # 2. 打开视频源
-            source_for_cv = int(self.video_source) if self.video_source.isdigit() else self.video_source
-            self.cap = cv2.VideoCapture(source_for_cv)
-            if not self.cap.isOpened():
-                raise RuntimeError(f"无法打开视频源: {self.video_source}")
-
-            # 3. 启动所有四个线程
-            self._start_threads()
-            app_logger.info(f"【流水线 {self.stream_id}】所有工作线程已启动。")
-            # 标记线程已启动
-            self.threads_started_event.set()
-
-
-            # 4. 主线程监控工作线程的存活状态
-            while not self.stop_event.is_set():
-                if not all(t.is_alive() for t in self.threads):
-                    app_logger.error(f"❌【流水线 {self.stream_id}】检测到有工作线程意外终止。")
-                    break
-                time.sleep(1)
-
+            # 自适应帧率下 FFmpeg 源按升频后的帧率输出，实际分析帧率由读帧阶段在此基础上再采样
+            source_fps = self.rate_controller.active_fps if self.rate_controller is not None else self.analysis_fps
+            self.source = create_video_source(self.settings, self.video_source, self.source_type, source_fps)
+            self.source.open()
+
+            # 3. 投递各阶段任务：读帧阶段自行驱动；pipelined 模式的推理循环常驻推理池；其余阶段由上游邮箱唤醒
+            self._reader_state = _ReaderState()
+            self.stages["reader"].wake()
+            if self.inference_mode == "pipelined":
+                self.stages["inference"].wake()
+            app_logger.info(f"【流水线 {self.stream_id}】各阶段已投递到共享线程池 (视频源: {self.source_type}, "
+                            f"目标分析帧率: {self.analysis_fps or '源帧率'}, 推理模式: {self.inference_mode})。")
+            self.started_event.set()
+            return True
         except Exception as e:
-            app_logger.error(f"❌【流水线 {self.stream_id}】启动或运行时失败: {e}", exc_info=True)
-        finally:
-            # 确保无论启动成功与否，最终都会调用stop来清理资源
+            app_logger.error(f"❌【流水线 {self.stream_id}】启动失败: {e}", exc_info=True)
+            self.stop()
+            return False
+
+    def _on_stage_done(self, task: StageTask, failed: bool):
+        """阶段结束的回调：后处理阶段正常结束（上游已全部结束）或任一阶段出错时，停止整条流水线。"""
+        if self.stop_event.is_set() or not (failed or task is self.stages["postprocess"]):
+            return
+        if failed:
+            app_logger.error(f"❌【流水线 {self.stream_id}】阶段 {task.name} 意外终止。")
+        # 在 I/O 池中停止，不阻塞当前阶段所在的线程
+        if not self.worker_pools.io.submit(self.stop):
             self.stop()
 
     def stop(self):
-        """有序地停止所有线程并释放所有资源。"""
+        """有序地停止所有阶段任务并释放所有资源。"""
         if self.stop_event.is_set():
             return
         app_logger.warning(f"【流水线 {self.stream_id}】正在停止...")
         self.stop_event.set()
-        # 清除线程已启动事件
-        self.threads_started_event.clear()
+        # 清除已启动事件
+        self.started_event.clear()
 
-
-        # 等待所有线程结束
-        for t in self.threads:
-            if t.is_alive():
-                t.join(timeout=2.0)
+        # 撤销尚未执行的阶段任务，并等待正在执行的任务结束
+        for task in self.stages.values():
+            task.close()
+        # pipelined 模式的推理循环阻塞在推理邮箱上，先关闭邮箱使其立即退出
+        self.inference_queue.close()
+        for task in self.stages.values():
+            task.wait_idle(timeout=2.0)
 
         # 释放视频捕捉对象
-        if self.cap and self.cap.isOpened():
-            self.cap.release()
-            app_logger.info(f"【流水线 {self.stream_id}】视频捕捉已释放。")
-
-        # 清空所有中间队列
-        for q in [self.preprocess_queue, self.inference_queue, self.postprocess_queue]:
-            while not q.empty():
-                try:
-                    q.get_nowait()
-                except queue.Empty:
-                    break
+        if self.source is not None:
+            self.source.release()
+            app_logger.info(f"【流水线 {self.stream_id}】视频源已释放。")
+
+        # 唤醒所有观看者和事件订阅者，使其结束推送
+        self.broadcaster.close()
+        self.event_broadcaster.close()
+
+        # 关闭并清空所有中间邮箱
+        for mailbox in [self.preprocess_queue, self.inference_queue, self.postprocess_queue]:
+            mailbox.close()
+            for packet in mailbox.drain():
+                packet.release()
+        self.frame_pool.close()
+
+        # 流结束时清除仍处于活动状态的告警
+        if self.alarm_engine is not None:
+            self.alarm_engine.close()
+        if self.clip_recorder is not None:
+            self.clip_recorder.close()
+
+        # 撤销尚未执行的调度请求
+        if self.scheduler is not None:
+            self.scheduler.cancel(self.stream_id)
 
         # 归还模型到池中
         if self.model:
@@ -118,122 +371,520 @@ class VideoStreamPipeline:
 
         app_logger.info(f"✅【流水线 {self.stream_id}】所有资源已清理。")
 
-    def _start_threads(self):
-        """创建并启动流水线的四个核心线程。"""
-        thread_targets = {
-            "Reader": self._reader_thread,
-            "Preprocessor": self._preprocessor_thread,
-            "Inference": self._inference_thread,
-            "Postprocessor": self._postprocessor_thread
-        }
-        for name, target in thread_targets.items():
-            thread = threading.Thread(target=target, name=f"{self.stream_id}-{name}", daemon=True)
-            self.threads.append(thread)
-            thread.start()
-
-    def _reader_thread(self):
-        """T1: 从视频源读取帧，放入预处理队列。"""
-        app_logger.info(f"【T1:读帧 {self.stream_id}】启动。")
-        while not self.stop_event.is_set():
-            if not (hasattr(self, 'cap') and self.cap.isOpened()):
+    def _read_step(self) -> Optional[float]:
+        """
+        T1: 从视频源读取一帧，打上采集时间戳后放入预处理邮箱（每次执行读一帧，在 I/O 池中运行）。
+        按目标分析帧率采样：所有帧都用 `grab()` 取出（只解复用，不解码），
+        只有需要分析的帧才调用 `retrieve()` 解码，从而使解码开销与分析帧率成正比。
+        文件源按源时间戳实时播放，能预知出帧时刻的源按 `frame_delay()` 等待，等待都在定时器中进行而不占用线程；
+        实时源由 `grab()` 自身按源帧率阻塞。
+        启用自适应帧率时，目标分析帧率逐帧取自控制器；升频时立即从当前帧重新对齐，不必等完空闲间隔。
+        """
+        state = self._reader_state
+        if self.stop_event.is_set():
+            return self._end_reader()
+        if state.pts is None:
+            if not (self.source is not None and self.source.is_opened()):
                 app_logger.warning(f"【T1:读帧 {self.stream_id}】视频源已关闭或不可用。")
-                break
+                return self._end_reader()
+            delay = self.source.frame_delay()
+            if delay > 0:
+                return delay
 
-            ret, frame = self.cap.read()
-            if not ret:
+            if not self.source.grab():
                 app_logger.info(f"【T1:读帧 {self.stream_id}】视频源结束。")
-                break
-
-            # 保证队列中始终为最新的帧
-            if self.preprocess_queue.full():
-                try:
-                    # 队列已满，丢弃最旧的一帧（队首）
-                    self.preprocess_queue.get_nowait()
-                except queue.Empty:
-                    # 在极罕见的竞争条件下，队列可能在检查后变空，此时忽略即可
-                    pass
-
-            # 将最新的帧放入队列
-            try:
-                self.preprocess_queue.put_nowait(frame)
-                time.sleep(0.01)
-            except queue.Full:
-                # 在极罕见的竞争条件下，队列可能再次被填满，此时放弃本次放入
-                pass
-
-        self.preprocess_queue.put(None)  # 发送结束信号
+                return self._end_reader()
+            self.frames_grabbed += 1
+            state.pts = pts = self.source.timestamp()
+
+            # 文件源：按源时间戳节流到实时速度（单次最多等待 1 秒，源时间戳跳变时不至于长时间停顿）
+            if self.is_file_source:
+                if state.first_pts is None:
+                    state.first_pts = pts
+                delay = state.started_at + (pts - state.first_pts) - time.monotonic()
+                if delay > 0:
+                    return min(delay, 1.0)
+        pts, state.pts = state.pts, None
+
+        if self.rate_controller is not None:
+            self.analysis_fps = self.rate_controller.current_fps()
+            if self.rate_controller.generation != state.rate_generation:
+                state.rate_generation = self.rate_controller.generation
+                state.next_due = None
+
+        # 采样：未到下一个分析时间点的帧只 grab 不解码
+        interval = 1.0 / self.analysis_fps if self.analysis_fps > 0 else 0.0
+        if interval > 0 and state.next_due is not None and pts < state.next_due - 1e-3:
+            self.frames_skipped += 1
+            return StageTask.AGAIN
+        # 以固定步长推进，源时间戳跳变（如断流重连）时从当前帧重新对齐，避免追帧
+        next_due = state.next_due
+        state.next_due = next_due + interval if next_due is not None and pts - next_due < interval else pts + interval
+
+        # 解码进缓冲池中复用的数组；首帧（尺寸未知）或缓冲池耗尽时由解码器临时分配
+        slot = self.frame_pool.acquire(self.frame_shape) if self.frame_shape is not None else None
+        decode_started = time.monotonic()
+        ret, frame = self.source.retrieve(slot.array if slot is not None else None)
+        self.stage_latency["read"].observe(time.monotonic() - decode_started)
+        if slot is not None and (not ret or frame is not slot.array):
+            # 读取失败，或分辨率变化导致解码器另行分配了数组
+            slot.release()
+            slot = None
+        if not ret:
+            return StageTask.AGAIN
+        self.frame_shape = frame.shape
+        self.frames_decoded += 1
+
+        # 邮箱为 latest-wins：下游来不及处理时自动丢弃最旧的帧，保证始终为最新的帧
+        self.preprocess_queue.put(FramePacket(state.frame_id, frame, slot=slot, pts=pts, grabbed_ts=decode_started))
+        state.frame_id += 1
+        return StageTask.AGAIN
+
+    def _end_reader(self) -> float:
+        self.preprocess_queue.close()  # 发送结束信号
         app_logger.info(f"【T1:读帧 {self.stream_id}】已停止。")
+        return StageTask.DONE
 
-    def _preprocessor_thread(self):
-        """T2: 从预处理队列获取帧，传递给推理队列。"""
-        app_logger.info(f"【T2:预处理 {self.stream_id}】启动。")
-        while not self.stop_event.is_set():
-            try:
-                frame = self.preprocess_queue.get(timeout=1)
-                if frame is None:
-                    self.inference_queue.put(None)  # 传递结束信号
-                    break
+    def _preprocess_step(self) -> Optional[float]:
+        """T2: 从预处理邮箱获取一帧，传递给推理邮箱（在 CPU 池中运行）。"""
+        try:
+            packet = self.preprocess_queue.get_nowait()
+        except queue.Empty:
+            return StageTask.IDLE
+        if packet is None:
+            self.inference_queue.close()  # 传递结束信号
+            app_logger.info(f"【T2:预处理 {self.stream_id}】已停止。")
+            return StageTask.DONE
+
+        # 取当前的感兴趣区域快照，该帧的裁剪与结果过滤都使用它
+        packet.roi = self.roi
+
+        # 运动门控：画面（感兴趣区域内）无明显变化的帧绕过推理，直接交给后处理沿用上一次的检测结果
+        if self.motion_gate is not None and not self.motion_gate.should_infer(self._model_input(packet)):
+            if not self.postprocess_queue.put(packet):
+                packet.release()
+        else:
+            # 对于烟火检测，Hailo模型直接处理原始帧，故此阶段为直接传递
+            self.inference_queue.put(packet)
+        return self._next_step(self.preprocess_queue)
+
+    @staticmethod
+    def _next_step(mailbox: LatestMailbox) -> Optional[float]:
+        """输入邮箱中还有帧（或结束信号）时立即再执行一次，否则等待上游唤醒。"""
+        return StageTask.AGAIN if not mailbox.empty() or mailbox.closed else StageTask.IDLE
+
+    def _set_detections(self, packet: FramePacket, results):
+        """
+        把推理后端的输出一次性转换为 DetectionBatch；设置了感兴趣区域时先平移回整帧坐标并丢弃区域外的框，
+        再交给自适应帧率控制器判定疑似目标，最后应用按类别置信度阈值与最小面积过滤。
+        """
+        detections = DetectionBatch.from_dicts(results, packet.frame_id, self.class_names)
+        if packet.roi is not None:
+            detections = packet.roi.to_frame(detections, packet.frame.shape)
+        if self.rate_controller is not None:
+            self.rate_controller.observe(detections)
+        detections = detections.filter_scores(self.class_thresholds)
+        packet.detections = detections.filter_min_area(self.min_box_area)
+
+    def _is_stale(self, packet: FramePacket) -> bool:
+        """帧龄超过 `frame_max_age` 的帧不再送入推理，直接丢弃并计数。"""
+        if self.frame_max_age > 0 and packet.age() > self.frame_max_age:
+            self.stale_dropped += 1
+            packet.release()
+            return True
+        return False
+
+    @staticmethod
+    def _mark_inferred(packet: FramePacket, submitted_at: float):
+        """在帧的追踪记录上标记推理的提交与完成时刻。"""
+        packet.trace.infer_start = submitted_at
+        packet.trace.infer_end = time.monotonic()
+
+    def _end_inference(self) -> float:
+        self.postprocess_queue.close()  # 传递结束信号
+        app_logger.info(f"【T3:推理 {self.stream_id}】已停止。")
+        return StageTask.DONE
 
-                # 对于烟火检测，Hailo模型直接处理原始帧，故此阶段为直接传递
-                self.inference_queue.put(frame)
-            except queue.Empty:
-                continue
-        app_logger.info(f"【T2:预处理 {self.stream_id}】已停止。")
+    def _sync_inference_step(self) -> Optional[float]:
+        """T3 (sync): 逐帧阻塞推理，每次只有一帧在设备上（在推理池中运行，每次执行推理一帧）。"""
+        try:
+            packet = self.inference_queue.get_nowait()
+        except queue.Empty:
+            return StageTask.IDLE
+        if packet is None:
+            return self._end_inference()
+        packet.trace.dequeued = time.monotonic()
+        if self._is_stale(packet):
+            return self._next_step(self.inference_queue)
 
-    def _inference_thread(self):
-        """T3: 从推理队列获取帧，执行模型推理。"""
-        app_logger.info(f"【T3:推理 {self.stream_id}】启动。")
-        while not self.stop_event.is_set():
+        try:
+            # 执行推理
+            submitted_at = time.monotonic()
+            self.inference_stats.on_submit()
             try:
-                frame = self.inference_queue.get(timeout=1)
-                if frame is None:
-                    self.postprocess_queue.put(None)  # 传递结束信号
-                    break
-
-                # 执行推理
-                detection_result = self.model.predict(frame)
-
-                # 将原始帧和推理结果一起传递给后处理线程
-                self.postprocess_queue.put((frame, detection_result.results))
-            except queue.Empty:
-                continue
-            except Exception as e:
-                app_logger.error(f"【T3:推理 {self.stream_id}】发生错误: {e}")
-
-        app_logger.info(f"【T3:推理 {self.stream_id}】已停止。")
-
-    def _postprocessor_thread(self):
-        """T4: 获取推理结果，绘制并编码，放入最终输出队列。"""
-        app_logger.info(f"【T4:后处理 {self.stream_id}】启动。")
+                model_input = self._model_input(packet)
+                if self.tiler is not None:
+                    # 分块推理：同一帧的所有图块作为一批送入模型
+                    tiles = self.tiler.split(model_input)
+                    tile_results = [r.results for r in self.model.predict_batch((tile, None) for tile in tiles)]
+                    results = self.tiler.merge(tile_results, model_input.shape, packet.frame_id, self.class_names)
+                else:
+                    results = self.model.predict(model_input).results
+            finally:
+                self.inference_stats.on_complete(submitted_at)
+                self._mark_inferred(packet, submitted_at)
+
+            # 将原始帧和推理结果一起传递给后处理阶段
+            self._set_detections(packet, results)
+            self.postprocess_queue.put(packet)
+        except Exception as e:
+            app_logger.error(f"【T3:推理 {self.stream_id}】发生错误: {e}")
+            packet.release()
+        return self._next_step(self.inference_queue)
+
+    def _pipelined_inference_step(self) -> float:
+        """T3 (pipelined): 常驻推理池的推理循环，在流的整个生命周期内占用一个推理线程。"""
+        self._run_pipelined_inference()
+        return self._end_inference()
+
+    def _run_pipelined_inference(self):
+        """
+        流水线推理：以生成器的方式把 inference_queue 中的帧持续喂给 `predict_batch`，
+        使最多 `inflight_depth` 帧同时在设备上执行，主机侧的往返不再让设备空等。
+        帧数据包（及提交时间）作为 info 随推理请求一起传递，结果按提交顺序返回。
+        分块推理时每帧的各个图块连续喂入，共占一个在途名额，结果收齐后合并。
+        """
+        inflight_slots = threading.Semaphore(self.inflight_depth)
+
+        def frame_source():
+            while not self.stop_event.is_set():
+                # 在途帧数达到上限时，等待有结果返回后再继续喂帧
+                if not inflight_slots.acquire(timeout=0.5):
+                    continue
+                try:
+                    packet = self.inference_queue.get(timeout=1)
+                except queue.Empty:
+                    inflight_slots.release()
+                    continue
+                if packet is None:
+                    inflight_slots.release()
+                    return
+                packet.trace.dequeued = time.monotonic()
+                if self._is_stale(packet):
+                    inflight_slots.release()
+                    continue
+                self.inference_stats.on_submit()
+                submitted_at = time.monotonic()
+                if self.tiler is None:
+                    yield self._model_input(packet), (packet, submitted_at, 1)
+                    continue
+                tiles = self.tiler.split(self._model_input(packet))
+                for tile in tiles:
+                    yield tile, (packet, submitted_at, len(tiles))
+
+        tile_results = []
+        try:
+            for result in self.model.predict_batch(frame_source()):
+                packet, submitted_at, num_tiles = result.info
+                results = result.results
+                if num_tiles > 1:
+                    tile_results.append(results)
+                    if len(tile_results) < num_tiles:
+                        continue
+                    results = self.tiler.merge(tile_results, self._model_input(packet).shape,
+                                               packet.frame_id, self.class_names)
+                    tile_results = []
+                inflight_slots.release()
+                self.inference_stats.on_complete(submitted_at)
+                self._mark_inferred(packet, submitted_at)
+                self._set_detections(packet, results)
+                self.postprocess_queue.put(packet)
+        except Exception as e:
+            app_logger.error(f"【T3:推理 {self.stream_id}】流水线推理发生错误: {e}", exc_info=True)
+
+    def _on_scheduled_result(self, result: Optional[InferenceResult], info):
+        """调度器返回结果的回调（在调度器线程中执行，邮箱的 put 不会阻塞），随后立即提交该流的下一帧。"""
+        packet, submitted_at = info
+        with self._inflight_lock:
+            self._inflight -= 1
+        self.inference_stats.on_complete(submitted_at)
+        self._mark_inferred(packet, submitted_at)
+        if result is None or self.stop_event.is_set():
+            packet.release()
+        else:
+            results = result.results
+            if self.tiler is not None:
+                results = self.tiler.merge(results, self._model_input(packet).shape,
+                                           packet.frame_id, self.class_names)
+            self._set_detections(packet, results)
+            self.postprocess_queue.put(packet)
+        self._submit_scheduled()
+
+    def _submit_scheduled(self):
+        """
+        T3 (scheduled): 把帧提交给全局 InferenceScheduler，由其与其它流的帧组成微批执行。
+        提交不阻塞，直接在放入帧的上游阶段或返回结果的调度器线程中进行，不经过线程池排队；
+        推理由调度器自己的工作线程执行。同一流同时只有一帧在途，结果在调度器线程中通过回调送入后处理邮箱。
+        """
+        end = False
         while not self.stop_event.is_set():
-            try:
-                data = self.postprocess_queue.get(timeout=1)
-                if data is None:
+            with self._inflight_lock:
+                if self._inference_ending:
+                    # 等待在途帧返回后再发送结束信号（只发送一次）
+                    end = self._inflight == 0 and not self._inference_ended
+                    self._inference_ended |= end
+                    break
+                if self._inflight >= self.inflight_depth:
+                    break
+                try:
+                    packet = self.inference_queue.get_nowait()
+                except queue.Empty:
                     break
+                if packet is None:
+                    self._inference_ending = True
+                    continue
+                packet.trace.dequeued = time.monotonic()
+                if self._is_stale(packet):
+                    continue
+                self._inflight += 1
+            # 在调度器中排队的时间不计入设备利用率，送入模型时才计为在途
+            self.inference_stats.on_queued()
+            info = (packet, time.monotonic())
+            if self.tiler is not None:
+                # 同一帧的图块作为一组提交，调度器保证它们在同一个微批中执行
+                submitted = self.scheduler.submit_group(self.stream_id, self.tiler.split(self._model_input(packet)),
+                                                         info, self._on_scheduled_result,
+                                                         on_dispatch=self.inference_stats.on_dispatch)
+            else:
+                submitted = self.scheduler.submit(self.stream_id, self._model_input(packet), info,
+                                                  self._on_scheduled_result,
+                                                  on_dispatch=self.inference_stats.on_dispatch)
+            if submitted:
+                break
+            app_logger.error(f"【T3:推理 {self.stream_id}】推理调度器未运行，无法提交帧。")
+            with self._inflight_lock:
+                self._inflight -= 1
+                self._inference_ending = True
+            packet.release()
+        if end:
+            self._end_inference()
+
+    def get_stats(self) -> dict:
+        """返回该流水线的运行统计。"""
+        return {
+            "reader": {
+                "analysis_fps": self.analysis_fps,
+                "source_type": self.source_type,
+                "source_fps": round(self.source.fps, 2) if self.source is not None else 0.0,
+                "frames_grabbed": self.frames_grabbed,
+                "frames_decoded": self.frames_decoded,
+                "frames_skipped": self.frames_skipped,
+            },
+            "inference": self.inference_stats.snapshot(),
+            "stages": {
+                mailbox.name: mailbox.stats()
+                for mailbox in (self.preprocess_queue, self.inference_queue, self.postprocess_queue)
+            },
+            "frame_pool": self.frame_pool.stats(),
+            "motion_gate": self.motion_gate.stats() if self.motion_gate is not None else None,
+            "adaptive_fps": self.rate_controller.stats() if self.rate_controller is not None else None,
+            "tracker": self.tracker.stats() if self.tracker is not None else None,
+            "tiling": self.tiler.stats() if self.tiler is not None else None,
+            "roi": self._roi_stats(),
+            "alarms": self.alarm_engine.stats() if self.alarm_engine is not None else None,
+            "recording": self.clip_recorder.stats() if self.clip_recorder is not None else None,
+            "output": {
+                "subscribers": self._subscribers,
+                "frames_analysed": self.frames_analysed,
+                "frames_encoded": self.frames_encoded,
+                "detections": dict(self.detection_counts),
+            },
+            "frame_max_age_ms": round(self.frame_max_age * 1000, 2),
+            "stale_dropped": self.stale_dropped,
+            "tasks": {name: task.stats() for name, task in self.stages.items()},
+        }
 
-                original_frame, detections = data
-
-                # 在帧上绘制检测结果
-                result_frame = draw_detections(
-                    original_frame,
-                    detections,
-                    self.hailo_settings.class_names
-                )
-
-                # 编码为JPEG并放入Web端输出队列
-                (flag, encodedImage) = cv2.imencode(".jpg", result_frame)
-                if flag:
-                    try:
-                        self.output_queue.put_nowait(encodedImage.tobytes())
-                    except asyncio.QueueFull:
-                        pass  # 如果Web端消费慢，则丢弃帧
-            except queue.Empty:
-                continue
-            except Exception as e:
-                app_logger.error(f"【T4:后处理 {self.stream_id}】发生错误: {e}")
+    def collect_metrics(self, registry: MetricsRegistry):
+        """
+        把该流的指标写入一次抓取的指标集合。
+        计数器与队列深度直接读取各组件已有的统计字段，只有直方图在热路径上逐帧记录。
+        """
+        sid = self.stream_id
+        for stage, histogram in self.stage_latency.items():
+            registry.histogram("stage_latency_seconds",
+                               "各阶段单帧耗时（秒）：read=解码，infer=提交到结果返回，postprocess=后处理整体，encode=绘制与 JPEG 编码",
+                               histogram, stream_id=sid, stage=stage)
+        for mailbox in (self.preprocess_queue, self.inference_queue, self.postprocess_queue):
+            registry.gauge("queue_depth", "各阶段队列当前积压的帧数", mailbox.qsize(), stream_id=sid,
+                           queue=f"{mailbox.name}_queue")
+            registry.gauge("queue_capacity", "各阶段队列的容量", mailbox.capacity, stream_id=sid,
+                           queue=f"{mailbox.name}_queue")
+            registry.counter("frames_dropped", "被丢弃的帧数（按原因）", mailbox.dropped_count, stream_id=sid,
+                             reason=f"{mailbox.name}_queue_full")
+        # 输出队列即已编码帧的广播环形缓冲区，深度取最慢观看者的积压帧数
+        registry.gauge("queue_depth", "各阶段队列当前积压的帧数", self.broadcaster.backlog, stream_id=sid,
+                       queue="output_queue")
+        registry.gauge("queue_capacity", "各阶段队列的容量", self.broadcaster.capacity, stream_id=sid,
+                       queue="output_queue")
+        registry.counter("frames_dropped", "被丢弃的帧数（按原因）", self.stale_dropped, stream_id=sid, reason="stale")
+
+        inference = self.inference_stats
+        registry.counter("frames_read", "解码并送入流水线的帧数", self.frames_decoded, stream_id=sid)
+        registry.counter("frames_skipped", "按分析帧率采样时只 grab 未解码的帧数", self.frames_skipped, stream_id=sid)
+        registry.counter("frames_inferred", "完成推理的帧数", inference.frames_completed, stream_id=sid)
+        registry.counter("frames_analysed", "后处理输出检测结果的帧数（含运动门控跳过推理的帧）", self.frames_analysed,
+                         stream_id=sid)
+        registry.counter("frames_encoded", "绘制并编码为 JPEG 的帧数", self.frames_encoded, stream_id=sid)
+        registry.gauge("inference_in_flight", "当前在推理设备上的帧数", inference.in_flight, stream_id=sid)
+        registry.gauge("viewers", "当前的视频画面观看者数", self._subscribers, stream_id=sid)
+        registry.gauge("analysis_fps", "当前的目标分析帧率（0 表示源帧率）", self.analysis_fps, stream_id=sid)
+        for label, count in self.detection_counts.items():
+            registry.counter("detections", "按类别累计的检测框数", count, stream_id=sid, label=label)
+        if self.alarm_engine is not None:
+            alarms = self.alarm_engine.stats()
+            registry.gauge("active_alarms", "当前处于活动状态的告警数", alarms["active_alarms"], stream_id=sid)
+            registry.counter("alarms_started", "已开始的告警数", alarms["alarms_started"], stream_id=sid)
+
+    def get_latency_stats(self) -> dict:
+        """返回逐帧追踪的分段延迟统计（滚动窗口内的 p50/p95/p99）。"""
+        return self.tracer.stats()
+
+    def _roi_stats(self) -> Optional[dict]:
+        roi = self.roi
+        if roi is None:
+            return None
+        crop_rect = roi.crop_rect(self.frame_shape) if self.frame_shape is not None else None
+        return {
+            "polygons": roi.polygons,
+            "crop_rect": list(crop_rect) if crop_rect is not None else None,
+            "crop_ratio": round(crop_rect[2] * crop_rect[3] / (self.frame_shape[0] * self.frame_shape[1]), 4)
+            if crop_rect is not None else None,
+        }
 
+    def _encode_snapshot(self, frame, detections: DetectionBatch) -> Optional[bytes]:
+        """为告警截取代表性快照：在帧的副本上绘制检测框后编码为 JPEG（原帧可能还要用于画面输出）。"""
+        image = draw_detections(frame.copy(), detections, self.class_names)
+        flag, encoded = cv2.imencode(".jpg", image)
+        return encoded.tobytes() if flag else None
+
+    def _on_alarm_event(self, event: dict, now: float):
+        """告警事件（`now` 为产生事件的帧的采集时刻）：驱动告警录像，并序列化后发布到全局告警广播器。"""
+        if self.clip_recorder is not None:
+            self.clip_recorder.on_alarm_event(event, now)
+        if self.alarm_broadcaster is not None:
+            self.alarm_broadcaster.publish(json.dumps(event, ensure_ascii=False))
+
+    def _publish_detection_event(self, packet: FramePacket, inferred: bool = True):
+        """把单帧的检测结果序列化为 JSON 事件并广播（所有订阅者共享同一份序列化结果）。"""
+        event = {
+            "stream_id": self.stream_id,
+            "frame_id": packet.frame_id,
+            "pts": round(packet.pts, 3) if packet.pts is not None else None,
+            # 读帧时刻的墙钟时间（Unix 秒）
+            "timestamp": wall_time(packet.capture_ts),
+            # False 表示该帧被运动门控跳过，检测结果沿用自最近一次推理
+            "inferred": inferred,
+            "detections": packet.detections.to_dicts(),
+        }
+        self.event_broadcaster.publish(json.dumps(event, ensure_ascii=False))
+
+    def _postprocess_step(self) -> Optional[float]:
+        """T4: 获取一帧的推理结果，绘制并编码，放入最终输出队列（在 CPU 池中运行）。"""
+        try:
+            packet = self.postprocess_queue.get_nowait()
+        except queue.Empty:
+            return StageTask.IDLE
+        if packet is None:
+            self.broadcaster.close()  # 发送最终的结束信号
+            self.event_broadcaster.close()
+            app_logger.info(f"【T4:后处理 {self.stream_id}】已停止。")
+            return StageTask.DONE
+
+        started_at = time.monotonic()
         try:
-            self.output_queue.put_nowait(None)  # 发送最终的结束信号
-        except asyncio.QueueFull:
-            pass
-        app_logger.info(f"【T4:后处理 {self.stream_id}】已停止。")
\ No newline at end of file
+            self._postprocess(packet)
+        except Exception as e:
+            app_logger.error(f"【T4:后处理 {self.stream_id}】发生错误: {e}")
+        finally:
+            # 编码完成（或出错）后，帧数组即可归还到缓冲池
+            packet.release()
+            self.stage_latency["postprocess"].observe(time.monotonic() - started_at)
+        return self._next_step(self.postprocess_queue)
+
+    def _postprocess(self, packet: FramePacket):
+        inferred = packet.detections is not None
+        if inferred:
+            for label, count in packet.detections.count_by_label().items():
+                self.detection_counts[label] = self.detection_counts.get(label, 0) + count
+            if self.alarm_engine is not None:
+                # 告警基于推理帧的原始检测结果判定，不受跟踪器外推框的影响
+                raw = packet.detections
+                self.alarm_engine.observe(raw, packet.frame.shape, packet.capture_ts,
+                                          snapshot=lambda: self._encode_snapshot(packet.frame, raw))
+            if self.tracker is not None:
+                packet.detections = self.tracker.update(packet.detections, packet.capture_ts)
+            self.last_detections = packet.detections
+            # 推理耗时期间被门控跳过的更新的帧可能已先输出：检测结果照常计入统计、告警与跟踪，但不再输出这一帧，
+            # 保证画面与事件的帧序号不倒退
+            if packet.frame_id < self._last_output_frame_id:
+                self.frames_analysed += 1
+                # 未发布的帧同样计入延迟统计，否则推理最慢的帧会从分位数中消失
+                self.tracer.finish(packet.frame_id, packet.trace, packet.pts)
+                return
+        else:
+            # 被运动门控跳过的帧：若已落后于输出过的帧（推理中的帧先到达）则丢弃，
+            # 否则输出跟踪器的预测框，未启用跟踪时沿用最近的检测结果
+            if packet.frame_id < self._last_output_frame_id:
+                return
+            if self.tracker is not None:
+                packet.detections = self.tracker.predict(packet.frame_id, packet.capture_ts, self.class_names)
+            else:
+                packet.detections = self.last_detections.for_frame(packet.frame_id)
+        self._last_output_frame_id = max(self._last_output_frame_id, packet.frame_id)
+        self.frames_analysed += 1
+        if self.event_broadcaster.subscription_count:
+            self._publish_detection_event(packet, inferred)
+        # 录像按录像帧率限速，无人观看且本帧不需要录入预录缓冲区时跳过绘制与编码
+        record = self.clip_recorder is not None and self.clip_recorder.wants_frame(packet.capture_ts)
+        if not self._subscribers and not record:
+            self.tracer.finish(packet.frame_id, packet.trace, packet.pts)
+            return
+
+        encode_started = time.monotonic()
+        if packet.roi is not None:
+            draw_roi(packet.frame, packet.roi.pixel_polygons(packet.frame.shape))
+
+        # 在帧上绘制检测结果
+        result_frame = draw_detections(
+            packet.frame,
+            packet.detections,
+            self.class_names
+        )
+
+        # 编码为JPEG并广播给所有观看者（每帧只编码一次，同一份字节也用于录像）
+        (flag, encodedImage) = cv2.imencode(".jpg", result_frame)
+        packet.trace.encode_end = time.monotonic()
+        self.stage_latency["encode"].observe(packet.trace.encode_end - encode_started)
+        seq = None
+        if flag:
+            self.frames_encoded += 1
+            jpeg = encodedImage.tobytes()
+            if self._subscribers:
+                seq = self.broadcaster.publish(jpeg)
+            if record:
+                self.clip_recorder.on_frame(packet.capture_ts, jpeg)
+        # 发布给观看者的帧要等首个观看者写出后才计入延迟统计
+        self.tracer.finish(packet.frame_id, packet.trace, packet.pts, seq)
+
+
+class _ReaderState:
+    """读帧阶段在两次执行之间保留的状态。"""
+    __slots__ = ("frame_id", "next_due", "first_pts", "started_at", "rate_generation", "pts")
+
+    def __init__(self):
+        self.frame_id = 0
+        self.next_due = None  # 源时间轴上下一次需要分析的时间点
+        self.first_pts = None
+        self.started_at = time.monotonic()
+        self.rate_generation = 0
+        self.pts = None  # 已 grab、正在等待到达播放时刻的帧的时间戳
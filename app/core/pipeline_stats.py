@@ -0,0 +1,100 @@
+# app/core/pipeline_stats.py
+import threading
+import time
+from typing import Optional
+
+from app.core.metrics import Histogram
+
+
+class InferenceStats:
+    """
+    统计单个视频流推理阶段的吞吐与设备占用情况。
+    通过“在途帧数”随时间的积分估算设备利用率：
+    - device_utilization: 至少有一帧在途（设备忙）的时间占比；
+    - avg_in_flight: 平均在途帧数，流水线模式下应明显大于 1。
+    scheduled 模式下帧先在调度器中排队（`on_queued`），随微批送入模型（`on_dispatch`）后才计为在途，
+    排队时间不计入设备利用率，但计入推理延迟。
+    提交与完成可能发生在不同线程（如 predict_batch 的喂帧线程与结果线程），因此使用锁保护。
+    传入 `latency_histogram` 时，每帧的推理延迟同时记入该直方图（在已持有的锁内，无额外开销）。
+    """
+
+    def __init__(self, mode: str, inflight_depth: int, latency_histogram: Optional[Histogram] = None):
+        self.mode = mode
+        self.inflight_depth = inflight_depth
+        self._lock = threading.Lock()
+        self._started_at = time.monotonic()
+        self._last_change = self._started_at
+        self.frames_submitted = 0
+        self.frames_completed = 0
+        self.in_flight = 0
+        self.queued = 0
+        self.max_in_flight = 0
+        self._busy_time = 0.0
+        self._inflight_integral = 0.0
+        self._latency_sum = 0.0
+        self._latency_max = 0.0
+        self.latency_histogram = latency_histogram
+
+    def _advance(self, now: float):
+        """将上一次状态变化到现在的时间计入积分。调用方需持有锁。"""
+        elapsed = now - self._last_change
+        if self.in_flight > 0:
+            self._busy_time += elapsed
+            self._inflight_integral += elapsed * self.in_flight
+        self._last_change = now
+
+    def on_submit(self):
+        """一帧被送入模型。"""
+        with self._lock:
+            self._advance(time.monotonic())
+            self.frames_submitted += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def on_queued(self):
+        """一帧已提交，但先在调度器中排队，尚未送入模型。"""
+        with self._lock:
+            self.frames_submitted += 1
+            self.queued += 1
+
+    def on_dispatch(self):
+        """一帧排队结束，随微批送入模型。"""
+        with self._lock:
+            self._advance(time.monotonic())
+            self.queued = max(self.queued - 1, 0)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def on_complete(self, submitted_at: Optional[float] = None):
+        """一帧的推理结果已返回。`submitted_at` 为该帧提交时的 `time.monotonic()`，用于统计推理延迟。"""
+        with self._lock:
+            now = time.monotonic()
+            self._advance(now)
+            self.frames_completed += 1
+            self.in_flight = max(self.in_flight - 1, 0)
+            if submitted_at is not None:
+                latency = now - submitted_at
+                self._latency_sum += latency
+                self._latency_max = max(self._latency_max, latency)
+                if self.latency_histogram is not None:
+                    self.latency_histogram.observe(latency)
+
+    def snapshot(self) -> dict:
+        """返回当前统计数据的快照。"""
+        with self._lock:
+            now = time.monotonic()
+            self._advance(now)
+            wall = max(now - self._started_at, 1e-9)
+            return {
+                "mode": self.mode,
+                "inflight_depth": self.inflight_depth,
+                "frames_submitted": self.frames_submitted,
+                "frames_completed": self.frames_completed,
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "avg_in_flight": round(self._inflight_integral / wall, 3),
+                "device_utilization": round(min(self._busy_time / wall, 1.0), 4),
+                "throughput_fps": round(self.frames_completed / wall, 2),
+                "avg_latency_ms": round(self._latency_sum / max(self.frames_completed, 1) * 1000, 2),
+                "max_latency_ms": round(self._latency_max * 1000, 2),
+            }
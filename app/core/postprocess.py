@@ -0,0 +1,148 @@
+# app/core/postprocess.py
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from app.core.detections import DetectionBatch
+
+
+def decode_yolov8(output: np.ndarray, conf_threshold: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    向量化解码 Ultralytics YOLOv8 的原始输出 [B, 4 + num_classes, num_proposals]。
+    先按每个候选框的最高类别得分做置信度过滤，只有通过的候选框才做坐标转换。
+    返回展平后的 (boxes xyxy float32 [K,4], scores [K], class_ids [K], frame_index [K])，
+    坐标仍位于模型输入（letterbox 后）的坐标系中。
+    """
+    if output.ndim == 2:
+        output = output[np.newaxis, ...]
+    class_scores = output[:, 4:, :]
+    # [B, N]：每个候选框的最高类别得分与对应类别
+    best_scores = class_scores.max(axis=1)
+    frame_index, proposal_index = np.nonzero(best_scores > conf_threshold)
+    if not len(frame_index):
+        empty = np.empty(0, np.float32)
+        return np.empty((0, 4), np.float32), empty, np.empty(0, np.int32), np.empty(0, np.int32)
+
+    scores = best_scores[frame_index, proposal_index].astype(np.float32, copy=False)
+    class_ids = class_scores[frame_index, :, proposal_index].argmax(axis=1).astype(np.int32)
+    # (x_center, y_center, w, h) -> (x1, y1, x2, y2)
+    xywh = output[frame_index, 0:4, proposal_index].astype(np.float32, copy=False)
+    half_wh = xywh[:, 2:4] * 0.5
+    boxes = np.concatenate([xywh[:, 0:2] - half_wh, xywh[:, 0:2] + half_wh], axis=1)
+    return boxes, scores, class_ids, frame_index.astype(np.int32)
+
+
+def undo_letterbox(boxes: np.ndarray, frame_index: np.ndarray, scales: np.ndarray, pads: np.ndarray) -> np.ndarray:
+    """
+    把 letterbox 坐标系中的框还原到各自原图坐标系（原地修改并返回）。
+    `scales` 为 [B] 的缩放比例，`pads` 为 [B, 2] 的 (dw, dh) 填充量，按 `frame_index` 逐框取用。
+    """
+    if not len(boxes):
+        return boxes
+    pad = np.asarray(pads, dtype=np.float32)[frame_index]
+    boxes -= np.concatenate([pad, pad], axis=1)
+    boxes /= np.asarray(scales, dtype=np.float32)[frame_index, np.newaxis]
+    return boxes
+
+
+# 候选框不超过该数量时直接调用 OpenCV 的 C++ 分组 NMS（传入 numpy 数组，无 Python 列表往返）。
+# 它会把所有组放在一起做 O(K²) 的比较，候选框更多（多帧批量）时改用下面按组同步推进的 numpy 实现。
+_OPENCV_NMS_MAX_BOXES = 1024
+_HAS_OPENCV_BATCHED_NMS = hasattr(cv2.dnn, "NMSBoxesBatched")
+
+
+def _limit_per_group(keep: np.ndarray, groups: np.ndarray, max_det: int) -> np.ndarray:
+    """keep 已按得分降序排列；每组只保留前 `max_det` 个。"""
+    if len(keep) <= max_det:
+        return keep
+    g = groups[keep]
+    order = np.argsort(g, kind="stable")
+    sorted_g = g[order]
+    starts = np.flatnonzero(np.r_[True, sorted_g[1:] != sorted_g[:-1]])
+    rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    mask = np.empty(len(keep), dtype=bool)
+    mask[order] = rank < max_det
+    return keep[mask]
+
+
+def batched_nms(boxes: np.ndarray, scores: np.ndarray, groups: np.ndarray, iou_threshold: float,
+                max_det: int = 300) -> np.ndarray:
+    """
+    分组贪心 NMS：只有同一组（如同一帧的同一类别）内的框才会互相抑制，
+    每组最多保留 `max_det` 个框，返回保留框的下标（按得分降序）。
+    候选框较多时所有组同步推进：每一轮同时取出每组剩余得分最高的框，与本组其余存活框的 IoU 一次性计算，
+    迭代次数等于单组保留的最多框数，而不是全部帧、全部类别保留框数之和。
+    """
+    if not len(boxes):
+        return np.empty(0, np.int64)
+    if _HAS_OPENCV_BATCHED_NMS and len(boxes) <= _OPENCV_NMS_MAX_BOXES:
+        xywh = np.concatenate([boxes[:, 0:2], boxes[:, 2:4] - boxes[:, 0:2]], axis=1)
+        keep = cv2.dnn.NMSBoxesBatched(xywh, scores, groups.astype(np.int32), -1.0, iou_threshold)
+        keep = np.asarray(keep, dtype=np.int64).reshape(-1)
+        keep = keep[np.argsort(-scores[keep], kind="stable")]
+        return _limit_per_group(keep, groups, max_det)
+
+    # 先按组、再按得分降序排列，使每组存活框中的第一个即为该组当前得分最高的框
+    order = np.lexsort((-scores, groups))
+    boxes, groups = boxes[order], groups[order]
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = np.maximum(x2 - x1, 0.0) * np.maximum(y2 - y1, 0.0)
+
+    alive = np.ones(len(boxes), dtype=bool)
+    kept = np.zeros(len(boxes), dtype=bool)
+    for _ in range(max_det):
+        idx = np.flatnonzero(alive)
+        if not idx.size:
+            break
+        g = groups[idx]
+        is_head = np.empty(idx.size, dtype=bool)
+        is_head[0] = True
+        np.not_equal(g[1:], g[:-1], out=is_head[1:])
+        heads = idx[is_head]
+        kept[heads] = True
+        # 每个存活框对应的本组当前最高分框
+        head = heads[np.cumsum(is_head) - 1]
+        w = np.maximum(np.minimum(x2[idx], x2[head]) - np.maximum(x1[idx], x1[head]), 0.0)
+        h = np.maximum(np.minimum(y2[idx], y2[head]) - np.maximum(y1[idx], y1[head]), 0.0)
+        inter = w * h
+        iou = inter / np.maximum(areas[idx] + areas[head] - inter, 1e-9)
+        alive[idx] = (iou <= iou_threshold) & ~is_head
+
+    keep = order[kept]
+    return keep[np.argsort(-scores[keep], kind="stable")]
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float, max_det: int = 300) -> np.ndarray:
+    """单组（类别无关）贪心 NMS，返回保留框的下标（按得分降序）。"""
+    return batched_nms(boxes, scores, np.zeros(len(boxes), dtype=np.int64), iou_threshold, max_det)
+
+
+def postprocess_yolov8(output: np.ndarray, conf_threshold: float, iou_threshold: float,
+                       scales: Optional[np.ndarray] = None, pads: Optional[np.ndarray] = None,
+                       names: Sequence[str] = (), frame_ids: Optional[Sequence[int]] = None,
+                       class_agnostic: bool = False, max_det: int = 300) -> List[DetectionBatch]:
+    """
+    YOLOv8 完整后处理：解码 + 置信度过滤 + 还原 letterbox + 按类别（可选类别无关）的批量 NMS。
+    一次处理 B 帧的输出，返回每帧一个 DetectionBatch，全程不经过 Python 列表。
+    """
+    batch_size = output.shape[0] if output.ndim == 3 else 1
+    boxes, scores, class_ids, frame_index = decode_yolov8(output, conf_threshold)
+    if scales is not None:
+        undo_letterbox(boxes, frame_index, scales, pads if pads is not None else np.zeros((batch_size, 2)))
+
+    num_classes = max(output.shape[-2] - 4, 1)
+    groups = frame_index if class_agnostic else frame_index.astype(np.int64) * num_classes + class_ids
+    keep = batched_nms(boxes, scores, groups, iou_threshold, max_det=max_det)
+    # 按帧拆分：先按帧序稳定排序，得分顺序在帧内保持不变
+    keep = keep[np.argsort(frame_index[keep], kind="stable")]
+    boxes, scores, class_ids, frame_index = boxes[keep], scores[keep], class_ids[keep], frame_index[keep]
+    bounds = np.searchsorted(frame_index, np.arange(batch_size + 1))
+
+    results = []
+    for b in range(batch_size):
+        lo, hi = bounds[b], bounds[b + 1]
+        frame_id = frame_ids[b] if frame_ids is not None else -1
+        results.append(DetectionBatch.from_arrays(boxes[lo:hi][:max_det], scores[lo:hi][:max_det],
+                                                  class_ids[lo:hi][:max_det], frame_id, names))
+    return results
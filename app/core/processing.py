@@ -3,42 +3,48 @@ from typing import List
 import cv2
 import numpy as np
 
+from app.core.detections import DetectionBatch
 
 
 def draw_detections(
         image: np.ndarray,
-        detections: List[dict],
+        detections: DetectionBatch,
         class_names: List[str]  # 确保 class_names 的顺序与模型训练时一致
 ):
     """
-    在图像上绘制 degirum 模型返回的检测结果。
+    在图像上绘制检测结果。
 
     Args:
         image (np.ndarray): 原始的OpenCV图像。
-        detections (List[dict]): a `model.predict()` call.
-                                  每个字典包含 'bbox', 'score', 'label'。
-        class_names (List[str]): 模型支持的类别名称列表。
+        detections (DetectionBatch): 单帧检测结果，类别名称取自批次自带的类别表；带有 track_ids 时标注轨迹编号。
+        class_names (List[str]): 模型支持的类别名称列表（批次未携带类别表时使用）。
     """
     # 定义颜色映射，可以根据需要扩展
     colors = {"smoke": (160, 32, 240), "fire": (0, 0, 255)}
+    if not len(detections):
+        return image
 
-    for det in detections:
-        # 从结果字典中提取信息
-        box = det.get('bbox')
-        score = det.get('score', 0.0)
-        label = det.get('label', '')
-
-        if not box:
-            continue
-
-        x1, y1, x2, y2 = map(int, box)
+    # 整批一次性转换为整数像素坐标
+    boxes = detections.boxes.astype(np.int32).tolist()
+    scores = detections.scores.tolist()
+    names = detections.names or class_names
+    track_ids = detections.track_ids.tolist() if detections.track_ids is not None else [None] * len(scores)
+    for (x1, y1, x2, y2), score, class_id, track_id in zip(boxes, scores, detections.class_ids.tolist(), track_ids):
+        label = names[class_id] if 0 <= class_id < len(names) else str(class_id)
 
         # 获取颜色和显示的标签文本
         color = colors.get(label, (0, 255, 0))  # 如果有未知类别，默认为绿色
-        display_text = f"{label}: {score:.2f}"
+        display_text = f"{label}: {score:.2f}" if track_id is None else f"{label} #{track_id}: {score:.2f}"
 
         # 绘制矩形框和标签
         cv2.rectangle(image, (x1, y1), (x2, y2), color, 2)
         cv2.putText(image, display_text, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
 
-    return image
\ No newline at end of file
+    return image
+
+
+def draw_roi(image: np.ndarray, polygons: List[np.ndarray], color=(0, 255, 255)):
+    """在图像上绘制感兴趣区域的多边形轮廓（像素坐标）。"""
+    if polygons:
+        cv2.polylines(image, polygons, isClosed=True, color=color, thickness=2)
+    return image
@@ -0,0 +1,131 @@
+# app/core/rate_controller.py
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from app.cfg.logging import app_logger
+from app.core.detections import DetectionBatch
+from app.core.frame_trace import wall_time
+
+
+class AdaptiveRateController:
+    """
+    检测驱动的自适应分析帧率控制器。
+    平时以较低的 `idle_fps` 分析；任意检测框的得分达到“疑似”阈值（低于正式的 confidence_threshold）时，
+    立即升到 `active_fps` 并保持 `hold_seconds`，保持期内再次出现疑似目标会重新计时；
+    保持期结束后在 `decay_seconds` 内线性回落到 `idle_fps`，回落期间出现疑似目标则重新升频。
+
+    状态：'idle' -> 'escalated' -> 'decaying' -> 'idle'。
+    `observe` 在推理结果到达时调用（推理线程或调度器线程），`current_fps` 由读帧线程逐帧调用，二者以锁保护。
+    """
+    IDLE = "idle"
+    ESCALATED = "escalated"
+    DECAYING = "decaying"
+
+    def __init__(self, stream_id: str, idle_fps: float, active_fps: float, suspicion_threshold: float,
+                 hold_seconds: float = 30.0, decay_seconds: float = 10.0, history: int = 50):
+        self.stream_id = stream_id
+        self.idle_fps = idle_fps
+        self.active_fps = max(active_fps, idle_fps)
+        self.suspicion_threshold = suspicion_threshold
+        self.hold_seconds = hold_seconds
+        self.decay_seconds = decay_seconds
+
+        self._lock = threading.Lock()
+        self.state = self.IDLE
+        self._state_since = time.monotonic()
+        self._last_suspicion_ts: Optional[float] = None
+        self._time_in_state = {self.IDLE: 0.0, self.ESCALATED: 0.0, self.DECAYING: 0.0}
+        self._transitions: deque = deque(maxlen=history)
+        # 每次升频加一，读帧线程据此立即重新对齐采样时间点，而不是等完 idle 间隔
+        self.generation = 0
+        self.escalations = 0
+        self.suspicious_frames = 0
+
+    def _transition(self, new_state: str, now: float, reason: str):
+        old_state = self.state
+        self._time_in_state[old_state] += now - self._state_since
+        self.state = new_state
+        self._state_since = now
+        self._transitions.append({
+            # 墙钟时间（Unix 秒）
+            "timestamp": wall_time(now),
+            "from_state": old_state,
+            "to_state": new_state,
+            "reason": reason,
+        })
+        app_logger.info(f"【自适应帧率 {self.stream_id}】{old_state} -> {new_state}（{reason}），"
+                        f"分析帧率 {self._fps_locked(now):.2f}")
+
+    def _advance(self, now: float):
+        """按时间推进状态：保持期结束进入回落，回落结束回到空闲。"""
+        if self._last_suspicion_ts is None:
+            return
+        quiet = now - self._last_suspicion_ts
+        if self.state == self.ESCALATED and quiet >= self.hold_seconds:
+            self._transition(self.DECAYING, now, f"{self.hold_seconds:g}s 内无疑似目标")
+        if self.state == self.DECAYING and quiet >= self.hold_seconds + self.decay_seconds:
+            self._transition(self.IDLE, now, "回落完成")
+
+    def _fps_locked(self, now: float) -> float:
+        if self.state == self.ESCALATED:
+            return self.active_fps
+        if self.state == self.DECAYING and self.decay_seconds > 0:
+            progress = (now - self._last_suspicion_ts - self.hold_seconds) / self.decay_seconds
+            progress = min(max(progress, 0.0), 1.0)
+            return self.active_fps + (self.idle_fps - self.active_fps) * progress
+        return self.idle_fps
+
+    def observe(self, detections: DetectionBatch, now: Optional[float] = None) -> bool:
+        """
+        用一帧的推理结果（尚未按 confidence_threshold 过滤）更新状态。
+        返回该帧是否含有疑似目标。
+        """
+        if not len(detections):
+            return False
+        best = int(detections.scores.argmax())
+        score = float(detections.scores[best])
+        if score < self.suspicion_threshold:
+            return False
+
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.suspicious_frames += 1
+            self._last_suspicion_ts = now
+            if self.state != self.ESCALATED:
+                self.escalations += 1
+                self.generation += 1
+                label = detections.label_of(int(detections.class_ids[best]))
+                self._transition(self.ESCALATED, now, f"疑似目标 {label} {score:.2f}")
+        return True
+
+    def current_fps(self, now: Optional[float] = None) -> float:
+        """返回当前应使用的分析帧率，并顺带推进超时的状态。"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._advance(now)
+            return self._fps_locked(now)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            self._advance(now)
+            time_in_state = dict(self._time_in_state)
+            time_in_state[self.state] += now - self._state_since
+            return {
+                "state": self.state,
+                "current_fps": round(self._fps_locked(now), 3),
+                "idle_fps": self.idle_fps,
+                "active_fps": self.active_fps,
+                "suspicion_threshold": self.suspicion_threshold,
+                "hold_seconds": self.hold_seconds,
+                "decay_seconds": self.decay_seconds,
+                "escalations": self.escalations,
+                "suspicious_frames": self.suspicious_frames,
+                "seconds_since_suspicion": (
+                    round(now - self._last_suspicion_ts, 3) if self._last_suspicion_ts is not None else None
+                ),
+                "time_in_state_seconds": {k: round(v, 3) for k, v in time_in_state.items()},
+                "transitions": list(self._transitions),
+            }
@@ -0,0 +1,88 @@
+# app/core/roi.py
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from app.core.detections import DetectionBatch
+
+Polygon = Sequence[Tuple[float, float]]
+
+
+def points_in_polygons(points: np.ndarray, vertices: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """
+    向量化的射线法点在多边形内判定。
+    `vertices` 为所有多边形首尾相接拼成的 [V, 2] 顶点数组，`starts` 为各多边形在其中的起始下标。
+    一次性构造 [点数, 边数] 的穿越矩阵，再按多边形分段求和取奇偶，返回 [N] 的布尔数组（落在任一多边形内即为 True）。
+    """
+    if not len(points) or not len(vertices):
+        return np.zeros(len(points), dtype=bool)
+    # 每条边的终点是同一多边形内的下一个顶点（最后一个顶点连回首顶点）
+    ends = np.append(starts[1:], len(vertices))
+    next_index = np.arange(1, len(vertices) + 1)
+    next_index[ends - 1] = starts
+    x1, y1 = vertices[:, 0], vertices[:, 1]
+    x2, y2 = vertices[next_index, 0], vertices[next_index, 1]
+
+    px, py = points[:, 0:1], points[:, 1:2]
+    straddles = (y1 > py) != (y2 > py)
+    dy = np.where(y2 != y1, y2 - y1, 1.0)
+    x_cross = x1 + (py - y1) * (x2 - x1) / dy
+    crossings = straddles & (px < x_cross)
+    inside = np.add.reduceat(crossings.astype(np.int32), starts, axis=1) % 2 == 1
+    return inside.any(axis=1)
+
+
+class RegionOfInterest:
+    """
+    一路流的感兴趣区域：若干个多边形，顶点坐标为相对帧宽高的归一化值（0~1），与分辨率无关。
+    推理只在所有多边形外接矩形的裁剪区域上进行（送入模型的有效像素更多、缩放更少），
+    检测框的中心点不在任何多边形内时被丢弃。对象创建后不再修改，运行时更新 ROI 即整体替换为新对象。
+    """
+
+    def __init__(self, polygons: Sequence[Polygon]):
+        self.polygons: List[List[Tuple[float, float]]] = [[(float(x), float(y)) for x, y in p] for p in polygons]
+        if any(len(p) < 3 for p in self.polygons):
+            raise ValueError("每个 ROI 多边形至少需要 3 个顶点。")
+        self._normalized = np.array([pt for p in self.polygons for pt in p], dtype=np.float64).reshape(-1, 2)
+        self._starts = np.cumsum([0] + [len(p) for p in self.polygons[:-1]]).astype(np.intp)
+        # 按帧尺寸缓存像素坐标的顶点与裁剪矩形
+        self._cache: Dict[Tuple[int, int], Tuple[np.ndarray, Tuple[int, int, int, int]]] = {}
+
+    def _geometry(self, frame_shape: Sequence[int]) -> Tuple[np.ndarray, Tuple[int, int, int, int]]:
+        h, w = int(frame_shape[0]), int(frame_shape[1])
+        cached = self._cache.get((w, h))
+        if cached is None:
+            vertices = self._normalized * (w, h)
+            x1, y1 = np.floor(vertices.min(axis=0)).astype(int)
+            x2, y2 = np.ceil(vertices.max(axis=0)).astype(int)
+            x1, y1 = max(x1, 0), max(y1, 0)
+            x2, y2 = min(max(x2, x1 + 1), w), min(max(y2, y1 + 1), h)
+            cached = (vertices, (int(x1), int(y1), int(x2 - x1), int(y2 - y1)))
+            self._cache[(w, h)] = cached
+        return cached
+
+    def crop_rect(self, frame_shape: Sequence[int]) -> Tuple[int, int, int, int]:
+        """返回像素坐标的裁剪矩形 (x, y, w, h)。"""
+        return self._geometry(frame_shape)[1]
+
+    def crop(self, frame: np.ndarray) -> np.ndarray:
+        """返回外接矩形区域的视图（零拷贝）。"""
+        x, y, w, h = self.crop_rect(frame.shape)
+        return frame[y:y + h, x:x + w]
+
+    def pixel_polygons(self, frame_shape: Sequence[int]) -> List[np.ndarray]:
+        """各多边形的像素坐标顶点（int32，供绘制使用）。"""
+        vertices = self._geometry(frame_shape)[0].astype(np.int32)
+        return np.split(vertices, self._starts[1:])
+
+    def to_frame(self, detections: DetectionBatch, frame_shape: Sequence[int]) -> DetectionBatch:
+        """把裁剪区域坐标系中的检测框平移回整帧坐标，并丢弃中心点不在任何多边形内的框。"""
+        if not len(detections):
+            return detections
+        vertices, (x, y, _, _) = self._geometry(frame_shape)
+        boxes = detections.boxes + np.array([x, y, x, y], dtype=np.float32)
+        centers = (boxes[:, 0:2] + boxes[:, 2:4]) * 0.5
+        keep = points_in_polygons(centers.astype(np.float64), vertices, self._starts)
+        return DetectionBatch.from_arrays(boxes[keep], detections.scores[keep], detections.class_ids[keep],
+                                          detections.frame_id, detections.names,
+                                          detections.track_ids[keep] if detections.track_ids is not None else None)
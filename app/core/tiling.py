@@ -0,0 +1,109 @@
+# app/core/tiling.py
+import math
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from app.core.detections import DetectionBatch
+from app.core.postprocess import batched_nms
+
+
+def _axis_tiles(length: int, tile: int, count: int, overlap: float) -> Tuple[np.ndarray, int]:
+    """
+    沿一个轴切分：返回各图块的起点与图块边长。
+    `count` 为 0 时按 `tile` 边长与重叠比例自动决定块数；否则固定块数，边长按重叠比例反推。
+    起点在 [0, length - tile] 上均匀分布，实际重叠不小于配置值。
+    """
+    if count <= 0:
+        if length <= tile:
+            return np.zeros(1, np.int32), length
+        stride = max(tile * (1.0 - overlap), 1.0)
+        count = math.ceil((length - tile) / stride) + 1
+    else:
+        tile = min(math.ceil(length / (count - (count - 1) * overlap)), length)
+    offsets = np.round(np.linspace(0, length - tile, count)).astype(np.int32)
+    return offsets, tile
+
+
+class FrameTiler:
+    """
+    高分辨率帧的分块推理：把帧切成相互重叠的图块（默认边长等于模型输入尺寸，图块不再被缩小），
+    可选再加一次整帧推理（兼顾大目标），所有图块作为一批提交给模型，
+    结果平移回整帧坐标后做跨图块的按类别 NMS 合并。
+    图块布局按帧尺寸缓存，同一路流只在分辨率变化时重新计算。
+    """
+
+    def __init__(self, tile_size: Tuple[int, int] = (640, 640), grid: Tuple[int, int] = (0, 0),
+                 overlap: float = 0.2, full_frame: bool = True, iou_threshold: float = 0.45,
+                 max_det: int = 300):
+        self.tile_w, self.tile_h = tile_size
+        self.grid_cols, self.grid_rows = grid
+        self.overlap = overlap
+        self.full_frame = full_frame
+        self.iou_threshold = iou_threshold
+        self.max_det = max_det
+        self._layouts: Dict[Tuple[int, int], Tuple[np.ndarray, Tuple[int, int]]] = {}
+
+        self.frames_tiled = 0
+        self.tiles_inferred = 0
+        self._last_layout = np.empty((0, 4), np.int32)
+        self._last_grid = (0, 0)
+
+    def layout(self, frame_shape: Sequence[int]) -> np.ndarray:
+        """返回 [N, 4] 的图块区域 (x, y, w, h)，启用整帧推理时最后一项为整帧。"""
+        h, w = int(frame_shape[0]), int(frame_shape[1])
+        cached = self._layouts.get((w, h))
+        if cached is None:
+            xs, tile_w = _axis_tiles(w, self.tile_w, self.grid_cols, self.overlap)
+            ys, tile_h = _axis_tiles(h, self.tile_h, self.grid_rows, self.overlap)
+            gx, gy = np.meshgrid(xs, ys)
+            regions = np.stack([gx.ravel(), gy.ravel(), np.full(gx.size, tile_w), np.full(gx.size, tile_h)], axis=1)
+            # 整帧只需一块时，整帧推理与该图块重复
+            if self.full_frame and len(regions) > 1:
+                regions = np.concatenate([regions, np.array([[0, 0, w, h]])])
+            cached = (regions.astype(np.int32), (len(xs), len(ys)))
+            self._layouts[(w, h)] = cached
+        self._last_layout, self._last_grid = cached
+        return cached[0]
+
+    def split(self, frame: np.ndarray) -> List[np.ndarray]:
+        """
+        按布局裁出图块。图块是原帧的视图（零拷贝），各推理后端的预处理（缩放 / letterbox）都直接接受带步长的数组；
+        原帧在后处理阶段归还缓冲池之前保持有效。
+        """
+        regions = self.layout(frame.shape)
+        self.frames_tiled += 1
+        self.tiles_inferred += len(regions)
+        return [frame[y:y + h, x:x + w] for x, y, w, h in regions.tolist()]
+
+    def merge(self, results: Sequence, frame_shape: Sequence[int], frame_id: int,
+              names: Sequence[str]) -> DetectionBatch:
+        """
+        把各图块的检测结果（字典列表或 DetectionBatch，顺序与 `split` 一致）平移回整帧坐标，
+        拼接后做按类别 NMS，重叠区域内同一目标的重复框只保留得分最高的一个。
+        """
+        regions = self.layout(frame_shape)
+        batches = [DetectionBatch.from_dicts(r, frame_id, names) for r in results]
+        counts = [len(b) for b in batches]
+        if not sum(counts):
+            return DetectionBatch.empty(frame_id, names)
+
+        offsets = np.repeat(regions[:, 0:2].astype(np.float32), counts, axis=0)
+        boxes = np.concatenate([b.boxes for b in batches]) + np.concatenate([offsets, offsets], axis=1)
+        scores = np.concatenate([b.scores for b in batches])
+        class_ids = np.concatenate([b.class_ids for b in batches])
+        keep = batched_nms(boxes, scores, class_ids, self.iou_threshold, max_det=self.max_det)
+        return DetectionBatch.from_arrays(boxes[keep], scores[keep], class_ids[keep], frame_id, names)
+
+    def stats(self) -> dict:
+        regions = self._last_layout
+        tile_regions = regions[:-1] if self.full_frame and len(regions) > 1 else regions
+        return {
+            "grid": list(self._last_grid),
+            "tile_size": tile_regions[0, 2:4].tolist() if len(tile_regions) else [self.tile_w, self.tile_h],
+            "overlap": self.overlap,
+            "full_frame": self.full_frame,
+            "tiles_per_frame": len(regions),
+            "frames_tiled": self.frames_tiled,
+            "tiles_inferred": self.tiles_inferred,
+        }
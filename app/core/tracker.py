@@ -0,0 +1,202 @@
+# app/core/tracker.py
+from typing import Tuple
+
+import numpy as np
+
+from app.core.detections import DetectionBatch
+
+# 状态向量 [cx, cy, w, h, vcx, vcy, vw, vh]，速度单位为 像素/秒；观测为 [cx, cy, w, h]
+_STATE_DIM = 8
+_MEAS_DIM = 4
+# 噪声标准差与目标尺度（sqrt(w*h)）成正比：位置为尺度的 5%，速度为每秒尺度的 50%
+_STD_POSITION = 0.05
+_STD_VELOCITY = 0.5
+
+
+def _xyxy_to_cxcywh(boxes: np.ndarray) -> np.ndarray:
+    wh = boxes[:, 2:4] - boxes[:, 0:2]
+    return np.concatenate([boxes[:, 0:2] + wh * 0.5, wh], axis=1).astype(np.float64)
+
+
+def _cxcywh_to_xyxy(state: np.ndarray) -> np.ndarray:
+    half = np.maximum(state[:, 2:4], 1.0) * 0.5
+    return np.concatenate([state[:, 0:2] - half, state[:, 0:2] + half], axis=1).astype(np.float32)
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """两组 xyxy 框两两之间的 IoU，返回 [len(a), len(b)]。"""
+    tl = np.maximum(a[:, np.newaxis, 0:2], b[np.newaxis, :, 0:2])
+    br = np.minimum(a[:, np.newaxis, 2:4], b[np.newaxis, :, 2:4])
+    inter = np.prod(np.clip(br - tl, 0.0, None), axis=2)
+    area_a = np.prod(np.clip(a[:, 2:4] - a[:, 0:2], 0.0, None), axis=1)
+    area_b = np.prod(np.clip(b[:, 2:4] - b[:, 0:2], 0.0, None), axis=1)
+    return inter / np.maximum(area_a[:, np.newaxis] + area_b[np.newaxis, :] - inter, 1e-9)
+
+
+def greedy_match(scores: np.ndarray, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    在得分矩阵（如 IoU）上做贪心一对一匹配，返回匹配上的 (行下标, 列下标)。
+    每一轮同时接受所有“互为最优”的行列对，剩余部分继续下一轮：全局最大值所在的行列对必然互为最优，
+    因此结果与逐对按得分降序挑选的贪心匹配相同，而轮数通常只有一两轮，不需要逐框循环。
+    """
+    scores = np.where(scores >= threshold, scores, 0.0)
+    rows, cols = [], []
+    while scores.size:
+        best_col = scores.argmax(axis=1)
+        best_row = scores.argmax(axis=0)
+        r = np.flatnonzero((best_row[best_col] == np.arange(len(scores)))
+                           & (scores[np.arange(len(scores)), best_col] > 0))
+        if not r.size:
+            break
+        c = best_col[r]
+        rows.append(r)
+        cols.append(c)
+        scores[r, :] = 0.0
+        scores[:, c] = 0.0
+    if not rows:
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    return np.concatenate(rows), np.concatenate(cols)
+
+
+class MultiObjectTracker:
+    """
+    SORT 风格的轻量多目标跟踪器：匀速卡尔曼滤波 + IoU 贪心匹配，全部轨迹的状态保存在连续数组中，
+    预测、代价矩阵、匹配与更新都按整批向量化完成，没有逐框的 Python 循环。
+
+    - `update`：在推理过的帧上调用，把所有轨迹预测到该帧时刻，与同类别的检测框按 IoU 匹配并更新，
+      未匹配的检测框新建轨迹，超过 `max_age_seconds` 未被匹配的轨迹被删除。
+    - `predict`：在未推理的帧（如被运动门控跳过）上调用，只外推已确认轨迹的框，不修改滤波器状态。
+      没有新的推理结果就没有删除轨迹的依据，因此这里输出全部轨迹，外推时长最多 `max_age_seconds`。
+
+    输出的 DetectionBatch 带有稳定的 `track_ids`，只包含已确认（匹配次数达到 `min_hits`）的轨迹；
+    推理帧上短暂漏检的轨迹在 `max_age_seconds` 内以预测框继续输出，避免画面和事件闪烁。
+    时间以秒为单位（帧的采集时间戳），因此采样帧率变化时速度估计依然有效。
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_age_seconds: float = 1.0, min_hits: int = 1,
+                 class_aware: bool = True):
+        self.iou_threshold = iou_threshold
+        self.max_age_seconds = max_age_seconds
+        self.min_hits = min_hits
+        self.class_aware = class_aware
+
+        self._time = None  # 滤波器状态对应的时刻
+        self._next_id = 1
+        self.ids = np.empty(0, np.int64)
+        self.class_ids = np.empty(0, np.int32)
+        self.scores = np.empty(0, np.float32)
+        self.hits = np.empty(0, np.int32)
+        self.last_update = np.empty(0, np.float64)
+        self.x = np.empty((0, _STATE_DIM), np.float64)
+        self.P = np.empty((0, _STATE_DIM, _STATE_DIM), np.float64)
+
+        self.tracks_created = 0
+        self.frames_updated = 0
+        self.frames_predicted = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @staticmethod
+    def _scale(state: np.ndarray) -> np.ndarray:
+        return np.sqrt(np.maximum(state[:, 2] * state[:, 3], 1.0))
+
+    def _predict(self, dt: float):
+        """把全部轨迹的状态与协方差外推 dt 秒（原地修改）。"""
+        if dt <= 0 or not len(self):
+            return
+        self.x[:, 0:4] += dt * self.x[:, 4:8]
+        self.x[:, 2:4] = np.maximum(self.x[:, 2:4], 1.0)
+        F = np.eye(_STATE_DIM)
+        F[0:4, 4:8] = np.eye(4) * dt
+        scale = self._scale(self.x)
+        q = np.concatenate([np.repeat(((_STD_POSITION * scale) ** 2)[:, np.newaxis], 4, axis=1),
+                            np.repeat(((_STD_VELOCITY * scale) ** 2)[:, np.newaxis], 4, axis=1)], axis=1) * dt
+        self.P = F @ self.P @ F.T
+        self.P[:, np.arange(_STATE_DIM), np.arange(_STATE_DIM)] += q
+
+    def _correct(self, index: np.ndarray, z: np.ndarray):
+        """用观测 z（[M, 4] 的 cxcywh）更新 `index` 对应轨迹的状态（批量卡尔曼更新，H = [I 0]）。"""
+        x, P = self.x[index], self.P[index]
+        r = (_STD_POSITION * self._scale(x)) ** 2
+        S = P[:, 0:4, 0:4] + r[:, np.newaxis, np.newaxis] * np.eye(_MEAS_DIM)
+        K = P[:, :, 0:4] @ np.linalg.inv(S)
+        self.x[index] = x + (K @ (z - x[:, 0:4])[:, :, np.newaxis])[:, :, 0]
+        self.P[index] = P - K @ P[:, 0:4, :]
+
+    def _spawn(self, detections: DetectionBatch, index: np.ndarray, now: float):
+        """为未匹配的检测框批量新建轨迹，速度初始为 0。"""
+        n = len(index)
+        if not n:
+            return
+        z = _xyxy_to_cxcywh(detections.boxes[index])
+        x = np.concatenate([z, np.zeros((n, 4))], axis=1)
+        scale = self._scale(x)
+        var = np.concatenate([np.repeat(((2 * _STD_POSITION * scale) ** 2)[:, np.newaxis], 4, axis=1),
+                              np.repeat(((10 * _STD_VELOCITY * scale) ** 2)[:, np.newaxis], 4, axis=1)], axis=1)
+        P = np.zeros((n, _STATE_DIM, _STATE_DIM))
+        P[:, np.arange(_STATE_DIM), np.arange(_STATE_DIM)] = var
+
+        self.ids = np.concatenate([self.ids, np.arange(self._next_id, self._next_id + n, dtype=np.int64)])
+        self._next_id += n
+        self.tracks_created += n
+        self.class_ids = np.concatenate([self.class_ids, detections.class_ids[index]])
+        self.scores = np.concatenate([self.scores, detections.scores[index]])
+        self.hits = np.concatenate([self.hits, np.ones(n, np.int32)])
+        self.last_update = np.concatenate([self.last_update, np.full(n, now)])
+        self.x = np.concatenate([self.x, x])
+        self.P = np.concatenate([self.P, P])
+
+    def _keep(self, mask: np.ndarray):
+        self.ids, self.class_ids, self.scores = self.ids[mask], self.class_ids[mask], self.scores[mask]
+        self.hits, self.last_update = self.hits[mask], self.last_update[mask]
+        self.x, self.P = self.x[mask], self.P[mask]
+
+    def _output(self, state: np.ndarray, frame_id: int, names) -> DetectionBatch:
+        confirmed = self.hits >= self.min_hits
+        return DetectionBatch.from_arrays(
+            _cxcywh_to_xyxy(state[confirmed]), self.scores[confirmed], self.class_ids[confirmed],
+            frame_id, names, self.ids[confirmed],
+        )
+
+    def update(self, detections: DetectionBatch, now: float) -> DetectionBatch:
+        """用一帧推理结果更新跟踪器，返回该帧的已确认轨迹。"""
+        if self._time is not None:
+            self._predict(now - self._time)
+        self._time = now if self._time is None else max(self._time, now)
+        self.frames_updated += 1
+
+        matched_tracks = matched_dets = np.empty(0, np.int64)
+        if len(self) and len(detections):
+            iou = iou_matrix(_cxcywh_to_xyxy(self.x), detections.boxes)
+            if self.class_aware:
+                iou[self.class_ids[:, np.newaxis] != detections.class_ids[np.newaxis, :]] = 0.0
+            matched_tracks, matched_dets = greedy_match(iou, self.iou_threshold)
+            if len(matched_tracks):
+                self._correct(matched_tracks, _xyxy_to_cxcywh(detections.boxes[matched_dets]))
+                self.scores[matched_tracks] = detections.scores[matched_dets]
+                self.hits[matched_tracks] += 1
+                self.last_update[matched_tracks] = now
+
+        unmatched = np.ones(len(detections), dtype=bool)
+        unmatched[matched_dets] = False
+        self._keep(now - self.last_update <= self.max_age_seconds)
+        self._spawn(detections, np.flatnonzero(unmatched), now)
+        return self._output(self.x, detections.frame_id, detections.names)
+
+    def predict(self, frame_id: int, now: float, names=()) -> DetectionBatch:
+        """未推理的帧：按匀速模型外推已确认轨迹的框，不修改滤波器状态。"""
+        self.frames_predicted += 1
+        if self._time is None or not len(self):
+            return DetectionBatch.empty(frame_id, names)
+        dt = min(max(now - self._time, 0.0), self.max_age_seconds)
+        return self._output(self.x[:, 0:4] + dt * self.x[:, 4:8], frame_id, names)
+
+    def stats(self) -> dict:
+        return {
+            "active_tracks": len(self),
+            "confirmed_tracks": int(np.count_nonzero(self.hits >= self.min_hits)),
+            "tracks_created": self.tracks_created,
+            "frames_updated": self.frames_updated,
+            "frames_predicted": self.frames_predicted,
+        }
@@ -0,0 +1,371 @@
+# app/core/video_source.py
+import json
+import os
+import re
+import subprocess
+import time
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+import cv2
+import numpy as np
+
+from app.cfg.config import AppSettings
+from app.cfg.logging import app_logger
+
+
+SYNTHETIC_SCHEME = "synthetic://"
+_SYNTHETIC_SPEC = re.compile(r"^(?:(\d+)x(\d+))?(?:@([\d.]+))?$")
+
+
+def is_file_source(source: str) -> bool:
+    """是否为本地视频文件（文件源需要按时间戳节流，实时源则不需要）。"""
+    return os.path.isfile(source)
+
+
+class VideoSource(ABC):
+    """
+    视频源的抽象接口，采用与 `cv2.VideoCapture` 一致的两段式读取：
+    `grab()` 取出下一帧（尽量不做解码/转换），`retrieve()` 才真正得到 BGR 图像。
+    流水线据此只为需要分析的帧付出解码开销。
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+
+    @abstractmethod
+    def open(self):
+        """打开视频源，失败时抛出 RuntimeError。"""
+
+    @abstractmethod
+    def is_opened(self) -> bool:
+        """视频源当前是否可读。"""
+
+    @abstractmethod
+    def grab(self) -> bool:
+        """取出下一帧。返回 False 表示视频源结束或出错。"""
+
+    def frame_delay(self) -> float:
+        """
+        距下一帧可以无阻塞取出还需等待的秒数。能预知出帧时刻的源（如按帧率节流的合成源）据此让读帧任务
+        在定时器中等待，而不是阻塞在 `grab()` 中占用工作线程；默认返回 0。
+        """
+        return 0.0
+
+    @abstractmethod
+    def retrieve(self, image: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        """
+        返回最近一次 grab 的帧（BGR, HWC, uint8）。
+        提供 `image` 且尺寸匹配时直接写入该数组（用于帧缓冲池复用），否则返回新分配的数组。
+        """
+
+    @abstractmethod
+    def timestamp(self) -> float:
+        """最近一次 grab 的帧在源时间轴上的时间戳（秒），保证单调不减。"""
+
+    @property
+    @abstractmethod
+    def fps(self) -> float:
+        """视频源（或解码器输出）的标称帧率，未知时为 0。"""
+
+    @abstractmethod
+    def release(self):
+        """释放视频源。"""
+
+
+class OpenCVVideoSource(VideoSource):
+    """基于 `cv2.VideoCapture` 的视频源，按源分辨率全尺寸解码。"""
+
+    def __init__(self, source: str):
+        super().__init__(source)
+        self.cap: Optional[cv2.VideoCapture] = None
+        self._fps = 0.0
+        self._opened_at = time.monotonic()
+        self._last_pts = -1.0
+
+    def open(self):
+        source_for_cv = int(self.source) if self.source.isdigit() else self.source
+        self.cap = cv2.VideoCapture(source_for_cv)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"无法打开视频源: {self.source}")
+        self._fps = self.cap.get(cv2.CAP_PROP_FPS) or 0.0
+        self._opened_at = time.monotonic()
+
+    def is_opened(self) -> bool:
+        return self.cap is not None and self.cap.isOpened()
+
+    def grab(self) -> bool:
+        return self.cap.grab()
+
+    def retrieve(self, image: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        return self.cap.retrieve(image=image)
+
+    def timestamp(self) -> float:
+        """
+        部分摄像头/RTSP 源不提供有效或递增的时间戳，此时按标称帧率外推，再不行则退回墙钟。
+        """
+        pts = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        if pts > self._last_pts:
+            self._last_pts = pts
+        elif self._fps > 0:
+            self._last_pts += 1.0 / self._fps
+        else:
+            self._last_pts = max(time.monotonic() - self._opened_at, self._last_pts)
+        return self._last_pts
+
+    @property
+    def fps(self) -> float:
+        return self._fps
+
+    def release(self):
+        if self.cap is not None and self.cap.isOpened():
+            self.cap.release()
+
+
+class FFmpegVideoSource(VideoSource):
+    """
+    基于 `ffmpeg` 子进程的视频源。
+    在解码器内部用 `fps` / `scale` 滤镜完成降帧和缩放，以 rawvideo(bgr24) 经管道输出，
+    高分辨率摄像头只需在接近模型输入的分辨率下完成颜色转换与拷贝。
+    `grab()` 把整帧读入一块复用的缓冲区（不产生新的内存分配），`retrieve()` 才把它复制到独立的帧数组。
+    """
+
+    def __init__(self, source: str, ffmpeg_path: str = "ffmpeg", ffprobe_path: str = "ffprobe",
+                 scale_width: int = 0, output_fps: float = 0.0):
+        super().__init__(source)
+        self.ffmpeg_path = ffmpeg_path
+        self.ffprobe_path = ffprobe_path
+        self.scale_width = scale_width
+        self.output_fps = output_fps
+        self.width = 0
+        self.height = 0
+        self._fps = 0.0
+        self._process: Optional[subprocess.Popen] = None
+        self._buffer: Optional[np.ndarray] = None
+        self._buffer_view: Optional[memoryview] = None
+        self._frame_index = -1
+        self._opened_at = time.monotonic()
+
+    def _input_args(self) -> List[str]:
+        if self.source.isdigit():
+            # 本地摄像头编号，对应 Linux 下的 V4L2 设备
+            return ["-f", "v4l2", "-i", f"/dev/video{self.source}"]
+        args = []
+        if self.source.startswith("rtsp://"):
+            args += ["-rtsp_transport", "tcp"]
+        return args + ["-i", self.source]
+
+    def _probe(self) -> Tuple[int, int, float]:
+        """使用 ffprobe 获取源的分辨率与帧率。"""
+        probe_source = f"/dev/video{self.source}" if self.source.isdigit() else self.source
+        cmd = [self.ffprobe_path, "-v", "error", "-select_streams", "v:0",
+               "-show_entries", "stream=width,height,avg_frame_rate,r_frame_rate", "-of", "json", probe_source]
+        try:
+            output = subprocess.run(cmd, capture_output=True, check=True, timeout=15).stdout
+            stream = json.loads(output)["streams"][0]
+        except (subprocess.SubprocessError, OSError, KeyError, IndexError, ValueError) as e:
+            raise RuntimeError(f"ffprobe 无法探测视频源 {self.source}: {e}") from e
+
+        fps = 0.0
+        for key in ("avg_frame_rate", "r_frame_rate"):
+            num, _, den = stream.get(key, "0/0").partition("/")
+            if den and float(den) > 0 and float(num) > 0:
+                fps = float(num) / float(den)
+                break
+        return int(stream["width"]), int(stream["height"]), fps
+
+    def open(self):
+        src_w, src_h, src_fps = self._probe()
+        if self.scale_width and self.scale_width < src_w:
+            self.width = self.scale_width
+            # 保持宽高比，并保证高度为偶数
+            self.height = max(int(round(src_h * self.scale_width / src_w / 2)) * 2, 2)
+        else:
+            self.width, self.height = src_w, src_h
+
+        filters = []
+        if self.output_fps > 0:
+            filters.append(f"fps={self.output_fps:g}")
+        if (self.width, self.height) != (src_w, src_h):
+            filters.append(f"scale={self.width}:{self.height}")
+        self._fps = self.output_fps if self.output_fps > 0 else src_fps
+
+        cmd = [self.ffmpeg_path, "-hide_banner", "-loglevel", "error", "-nostdin"] + self._input_args()
+        if filters:
+            cmd += ["-vf", ",".join(filters)]
+        cmd += ["-an", "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"]
+
+        frame_bytes = self.width * self.height * 3
+        try:
+            self._process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                             bufsize=frame_bytes)
+        except OSError as e:
+            raise RuntimeError(f"无法启动 ffmpeg 进程 ({self.ffmpeg_path}): {e}") from e
+
+        self._buffer = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        self._buffer_view = memoryview(self._buffer).cast("B")
+        self._opened_at = time.monotonic()
+        app_logger.info(f"FFmpeg 视频源已启动: {src_w}x{src_h}@{src_fps:.2f} -> {self.width}x{self.height}"
+                        f"@{self._fps:.2f}, 滤镜: {','.join(filters) or '无'}")
+
+    def is_opened(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def grab(self) -> bool:
+        """把下一帧完整读入复用缓冲区。"""
+        if self._process is None:
+            return False
+        stdout = self._process.stdout
+        total = len(self._buffer_view)
+        received = 0
+        while received < total:
+            n = stdout.readinto(self._buffer_view[received:])
+            if not n:
+                return False
+            received += n
+        self._frame_index += 1
+        return True
+
+    def retrieve(self, image: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        if self._frame_index < 0:
+            return False, None
+        if image is not None and image.shape == self._buffer.shape:
+            np.copyto(image, self._buffer)
+            return True, image
+        return True, self._buffer.copy()
+
+    def timestamp(self) -> float:
+        # 经过 fps 滤镜后输出为恒定帧率，按帧序号计算；帧率未知时退回墙钟
+        if self._fps > 0:
+            return self._frame_index / self._fps
+        return time.monotonic() - self._opened_at
+
+    @property
+    def fps(self) -> float:
+        return self._fps
+
+    def release(self):
+        if self._process is None:
+            return
+        process, self._process = self._process, None
+        try:
+            process.terminate()
+            process.wait(timeout=2.0)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        finally:
+            if process.stdout:
+                process.stdout.close()
+
+
+class SyntheticVideoSource(VideoSource):
+    """
+    合成视频源，用于在没有摄像头和样例视频的环境下做基准测试与压测。
+    地址格式为 `synthetic://<宽>x<高>@<帧率>?motion=<0~1>&frames=<帧数>&seed=<种子>`，例如
+    `synthetic://1920x1080@25?motion=0.1`；省略的部分取默认值 1280x720、25fps、motion=0.1、不限帧数。
+    画面为固定的带纹理背景上一个来回移动的色块，`motion` 为色块占画面面积的比例（0 表示静止画面）。
+    与实时摄像头一样，`grab()` 按帧率阻塞（帧率为 0 时不节流，尽可能快地产出），`frame_delay()` 给出距下一帧的等待时间；
+    `retrieve()` 只做背景拷贝与色块填充，不模拟解码开销。
+    """
+
+    def __init__(self, source: str):
+        super().__init__(source)
+        spec, _, query = source[len(SYNTHETIC_SCHEME):].partition("?")
+        match = _SYNTHETIC_SPEC.match(spec)
+        if match is None:
+            raise ValueError(f"无法解析合成视频源地址: {source}")
+        params = dict(parse_qsl(query))
+        self.width = int(match.group(1) or 1280)
+        self.height = int(match.group(2) or 720)
+        self._fps = float(match.group(3) or 25.0)
+        self.motion = min(max(float(params.get("motion", 0.1)), 0.0), 1.0)
+        self.max_frames = int(params.get("frames", 0))
+        self.seed = int(params.get("seed", 0))
+        self._background: Optional[np.ndarray] = None
+        self._frame_index = -1
+        self._opened_at = time.monotonic()
+
+    def open(self):
+        if self.width <= 0 or self.height <= 0:
+            raise RuntimeError(f"合成视频源分辨率无效: {self.width}x{self.height}")
+        rng = np.random.default_rng(self.seed)
+        # 横向渐变叠加随机纹理，使编码与运动检测的开销接近真实画面
+        gradient = np.linspace(40, 200, self.width, dtype=np.float32)[None, :, None]
+        noise = rng.normal(0.0, 12.0, size=(self.height, self.width, 3)).astype(np.float32)
+        self._background = np.clip(gradient + noise, 0, 255).astype(np.uint8)
+        self._frame_index = -1
+        self._opened_at = time.monotonic()
+
+    def is_opened(self) -> bool:
+        return self._background is not None
+
+    def frame_delay(self) -> float:
+        if self._background is None or self._fps <= 0:
+            return 0.0
+        return max(self._opened_at + (self._frame_index + 1) / self._fps - time.monotonic(), 0.0)
+
+    def grab(self) -> bool:
+        if self._background is None or (self.max_frames and self._frame_index + 1 >= self.max_frames):
+            return False
+        self._frame_index += 1
+        if self._fps > 0:
+            delay = self._opened_at + self._frame_index / self._fps - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        return True
+
+    def _block_rect(self) -> Tuple[int, int, int, int]:
+        """当前帧运动色块的位置 (x, y, w, h)：沿对角线往返，约 4 秒走完一趟。"""
+        scale = self.motion ** 0.5
+        bw, bh = int(self.width * scale), int(self.height * scale)
+        period = max(int((self._fps or 25.0) * 4), 1)
+        phase = self._frame_index % (2 * period)
+        t = (phase if phase < period else 2 * period - phase) / period
+        return int((self.width - bw) * t), int((self.height - bh) * t), bw, bh
+
+    def retrieve(self, image: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        if self._background is None or self._frame_index < 0:
+            return False, None
+        if image is None or image.shape != self._background.shape:
+            image = np.empty_like(self._background)
+        np.copyto(image, self._background)
+        x, y, w, h = self._block_rect()
+        if w and h:
+            image[y:y + h, x:x + w] = ((self._frame_index * 7) % 256, 96, 255 - (self._frame_index * 7) % 256)
+        return True, image
+
+    def timestamp(self) -> float:
+        if self._fps > 0:
+            return self._frame_index / self._fps
+        return time.monotonic() - self._opened_at
+
+    @property
+    def fps(self) -> float:
+        return self._fps
+
+    def release(self):
+        self._background = None
+
+
+def create_video_source(settings: AppSettings, source: str, source_type: Optional[str] = None,
+                        analysis_fps: float = 0.0) -> VideoSource:
+    """
+    按类型创建视频源。FFmpeg 源直接在解码器内把帧率降到目标分析帧率。
+    `synthetic://` 地址总是创建合成视频源，与视频源类型无关。
+    """
+    if source.startswith(SYNTHETIC_SCHEME):
+        return SyntheticVideoSource(source)
+    source_type = source_type or settings.app.source_type
+    if source_type == "ffmpeg":
+        return FFmpegVideoSource(
+            source,
+            ffmpeg_path=settings.app.ffmpeg_path,
+            ffprobe_path=settings.app.ffprobe_path,
+            scale_width=settings.app.ffmpeg_scale_width,
+            output_fps=analysis_fps,
+        )
+    if source_type == "opencv":
+        return OpenCVVideoSource(source)
+    raise ValueError(f"未知的视频源类型: '{source_type}'")
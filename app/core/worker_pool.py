@@ -0,0 +1,356 @@
+# app/core/worker_pool.py
+import heapq
+import itertools
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.cfg.config import AppSettings
+from app.cfg.logging import app_logger
+from app.core.metrics import MetricsRegistry
+
+
+class WorkerPool:
+    """
+    有界的共享工作线程池：所有视频流的同类阶段任务在这里执行。
+    线程按需创建（有任务排队且没有空闲线程时才新建，直到 `max_workers`），创建后常驻复用。
+    记录排队等待与执行耗时，用于计算线程池的利用率。
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        if max_workers < 1:
+            raise ValueError(f"线程池 {name} 的线程数必须至少为 1")
+        self.name = name
+        self.max_workers = max_workers
+        self._tasks: "queue.SimpleQueue[Optional[Tuple[Callable[[], None], float]]]" = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._running = True
+        self._idle = 0
+        self._queued = 0
+        # 各线程正在执行的任务的开始时刻，用于把执行中的任务也计入忙碌时间
+        self._task_started: Dict[int, float] = {}
+
+        # 统计
+        self._started_at = time.monotonic()
+        self._busy_seconds = 0.0
+        self._tasks_completed = 0
+        self._tasks_failed = 0
+        self._wait_sum = 0.0
+        self._wait_max = 0.0
+
+    def submit(self, fn: Callable[[], None]) -> bool:
+        """提交一个任务。线程池已停止时返回 False。"""
+        with self._lock:
+            if not self._running:
+                return False
+            self._queued += 1
+            self._tasks.put((fn, time.monotonic()))
+            if self._queued > self._idle and len(self._threads) < self.max_workers:
+                thread = threading.Thread(target=self._worker_loop, name=f"{self.name}-{len(self._threads)}",
+                                          daemon=True)
+                self._threads.append(thread)
+                thread.start()
+        return True
+
+    def _worker_loop(self):
+        ident = threading.get_ident()
+        while True:
+            with self._lock:
+                self._idle += 1
+            item = self._tasks.get()
+            started = time.monotonic()
+            with self._lock:
+                self._idle -= 1
+                if item is None:
+                    return
+                self._queued -= 1
+                wait = started - item[1]
+                self._wait_sum += wait
+                self._wait_max = max(self._wait_max, wait)
+                self._task_started[ident] = started
+            failed = False
+            try:
+                item[0]()
+            except Exception as e:
+                failed = True
+                app_logger.error(f"【线程池 {self.name}】任务执行出错: {e}", exc_info=True)
+            with self._lock:
+                self._busy_seconds += time.monotonic() - self._task_started.pop(ident)
+                self._tasks_completed += 1
+                self._tasks_failed += failed
+
+    def stop(self, timeout: float = 5.0):
+        """停止接收任务，未执行的任务被丢弃，等待各线程执行完当前任务后退出。"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            threads = list(self._threads)
+        # 丢弃排队中的任务，再为每个线程放入一个结束信号
+        while True:
+            try:
+                self._tasks.get_nowait()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._queued = 0
+        for _ in threads:
+            self._tasks.put(None)
+        for thread in threads:
+            thread.join(timeout=timeout)
+
+    def stats(self) -> dict:
+        """返回线程池的计数快照；利用率为自启动以来忙碌时间占 `max_workers` 个线程总时间的比例。"""
+        with self._lock:
+            now = time.monotonic()
+            busy_seconds = self._busy_seconds + sum(now - started for started in self._task_started.values())
+            wall = max(now - self._started_at, 1e-9)
+            started = self._tasks_completed + len(self._task_started)
+            return {
+                "max_workers": self.max_workers,
+                "workers": len(self._threads),
+                "busy": len(self._task_started),
+                "queued": self._queued,
+                "tasks_completed": self._tasks_completed,
+                "tasks_failed": self._tasks_failed,
+                "busy_seconds": round(busy_seconds, 3),
+                "utilisation": round(busy_seconds / (wall * self.max_workers), 4),
+                "avg_queue_wait_ms": round(self._wait_sum / max(started, 1) * 1000, 3),
+                "max_queue_wait_ms": round(self._wait_max * 1000, 3),
+            }
+
+
+class DelayTimer:
+    """
+    所有线程池共享的单个定时线程：到期后执行回调（回调应只做投递任务之类的轻量操作）。
+    用于文件源按源时间戳节流等需要“稍后再执行”的阶段任务，等待期间不占用工作线程。
+    """
+
+    def __init__(self, name: str = "StageTimer"):
+        self.name = name
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[float, int, Callable[[], None]]] = []
+        self._seq = itertools.count()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        with self._cond:
+            self._running = True
+        self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._heap.clear()
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+    def call_later(self, delay: float, fn: Callable[[], None]) -> bool:
+        """`delay` 秒后在定时线程中调用 `fn`。定时器未运行时返回 False。"""
+        with self._cond:
+            if not self._running:
+                return False
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), fn))
+            self._cond.notify()
+        return True
+
+    @property
+    def pending(self) -> int:
+        return len(self._heap)
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._running and (not self._heap or self._heap[0][0] > time.monotonic()):
+                    self._cond.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                if not self._running:
+                    return
+                _, _, fn = heapq.heappop(self._heap)
+            try:
+                fn()
+            except Exception as e:
+                app_logger.error(f"【定时器】回调执行出错: {e}", exc_info=True)
+
+
+class StageTask:
+    """
+    流水线中一个阶段在共享线程池上的执行单元。
+    每次执行调用一次 `step()`，由返回值决定下一步：
+    - `IDLE`（None）：没有可处理的数据，等待 `wake()`（上游放入数据或关闭邮箱时调用）；
+    - `AGAIN`（0）：立即重新排队（排到线程池队尾，使各流公平地轮流执行）；
+    - 正数：在定时器中等待该秒数后重新排队，等待期间不占用工作线程；
+    - `DONE`：该阶段结束。
+    同一阶段同时最多只有一次执行在排队或运行，因此阶段内部的状态不需要加锁，帧的顺序也得以保持。
+    """
+    IDLE = None
+    AGAIN = 0.0
+    DONE = -1.0
+
+    def __init__(self, name: str, pool: WorkerPool, step: Callable[[], Optional[float]], timer: DelayTimer,
+                 on_done: Optional[Callable[["StageTask", bool], None]] = None):
+        self.name = name
+        self.pool = pool
+        self._step = step
+        self._timer = timer
+        self._on_done = on_done
+        self._lock = threading.Lock()
+        self._scheduled = False  # 已排队、在定时器中等待或正在执行
+        self._rewake = False  # 执行期间收到了 wake，结束后需要再执行一次
+        self._closed = False
+        self._idle = threading.Event()
+        self._idle.set()
+        self.runs = 0
+        self.busy_seconds = 0.0
+
+    def wake(self):
+        """有新数据可处理时调用；已排队或正在执行时只做标记，不会重复排队。"""
+        with self._lock:
+            if self._closed:
+                return
+            if self._scheduled:
+                self._rewake = True
+                return
+            self._scheduled = True
+        self._submit()
+
+    def close(self):
+        """撤销该阶段：已排队或在定时器中等待的执行不再运行（正在运行的执行不受影响，见 `wait_idle`）。"""
+        with self._lock:
+            self._closed = True
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """等待正在运行的一次执行结束。"""
+        return self._idle.wait(timeout)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def _submit(self):
+        if not self.pool.submit(self._run):
+            self._finish(failed=True)
+
+    def _resubmit_later(self, delay: float):
+        if not self._timer.call_later(delay, self._submit):
+            self._finish(failed=True)
+
+    def _run(self):
+        with self._lock:
+            if self._closed:
+                self._scheduled = False
+                return
+            self._rewake = False
+            self._idle.clear()
+        started = time.monotonic()
+        failed = False
+        try:
+            result = self._step()
+        except Exception as e:
+            app_logger.error(f"【阶段 {self.name}】执行出错，该阶段终止: {e}", exc_info=True)
+            result, failed = self.DONE, True
+        finally:
+            self.runs += 1
+            self.busy_seconds += time.monotonic() - started
+
+        with self._lock:
+            if self._closed:
+                self._scheduled = False
+                self._idle.set()
+                return
+            if result == self.DONE:
+                self._closed = True
+                self._scheduled = False
+                action = "done"
+            elif result is self.IDLE:
+                action = "again" if self._rewake else "idle"
+                self._scheduled = self._rewake
+            else:
+                action = "again" if result <= 0 else "later"
+            self._idle.set()
+        if action == "again":
+            self._submit()
+        elif action == "later":
+            self._resubmit_later(result)
+        elif action == "done" and self._on_done is not None:
+            self._on_done(self, failed)
+
+    def _finish(self, failed: bool):
+        """线程池或定时器已停止，无法继续执行时结束该阶段。"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._scheduled = False
+        if self._on_done is not None:
+            self._on_done(self, failed)
+
+    def stats(self) -> dict:
+        return {
+            "pool": self.pool.name,
+            "runs": self.runs,
+            "busy_seconds": round(self.busy_seconds, 3),
+        }
+
+
+class WorkerPools:
+    """
+    全局共享的阶段执行资源：所有视频流的阶段任务都在这几个有界线程池中执行，线程数不再随流数线性增长。
+    - io：读帧与解码。实时源的 `grab()` 会阻塞等待下一帧，期间占用一个线程；
+    - cpu：预处理（运动门控、图块切分）与后处理（绘制、JPEG 编码）；
+    - inference：sync / pipelined 模式下执行推理。pipelined 模式的推理循环在流的整个生命周期内占用一个线程，
+      由于每路流独占一个模型实例，线程数默认与模型实例数相同；scheduled 模式下推理由调度器的工作线程执行，不创建此线程池。
+    """
+
+    def __init__(self, settings: AppSettings):
+        app = settings.app
+        self.io = WorkerPool("io", app.io_pool_workers or app.max_streams)
+        self.cpu = WorkerPool("cpu", app.cpu_pool_workers or os.cpu_count() or 1)
+        self.inference: Optional[WorkerPool] = None
+        if app.inference_mode != "scheduled":
+            self.inference = WorkerPool("inference", app.inference_pool_workers or app.max_concurrent_tasks)
+            if app.inference_mode == "pipelined" and self.inference.max_workers < app.max_concurrent_tasks:
+                app_logger.warning(f"⚠️ 推理线程池只有 {self.inference.max_workers} 个线程，少于模型实例数 "
+                                   f"{app.max_concurrent_tasks}：pipelined 模式下超出的视频流将无法执行推理。")
+        self.timer = DelayTimer()
+
+    @property
+    def pools(self) -> List[WorkerPool]:
+        return [pool for pool in (self.io, self.cpu, self.inference) if pool is not None]
+
+    def start(self):
+        self.timer.start()
+        app_logger.info("✅ 共享工作线程池已就绪: " +
+                        "，".join(f"{pool.name} 最多 {pool.max_workers} 个线程" for pool in self.pools) + "。")
+
+    def stop(self):
+        """停止定时器与所有线程池（应在所有视频流停止后调用）。"""
+        self.timer.stop()
+        for pool in self.pools:
+            pool.stop()
+        app_logger.info("✅ 共享工作线程池已停止。")
+
+    def get_stats(self) -> dict:
+        return {
+            "timer_pending": self.timer.pending,
+            "pools": {pool.name: pool.stats() for pool in self.pools},
+        }
+
+    def collect_metrics(self, registry: MetricsRegistry):
+        for pool in self.pools:
+            stats = pool.stats()
+            registry.gauge("worker_pool_max_workers", "共享线程池的线程数上限", stats["max_workers"], pool=pool.name)
+            registry.gauge("worker_pool_workers", "共享线程池已创建的线程数", stats["workers"], pool=pool.name)
+            registry.gauge("worker_pool_busy", "共享线程池中正在执行任务的线程数", stats["busy"], pool=pool.name)
+            registry.gauge("worker_pool_queued", "共享线程池中排队等待的任务数", stats["queued"], pool=pool.name)
+            registry.counter("worker_pool_tasks", "共享线程池已执行完的任务数", stats["tasks_completed"], pool=pool.name)
+            # rate(busy_seconds_total) / max_workers 即为该时间窗口内的利用率
+            registry.counter("worker_pool_busy_seconds", "共享线程池所有线程的累计忙碌时间（秒）", stats["busy_seconds"],
+                             pool=pool.name)
+        registry.gauge("worker_pool_timer_pending", "等待定时器到期的阶段任务数", self.timer.pending)
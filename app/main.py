@@ -14,8 +14,11 @@ from app.cfg.config import get_app_settings
 from app.cfg.logging import app_logger, setup_logging
 # 核心修改：导入 ModelPool
 from app.core.model_manager import ModelPool
+from app.core.inference_scheduler import InferenceScheduler
+from app.core.worker_pool import WorkerPools
 from app.router.detection_router import router as detection_router
 from app.router.device_router import router as device_router
+from app.router.metrics_router import router as metrics_router
 from app.schema.detection_schema import ApiResponse
 from app.service.detection_service import DetectionService
 
@@ -39,8 +42,21 @@ async def lifespan(app: FastAPI):
     )
     app.state.model_pool = model_pool
 
+    # 1.1 调度模式下，由全局推理调度器统一持有所有模型实例
+    scheduler = None
+    if settings.app.inference_mode == "scheduled":
+        scheduler = InferenceScheduler(settings=settings, model_pool=model_pool)
+        scheduler.start()
+        app.state.inference_scheduler = scheduler
+
+    # 1.2 所有视频流的阶段任务共享的有界线程池（读帧 / CPU / 推理）
+    worker_pools = WorkerPools(settings)
+    worker_pools.start()
+    app.state.worker_pools = worker_pools
+
     # 2. 初始化核心服务，并注入模型池
-    detection_service = DetectionService(settings=settings, model_pool=model_pool)
+    detection_service = DetectionService(settings=settings, model_pool=model_pool, worker_pools=worker_pools,
+                                         scheduler=scheduler)
     app.state.detection_service = detection_service
     app_logger.info("✅ 检测服务 (DetectionService) 初始化完成。")
 
@@ -70,7 +86,13 @@ async def lifespan(app: FastAPI):
     if hasattr(app.state, 'detection_service'):
         await app.state.detection_service.stop_all_streams()
 
-    # 3. 释放模型池资源，并强制清理后台进程
+    # 3. 停止共享线程池，停止推理调度器并将模型实例归还到池中
+    if hasattr(app.state, 'worker_pools'):
+        app.state.worker_pools.stop()
+    if hasattr(app.state, 'inference_scheduler'):
+        app.state.inference_scheduler.stop()
+
+    # 4. 释放模型池资源，并强制清理后台进程
     if hasattr(app.state, 'model_pool'):
         app.state.model_pool.dispose()
 
@@ -109,6 +131,8 @@ def create_app() -> FastAPI:
     # --- 挂载路由和静态文件 (保持不变) ---
     app.include_router(detection_router, prefix="/api/detection", tags=["烟火检测服务"])
     app.include_router(device_router, prefix="/api/device", tags=["Hailo设备"])
+    # Prometheus 默认抓取 /metrics，不加前缀
+    app.include_router(metrics_router)
     STATIC_FILES_DIR = Path(__file__).parent / "static"
     if STATIC_FILES_DIR.is_dir():
         app.mount("/static", StaticFiles(directory=STATIC_FILES_DIR), name="static")
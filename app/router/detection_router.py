@@ -1,10 +1,15 @@
 # app/router/detection_router.py
-from fastapi import APIRouter, Depends, Request, HTTPException, status
-from fastapi.responses import StreamingResponse
+import os
+
+from fastapi import APIRouter, Depends, Query, Request, HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from typing import Optional
 
 from app.schema.detection_schema import (
     ApiResponse, StreamDetail, GetAllStreamsResponseData,
-    StreamStartRequest, StopStreamResponseData, HealthCheckResponseData
+    StreamStartRequest, StopStreamResponseData, HealthCheckResponseData, StreamStatsResponseData,
+    SchedulerStatsResponseData, RoiUpdateRequest, RoiUpdateResponseData, ActiveAlarmsResponseData,
+    ClipData, ClipListResponseData, StreamLatencyResponseData, WorkerPoolsStatsResponseData
 )
 from app.service.detection_service import DetectionService
 
@@ -21,6 +26,16 @@ def get_detection_service(request: Request) -> DetectionService:
     return request.app.state.detection_service
 
 
+def _stream_urls(request: Request, stream_id: str) -> dict:
+    """为指定流生成画面与检测事件的访问地址（url_for 会自动处理根路径等前缀）。"""
+    ws_url = request.url_for('detection_events_ws', stream_id=stream_id)
+    return {
+        "feed_url": str(request.url_for('get_stream_feed', stream_id=stream_id)),
+        "events_url": str(request.url_for('get_detection_events', stream_id=stream_id)),
+        "ws_url": str(ws_url.replace(scheme="wss" if ws_url.scheme == "https" else "ws")),
+    }
+
+
 @router.get(
     "/health",
     response_model=ApiResponse[HealthCheckResponseData],
@@ -52,8 +67,7 @@ async def start_stream(
     # 使用 request.url_for 动态生成可访问的视频流 URL。
     # 这种方法比硬编码URL（如 f"/api/detection/streams/feed/{stream_info.stream_id}"）更健壮，
     # 因为它会自动处理应用的根路径(root_path)等前缀，在反向代理后也能正常工作。
-    feed_url = request.url_for('get_stream_feed', stream_id=stream_info.stream_id)
-    response_data = StreamDetail(**stream_info.model_dump(), feed_url=str(feed_url))
+    response_data = StreamDetail(**stream_info.model_dump(), **_stream_urls(request, stream_info.stream_id))
 
     # 关键点：区分 HTTP 状态码和业务状态码。
     # HTTP 状态码（201 CREATED）由装饰器 `status_code` 参数决定，表示请求在传输层成功。
@@ -83,6 +97,62 @@ async def get_stream_feed(
     )
 
 
+@router.get(
+    "/streams/events/{stream_id}",
+    summary="以 SSE 订阅指定流的检测结果",
+    description="通过 Server-Sent Events 推送每一帧的检测结果（帧时间戳、检测框、置信度与类别），不含任何图像数据。"
+                "流结束时发送一条 `end` 事件。",
+    tags=["视频流管理"],
+    name="get_detection_events",
+    responses={
+        200: {"content": {"text/event-stream": {}}, "description": "成功返回检测事件流。"},
+        404: {"description": "指定的 stream_id 未找到或已停止。"}
+    }
+)
+async def get_detection_events(
+        stream_id: str,
+        service: DetectionService = Depends(get_detection_service)
+):
+    """返回 SSE 流式响应，每个 `detection` 事件的 data 为一帧检测结果的 JSON。"""
+    events = await service.open_detection_events(stream_id)
+
+    async def sse():
+        async for event in events:
+            yield f"event: detection\ndata: {event}\n\n"
+        yield "event: end\ndata: {}\n\n"
+
+    return StreamingResponse(
+        sse(),
+        media_type="text/event-stream",
+        # 禁止缓存与反向代理缓冲，保证事件实时到达
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/streams/ws/{stream_id}", name="detection_events_ws")
+async def detection_events_ws(websocket: WebSocket, stream_id: str):
+    """
+    以 WebSocket 推送指定流的检测结果，每条文本消息为一帧检测结果的 JSON，不含图像。
+    流不存在时以 1008 关闭连接；流结束时服务端正常关闭连接。
+    """
+    service: DetectionService = websocket.app.state.detection_service
+    try:
+        events = await service.open_detection_events(stream_id)
+    except HTTPException as e:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(e.detail))
+        return
+
+    await websocket.accept()
+    try:
+        async for event in events:
+            await websocket.send_text(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await events.aclose()
+
+
 @router.post(
     "/streams/stop/{stream_id}",
     response_model=ApiResponse[StopStreamResponseData],
@@ -104,6 +174,216 @@ async def stop_stream(
     return ApiResponse(data=StopStreamResponseData(stream_id=stream_id))
 
 
+@router.get(
+    "/streams/{stream_id}/stats",
+    response_model=ApiResponse[StreamStatsResponseData],
+    summary="获取指定视频流的运行统计",
+    description="返回该视频流流水线的实时统计，如推理吞吐、在途帧数与设备利用率。",
+    tags=["视频流管理"]
+)
+async def get_stream_stats(
+        stream_id: str,
+        service: DetectionService = Depends(get_detection_service)
+):
+    """返回指定流的运行统计。"""
+    stats = await service.get_stream_stats(stream_id)
+    return ApiResponse(data=stats)
+
+
+@router.get(
+    "/streams/{stream_id}/stats/latency",
+    response_model=ApiResponse[StreamLatencyResponseData],
+    summary="获取指定视频流的分段延迟",
+    description="返回逐帧追踪的分段延迟在滚动窗口内的 p50/p95/p99，"
+                "用于定位画面延迟出在解码、排队、推理、后处理编码还是向观看者的推送。",
+    tags=["视频流管理"]
+)
+async def get_stream_latency(
+        stream_id: str,
+        service: DetectionService = Depends(get_detection_service)
+):
+    """返回指定流的分段延迟统计。"""
+    latency = await service.get_stream_latency(stream_id)
+    return ApiResponse(data=latency)
+
+
+@router.put(
+    "/streams/{stream_id}/roi",
+    response_model=ApiResponse[RoiUpdateResponseData],
+    summary="更新指定视频流的感兴趣区域",
+    description="运行时替换该视频流的感兴趣区域多边形（归一化坐标），从下一帧开始生效，无需重启流。空列表表示恢复整帧推理。",
+    tags=["视频流管理"]
+)
+async def update_stream_roi(
+        stream_id: str,
+        roi_request: RoiUpdateRequest,
+        service: DetectionService = Depends(get_detection_service)
+):
+    """更新指定流的感兴趣区域。"""
+    result = await service.update_stream_roi(stream_id, roi_request.rois)
+    return ApiResponse(data=result)
+
+
+@router.get(
+    "/alarms",
+    response_model=ApiResponse[ActiveAlarmsResponseData],
+    summary="获取活动告警列表",
+    description="返回所有（或指定视频流的）当前活动告警，包括持续时长、最高置信度与代表性快照地址。"
+                "告警由时域告警引擎对逐帧检测结果做 N-of-M 确认与去抖后产生。",
+    tags=["告警"]
+)
+async def get_active_alarms(
+        request: Request,
+        stream_id: Optional[str] = None,
+        service: DetectionService = Depends(get_detection_service)
+):
+    """返回活动告警列表，并为带快照的告警生成快照地址。"""
+    alarms = await service.get_active_alarms(stream_id)
+    for alarm in alarms:
+        if alarm.snapshot is not None:
+            alarm.snapshot_url = str(request.url_for('get_alarm_snapshot', alarm_id=alarm.alarm_id))
+    return ApiResponse(data=ActiveAlarmsResponseData(active_alarms_count=len(alarms), alarms=alarms))
+
+
+@router.get(
+    "/alarms/events",
+    summary="以 SSE 订阅所有视频流的告警事件",
+    description="通过 Server-Sent Events 推送去抖后的告警事件：`start`（告警开始）、`update`（告警持续期间定期更新）"
+                "与 `clear`（告警清除），每条 data 为包含告警当前状态的 JSON。服务关闭时发送一条 `end` 事件。",
+    tags=["告警"],
+    responses={200: {"content": {"text/event-stream": {}}, "description": "成功返回告警事件流。"}}
+)
+async def get_alarm_events(service: DetectionService = Depends(get_detection_service)):
+    """返回 SSE 流式响应，每个 `alarm` 事件的 data 为一条告警事件的 JSON。"""
+    events = service.open_alarm_events()
+
+    async def sse():
+        async for event in events:
+            yield f"event: alarm\ndata: {event}\n\n"
+        yield "event: end\ndata: {}\n\n"
+
+    return StreamingResponse(
+        sse(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get(
+    "/alarms/{alarm_id}/snapshot",
+    summary="获取告警的代表性快照",
+    description="返回活动告警期间置信度最高的一帧（已绘制检测框）的 JPEG 图像。",
+    tags=["告警"],
+    name="get_alarm_snapshot",
+    responses={
+        200: {"content": {"image/jpeg": {}}, "description": "成功返回快照图像。"},
+        404: {"description": "指定的告警不存在、已清除或尚无快照。"}
+    }
+)
+async def get_alarm_snapshot(
+        alarm_id: str,
+        service: DetectionService = Depends(get_detection_service)
+):
+    """返回告警快照图像。"""
+    image = await service.get_alarm_snapshot(alarm_id)
+    return Response(content=image, media_type="image/jpeg")
+
+
+def _with_download_url(request: Request, clip: ClipData) -> ClipData:
+    clip.download_url = str(request.url_for('download_clip', clip_id=clip.clip_id))
+    return clip
+
+
+@router.get(
+    "/clips",
+    response_model=ApiResponse[ClipListResponseData],
+    summary="查询告警录像片段",
+    description="按视频流、告警类别与开始时间范围（Unix 秒）查询告警录像片段的索引，按开始时间倒序分页返回。"
+                "片段包含告警开始前的预录画面与告警清除后的后录画面。",
+    tags=["告警"]
+)
+async def list_clips(
+        request: Request,
+        stream_id: Optional[str] = None,
+        label: Optional[str] = None,
+        since: Optional[float] = Query(None, description="只返回开始时间不早于该时刻（Unix 秒）的片段"),
+        until: Optional[float] = Query(None, description="只返回开始时间早于该时刻（Unix 秒）的片段"),
+        limit: int = Query(50, ge=1, le=500, description="每页数量"),
+        offset: int = Query(0, ge=0, description="分页偏移"),
+        service: DetectionService = Depends(get_detection_service)
+):
+    """返回片段列表，并为每个片段生成下载地址。"""
+    clips = await service.list_clips(stream_id, label, since, until, limit, offset)
+    clips = [_with_download_url(request, clip) for clip in clips]
+    return ApiResponse(data=ClipListResponseData(count=len(clips), clips=clips))
+
+
+@router.get(
+    "/clips/{clip_id}",
+    response_model=ApiResponse[ClipData],
+    summary="获取告警录像片段详情",
+    description="返回指定片段的索引记录，包括状态、时长、覆盖的告警与下载地址。",
+    tags=["告警"]
+)
+async def get_clip(
+        request: Request,
+        clip_id: str,
+        service: DetectionService = Depends(get_detection_service)
+):
+    """返回指定片段的索引记录。"""
+    clip, _ = await service.get_clip(clip_id)
+    return ApiResponse(data=_with_download_url(request, clip))
+
+
+@router.get(
+    "/clips/{clip_id}/download",
+    summary="下载告警录像片段",
+    description="下载片段文件（MJPEG 裸流，可由 ffplay / VLC 直接播放）。录制中的片段返回 409。",
+    tags=["告警"],
+    name="download_clip",
+    responses={
+        200: {"content": {"video/x-motion-jpeg": {}}, "description": "成功返回片段文件。"},
+        404: {"description": "指定的片段不存在或文件已被删除。"},
+        409: {"description": "片段仍在录制中。"}
+    }
+)
+async def download_clip(
+        clip_id: str,
+        service: DetectionService = Depends(get_detection_service)
+):
+    """以附件形式返回片段文件。"""
+    clip, path = await service.get_clip(clip_id)
+    if clip.status == "recording":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"录像片段 '{clip_id}' 仍在录制中。")
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"录像片段 '{clip_id}' 的文件不存在。")
+    return FileResponse(path, media_type="video/x-motion-jpeg", filename=os.path.basename(path))
+
+
+@router.get(
+    "/scheduler/stats",
+    response_model=ApiResponse[SchedulerStatsResponseData],
+    summary="获取推理调度器统计",
+    description="返回跨流批处理推理调度器的运行统计，包括微批填充率和各流的排队等待时间。",
+    tags=["系统状态"]
+)
+async def get_scheduler_stats(service: DetectionService = Depends(get_detection_service)):
+    """返回全局推理调度器的统计信息。"""
+    return ApiResponse(data=service.get_scheduler_stats())
+
+
+@router.get(
+    "/workers/stats",
+    response_model=ApiResponse[WorkerPoolsStatsResponseData],
+    summary="获取共享工作线程池统计",
+    description="返回所有视频流共享的读帧（io）、CPU 与推理线程池的统计，包括线程数、排队任务数、排队等待时间与利用率。",
+    tags=["系统状态"]
+)
+async def get_worker_pool_stats(service: DetectionService = Depends(get_detection_service)):
+    """返回共享工作线程池的统计信息。"""
+    return ApiResponse(data=service.get_worker_pool_stats())
+
+
 @router.get(
     "/streams",
     response_model=ApiResponse[GetAllStreamsResponseData],
@@ -120,7 +400,7 @@ async def get_all_streams(
     streams_with_details = [
         StreamDetail(
             **info.model_dump(),
-            feed_url=str(request.url_for('get_stream_feed', stream_id=info.stream_id))
+            **_stream_urls(request, info.stream_id)
         )
         for info in active_streams_info
     ]
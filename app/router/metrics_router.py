@@ -0,0 +1,22 @@
+# app/router/metrics_router.py
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.core.metrics import MetricsRegistry
+from app.router.detection_router import get_detection_service
+from app.service.detection_service import DetectionService
+
+router = APIRouter()
+
+
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    summary="Prometheus 指标",
+    description="以 Prometheus 文本格式（0.0.4）导出各视频流的分阶段延迟直方图、队列深度、帧计数、观看者数，"
+                "以及模型池占用与等待时间等指标，供 Prometheus 抓取。",
+    tags=["系统状态"]
+)
+async def get_metrics(service: DetectionService = Depends(get_detection_service)):
+    """返回当前所有指标的文本快照。"""
+    return PlainTextResponse(service.render_metrics(), media_type=MetricsRegistry.CONTENT_TYPE)
@@ -1,6 +1,7 @@
 # app/schema/detection_schema.py
 from pydantic import BaseModel, Field
-from typing import List, Optional, TypeVar, Generic
+from typing import Dict, List, Literal, Optional, Tuple, TypeVar, Generic
+from typing_extensions import Annotated
 from datetime import datetime
 
 # --- 通用 API 响应模型 ---
@@ -24,6 +25,10 @@ class HealthCheckResponseData(BaseModel):
     message: str = Field("烟火检测服务正常运行。", description="服务状态的详细信息")
 
 # --- 视频流管理 Schema ---
+# 感兴趣区域多边形：顶点为 [x, y]，取值为相对帧宽高的归一化坐标 (0~1)，与视频分辨率无关
+RoiPoint = Tuple[Annotated[float, Field(ge=0.0, le=1.0)], Annotated[float, Field(ge=0.0, le=1.0)]]
+RoiPolygon = Annotated[List[RoiPoint], Field(min_length=3)]
+
 class StreamStartRequest(BaseModel):
     """启动视频流的请求体 `/streams/start` (POST)。"""
     source: str = Field(
@@ -36,6 +41,52 @@ class StreamStartRequest(BaseModel):
         description="视频流生命周期（分钟）。-1表示永久，不填(null)则使用配置文件中的默认值。",
         example=10
     )
+    analysis_fps: Optional[float] = Field(
+        None,
+        ge=0,
+        description="目标分析帧率（帧/秒）。0表示分析每一帧，不填(null)则使用配置文件中的默认值。",
+        example=5
+    )
+    source_type: Optional[Literal["opencv", "ffmpeg"]] = Field(
+        None,
+        description="视频源类型：'opencv' 或 'ffmpeg'（在解码器内缩放与降帧，适合高分辨率摄像头）。不填(null)则使用配置文件中的默认值。",
+        example="ffmpeg"
+    )
+    motion_gate: Optional[bool] = Field(
+        None,
+        description="是否启用运动门控（静止画面不送推理，沿用最近一次的检测结果）。不填(null)则使用配置文件中的默认值。",
+        example=True
+    )
+    rois: Optional[List[RoiPolygon]] = Field(
+        None,
+        description="感兴趣区域多边形列表，顶点为归一化坐标 [x, y] (0~1)。推理只在多边形外接矩形内进行，中心点不在任何多边形内的检测框被丢弃。不填(null)或空列表表示整帧。",
+        example=[[[0.1, 0.4], [0.6, 0.4], [0.6, 0.95], [0.1, 0.95]]]
+    )
+    tiled: Optional[bool] = Field(
+        None,
+        description="是否启用分块推理（高分辨率帧切成重叠图块分别推理，提升远处小目标检出率）。不填(null)则使用配置文件中的默认值。",
+        example=True
+    )
+    tracking: Optional[bool] = Field(
+        None,
+        description="是否启用多目标跟踪（未推理的帧输出预测框，检测结果带稳定的 track_id）。不填(null)则使用配置文件中的默认值。",
+        example=True
+    )
+    adaptive_fps: Optional[bool] = Field(
+        None,
+        description="是否启用自适应分析帧率（平时低帧率，出现疑似目标时升频）。启用后 analysis_fps 由控制器接管。不填(null)则使用配置文件中的默认值。",
+        example=True
+    )
+    alarms: Optional[bool] = Field(
+        None,
+        description="是否启用时域告警引擎（N-of-M 确认与去抖后产生 start / update / clear 告警事件）。不填(null)则使用配置文件中的默认值。",
+        example=True
+    )
+    recording: Optional[bool] = Field(
+        None,
+        description="是否启用告警录像（告警开始前后的画面写成片段，启用后同时启用告警引擎）。不填(null)则使用配置文件中的默认值。",
+        example=True
+    )
 
 class ActiveStreamInfo(BaseModel):
     """描述一个活动视频流的内部基础信息，不直接暴露给用户。"""
@@ -44,13 +95,37 @@ class ActiveStreamInfo(BaseModel):
     started_at: datetime = Field(..., description="流的启动时间 (UTC时间)")
     expires_at: Optional[datetime] = Field(None, description="流的计划过期时间 (UTC时间)，None表示永不过期")
     lifetime_minutes: int = Field(..., description="配置的生命周期（分钟），-1表示永久")
+    analysis_fps: float = Field(0.0, description="目标分析帧率（帧/秒），0表示分析每一帧")
+    source_type: str = Field("opencv", description="视频源类型")
+    motion_gate: bool = Field(False, description="是否启用运动门控")
+    adaptive_fps: bool = Field(False, description="是否启用自适应分析帧率")
+    tracking: bool = Field(False, description="是否启用多目标跟踪")
+    tiled: bool = Field(False, description="是否启用分块推理")
+    alarms: bool = Field(False, description="是否启用时域告警引擎")
+    recording: bool = Field(False, description="是否启用告警录像")
+    rois: List[List[Tuple[float, float]]] = Field([], description="当前的感兴趣区域多边形（归一化坐标），空列表表示整帧")
 
 class StreamDetail(ActiveStreamInfo):
     """
     返回给客户端的、包含完整可访问信息的流详情。
-    继承自 `ActiveStreamInfo` 并增加了 `feed_url`。
+    继承自 `ActiveStreamInfo` 并增加了 `feed_url` 与检测事件订阅地址。
     """
     feed_url: str = Field(..., description="用于在浏览器或播放器中查看该视频流的完整URL")
+    events_url: str = Field(..., description="以 Server-Sent Events 订阅该流纯检测结果（不含图像）的完整URL")
+    ws_url: str = Field(..., description="以 WebSocket 订阅该流纯检测结果（不含图像）的完整URL")
+
+class RoiUpdateRequest(BaseModel):
+    """运行时更新感兴趣区域的请求体 `/streams/{stream_id}/roi` (PUT)。"""
+    rois: List[RoiPolygon] = Field(
+        ...,
+        description="新的感兴趣区域多边形列表（归一化坐标），空列表表示恢复整帧推理",
+        example=[[[0.1, 0.4], [0.6, 0.4], [0.6, 0.95], [0.1, 0.95]]]
+    )
+
+class RoiUpdateResponseData(BaseModel):
+    """更新感兴趣区域 `/streams/{stream_id}/roi` (PUT) 的响应数据。"""
+    stream_id: str = Field(..., description="视频流ID")
+    rois: List[List[Tuple[float, float]]] = Field(..., description="生效的感兴趣区域多边形")
 
 class StopStreamResponseData(BaseModel):
     """停止视频流操作 `/streams/stop/{stream_id}` (POST) 的响应数据。"""
@@ -60,4 +135,276 @@ class StopStreamResponseData(BaseModel):
 class GetAllStreamsResponseData(BaseModel):
     """获取所有活动视频流列表 `/streams` (GET) 的响应数据。"""
     active_streams_count: int = Field(..., description="当前活动的视频流总数")
-    streams: List[StreamDetail] = Field([], description="所有活动视频流的详细信息列表")
\ No newline at end of file
+    streams: List[StreamDetail] = Field([], description="所有活动视频流的详细信息列表")
+
+# --- 视频流运行统计 Schema ---
+class InferenceStatsData(BaseModel):
+    """推理阶段的吞吐与设备占用统计。"""
+    mode: str = Field(..., description="推理模式：'sync' 逐帧阻塞 / 'pipelined' 流水线")
+    inflight_depth: int = Field(..., description="允许同时在途的最大帧数")
+    frames_submitted: int = Field(..., description="已送入模型的帧数")
+    frames_completed: int = Field(..., description="已返回推理结果的帧数")
+    in_flight: int = Field(..., description="当前在途帧数")
+    max_in_flight: int = Field(..., description="历史最大在途帧数")
+    avg_in_flight: float = Field(..., description="平均在途帧数")
+    device_utilization: float = Field(..., description="设备利用率估计值（0~1），即至少有一帧在途的时间占比")
+    throughput_fps: float = Field(..., description="平均推理吞吐（帧/秒）")
+    avg_latency_ms: float = Field(..., description="平均推理延迟（从提交到返回结果，毫秒）")
+    max_latency_ms: float = Field(..., description="最大推理延迟（毫秒）")
+
+class ReaderStatsData(BaseModel):
+    """读帧阶段的采样统计。"""
+    analysis_fps: float = Field(..., description="目标分析帧率，0表示分析每一帧")
+    source_type: str = Field(..., description="视频源类型")
+    source_fps: float = Field(..., description="视频源的标称帧率")
+    frames_grabbed: int = Field(..., description="从源取出（grab）的帧数")
+    frames_decoded: int = Field(..., description="实际解码（retrieve）并送入流水线的帧数")
+    frames_skipped: int = Field(..., description="因采样而跳过解码的帧数")
+
+class StageQueueStatsData(BaseModel):
+    """流水线阶段之间 latest-wins 邮箱的统计。"""
+    capacity: int = Field(..., description="邮箱容量（帧）")
+    depth: int = Field(..., description="当前积压的帧数")
+    put: int = Field(..., description="累计放入的帧数")
+    dropped: int = Field(..., description="因邮箱已满而被丢弃的旧帧数")
+
+class FramePoolStatsData(BaseModel):
+    """帧缓冲池统计。"""
+    slots: int = Field(..., description="当前分配的槽位数")
+    in_use: int = Field(..., description="正在流水线中使用的槽位数")
+    max_in_use: int = Field(..., description="同时使用的最大槽位数")
+    reused: int = Field(..., description="复用槽位解码的帧数")
+    fallback_allocations: int = Field(..., description="因无空闲槽位而临时分配数组的帧数")
+    allocated_mb: float = Field(..., description="缓冲池占用的内存（MB）")
+    allocation_avoided_mb: float = Field(..., description="通过复用避免的内存分配总量（MB）")
+    budget_used_mb: Optional[float] = Field(None, description="全局帧内存预算已使用量（MB）")
+    budget_total_mb: Optional[float] = Field(None, description="全局帧内存预算总量（MB）")
+
+class OutputStatsData(BaseModel):
+    """输出（绘制与编码）阶段统计。"""
+    subscribers: int = Field(..., description="当前订阅画面的客户端数量，为0时跳过绘制与JPEG编码")
+    frames_analysed: int = Field(..., description="完成推理并到达后处理阶段的帧数")
+    frames_encoded: int = Field(..., description="实际绘制并编码为JPEG的帧数")
+    detections: Dict[str, int] = Field({}, description="已分析帧中各类别检测框的累计数量")
+
+class MotionGateStatsData(BaseModel):
+    """运动门控统计。"""
+    method: str = Field(..., description="变化量算法")
+    frames_gated: int = Field(..., description="经过门控判断的帧数")
+    frames_inferred: int = Field(..., description="被放行送去推理的帧数（含保活帧）")
+    frames_skipped: int = Field(..., description="因画面静止而跳过推理的帧数")
+    keepalive_inferred: int = Field(..., description="静止期间因保活间隔而强制推理的帧数")
+    skip_ratio: float = Field(..., description="跳过推理的帧占比")
+    last_score: float = Field(..., description="最近一帧的变化像素占比")
+
+class RoiStatsData(BaseModel):
+    """感兴趣区域统计。"""
+    polygons: List[List[Tuple[float, float]]] = Field(..., description="当前的感兴趣区域多边形（归一化坐标）")
+    crop_rect: Optional[List[int]] = Field(None, description="当前分辨率下送入模型的裁剪矩形 [x, y, w, h]（像素）")
+    crop_ratio: Optional[float] = Field(None, description="裁剪矩形占整帧面积的比例")
+
+class TilingStatsData(BaseModel):
+    """分块推理统计。"""
+    grid: List[int] = Field(..., description="当前分辨率下的图块网格 [列数, 行数]")
+    tile_size: List[int] = Field(..., description="图块尺寸 [宽, 高]（像素）")
+    overlap: float = Field(..., description="相邻图块的最小重叠比例")
+    full_frame: bool = Field(..., description="是否额外做整帧推理")
+    tiles_per_frame: int = Field(..., description="每帧提交给模型的图块数（含整帧）")
+    frames_tiled: int = Field(..., description="分块推理过的帧数")
+    tiles_inferred: int = Field(..., description="累计推理的图块数")
+
+class TrackerStatsData(BaseModel):
+    """多目标跟踪器统计。"""
+    active_tracks: int = Field(..., description="当前存活的轨迹数")
+    confirmed_tracks: int = Field(..., description="其中已确认（会输出）的轨迹数")
+    tracks_created: int = Field(..., description="累计新建的轨迹数")
+    frames_updated: int = Field(..., description="用推理结果更新轨迹的帧数")
+    frames_predicted: int = Field(..., description="未推理、仅输出预测框的帧数")
+
+class RateTransitionData(BaseModel):
+    """自适应帧率的一次状态转换。"""
+    timestamp: float = Field(..., description="转换发生的时间（Unix 秒）")
+    from_state: str = Field(..., description="转换前的状态")
+    to_state: str = Field(..., description="转换后的状态")
+    reason: str = Field(..., description="转换原因")
+
+class AdaptiveFpsStatsData(BaseModel):
+    """自适应分析帧率控制器统计。"""
+    state: str = Field(..., description="当前状态：'idle' 空闲 / 'escalated' 升频保持 / 'decaying' 回落中")
+    current_fps: float = Field(..., description="当前的目标分析帧率")
+    idle_fps: float = Field(..., description="空闲时的分析帧率")
+    active_fps: float = Field(..., description="升频后的分析帧率")
+    suspicion_threshold: float = Field(..., description="触发升频的疑似目标阈值")
+    hold_seconds: float = Field(..., description="升频保持时长（秒）")
+    decay_seconds: float = Field(..., description="回落时长（秒）")
+    escalations: int = Field(..., description="累计升频次数")
+    suspicious_frames: int = Field(..., description="含疑似目标的推理帧数")
+    seconds_since_suspicion: Optional[float] = Field(None, description="距最近一次疑似目标的秒数，从未出现时为 null")
+    time_in_state_seconds: Dict[str, float] = Field({}, description="各状态累计停留时长（秒）")
+    transitions: List[RateTransitionData] = Field([], description="最近的状态转换记录（由旧到新）")
+
+class AlarmClassStatsData(BaseModel):
+    """告警引擎中单个类别的判定状态。"""
+    window_frames: int = Field(..., description="N-of-M 判定的窗口长度 M")
+    confirm_frames: int = Field(..., description="窗口内至少出现的帧数 N")
+    hit_frames: int = Field(..., description="当前窗口内出现该类别的帧数")
+    active: bool = Field(..., description="该类别当前是否处于告警状态")
+
+class AlarmStatsData(BaseModel):
+    """时域告警引擎统计。"""
+    frames_observed: int = Field(..., description="参与告警判定的推理帧数")
+    alarms_started: int = Field(..., description="累计产生的告警数")
+    alarms_cleared: int = Field(..., description="累计清除的告警数")
+    events_emitted: int = Field(..., description="累计发出的告警事件数（start / update / clear）")
+    active_alarms: int = Field(..., description="当前活动的告警数")
+    classes: Dict[str, AlarmClassStatsData] = Field({}, description="按类别的判定状态")
+
+class RecordingStatsData(BaseModel):
+    """告警录像统计。"""
+    recording: bool = Field(..., description="当前是否正在录制片段")
+    current_clip_id: Optional[str] = Field(None, description="正在录制的片段ID")
+    clips_started: int = Field(..., description="累计开始的片段数")
+    buffer_frames: int = Field(..., description="预录环形缓冲区中的帧数")
+    buffer_seconds: float = Field(..., description="预录环形缓冲区覆盖的时长（秒）")
+    buffer_mb: float = Field(..., description="预录环形缓冲区占用的内存（MB）")
+    buffer_budget_mb: float = Field(..., description="预录环形缓冲区的内存上限（MB）")
+    frames_buffered: int = Field(..., description="累计放入缓冲区的帧数")
+    frames_evicted: int = Field(..., description="累计因超出时长或内存上限而淘汰的帧数")
+
+class StageTaskStatsData(BaseModel):
+    """流水线单个阶段在共享线程池上的执行统计。"""
+    pool: str = Field(..., description="该阶段所在的线程池: io / cpu / inference")
+    runs: int = Field(..., description="该阶段累计执行的次数")
+    busy_seconds: float = Field(..., description="该阶段累计占用线程的时间（秒）")
+
+class StreamStatsResponseData(BaseModel):
+    """获取视频流运行统计 `/streams/{stream_id}/stats` (GET) 的响应数据。"""
+    stream_id: str = Field(..., description="视频流ID")
+    reader: ReaderStatsData = Field(..., description="读帧阶段统计")
+    inference: InferenceStatsData = Field(..., description="推理阶段统计")
+    stages: Dict[str, StageQueueStatsData] = Field({}, description="各阶段输入邮箱的统计，键为阶段名")
+    frame_pool: FramePoolStatsData = Field(..., description="帧缓冲池统计")
+    motion_gate: Optional[MotionGateStatsData] = Field(None, description="运动门控统计，未启用时为 null")
+    adaptive_fps: Optional[AdaptiveFpsStatsData] = Field(None, description="自适应分析帧率统计，未启用时为 null")
+    tracker: Optional[TrackerStatsData] = Field(None, description="多目标跟踪统计，未启用时为 null")
+    tiling: Optional[TilingStatsData] = Field(None, description="分块推理统计，未启用时为 null")
+    roi: Optional[RoiStatsData] = Field(None, description="感兴趣区域统计，未设置时为 null")
+    alarms: Optional[AlarmStatsData] = Field(None, description="时域告警引擎统计，未启用时为 null")
+    recording: Optional[RecordingStatsData] = Field(None, description="告警录像统计，未启用时为 null")
+    output: OutputStatsData = Field(..., description="输出阶段统计（按需编码）")
+    frame_max_age_ms: float = Field(..., description="推理前允许的最大帧龄（毫秒），0表示不限制")
+    stale_dropped: int = Field(..., description="因帧龄超限而在推理前被丢弃的帧数")
+    tasks: Dict[str, StageTaskStatsData] = Field({}, description="各阶段在共享线程池上的执行统计，键为阶段名")
+
+class LatencySegmentStatsData(BaseModel):
+    """单个延迟分段在滚动窗口内的统计。"""
+    count: int = Field(..., description="窗口内含该分段的帧数")
+    mean_ms: Optional[float] = Field(None, description="平均耗时（毫秒），无样本时为 null")
+    p50_ms: Optional[float] = Field(None, description="p50 耗时（毫秒）")
+    p95_ms: Optional[float] = Field(None, description="p95 耗时（毫秒）")
+    p99_ms: Optional[float] = Field(None, description="p99 耗时（毫秒）")
+    max_ms: Optional[float] = Field(None, description="最大耗时（毫秒）")
+
+class StreamLatencyResponseData(BaseModel):
+    """获取视频流分段延迟 `/streams/{stream_id}/stats/latency` (GET) 的响应数据。"""
+    stream_id: str = Field(..., description="视频流ID")
+    window_frames: int = Field(..., description="滚动窗口长度（帧数）")
+    frames_traced: int = Field(..., description="累计完成追踪的帧数")
+    pending_writes: int = Field(..., description="已发布给观看者、尚未被写出的帧数")
+    segments: Dict[str, LatencySegmentStatsData] = Field(
+        ..., description="各分段的统计：decode=解码，queue=预处理与排队，infer=推理，postprocess=后处理与编码，"
+                         "deliver=广播到首个观看者写出，pipeline=读帧到编码完成，end_to_end=读帧到观看者写出"
+    )
+
+class SchedulerStreamStatsData(BaseModel):
+    """推理调度器视角下单个流的统计。"""
+    submitted: int = Field(..., description="该流提交给调度器的帧数")
+    completed: int = Field(..., description="该流已完成推理的帧数")
+    avg_queue_wait_ms: float = Field(..., description="帧在调度队列中等待组批的平均时间（毫秒）")
+    max_queue_wait_ms: float = Field(..., description="帧在调度队列中等待组批的最长时间（毫秒）")
+
+class SchedulerStatsResponseData(BaseModel):
+    """获取推理调度器统计 `/scheduler/stats` (GET) 的响应数据。"""
+    enabled: bool = Field(..., description="是否启用了跨流批处理调度（inference_mode='scheduled'）")
+    workers: int = Field(0, description="调度器持有的模型实例（工作线程）数")
+    max_batch_size: int = Field(0, description="微批的最大帧数")
+    batch_timeout_ms: float = Field(0.0, description="微批的最长等待时间（毫秒）")
+    batches_dispatched: int = Field(0, description="已发出的微批数")
+    frames_dispatched: int = Field(0, description="已发出的帧数")
+    avg_batch_size: float = Field(0.0, description="平均微批大小")
+    avg_batch_fill: float = Field(0.0, description="平均微批填充率（0~1）")
+    batches_per_second: float = Field(0.0, description="平均每秒发出的微批数")
+    pending: int = Field(0, description="当前等待组批的帧数")
+    streams: Dict[str, SchedulerStreamStatsData] = Field({}, description="按流ID划分的统计")
+
+class WorkerPoolStatsData(BaseModel):
+    """单个共享工作线程池的统计。"""
+    max_workers: int = Field(..., description="线程数上限")
+    workers: int = Field(..., description="已创建的线程数（按需创建，之后常驻）")
+    busy: int = Field(..., description="正在执行任务的线程数")
+    queued: int = Field(..., description="排队等待执行的任务数")
+    tasks_completed: int = Field(..., description="已执行完的任务数")
+    tasks_failed: int = Field(..., description="执行时抛出异常的任务数")
+    busy_seconds: float = Field(..., description="所有线程的累计忙碌时间（秒）")
+    utilisation: float = Field(..., description="自启动以来的利用率：忙碌时间占 max_workers 个线程总时间的比例（0~1）")
+    avg_queue_wait_ms: float = Field(..., description="任务的平均排队等待时间（毫秒）")
+    max_queue_wait_ms: float = Field(..., description="任务的最长排队等待时间（毫秒）")
+
+class WorkerPoolsStatsResponseData(BaseModel):
+    """获取共享工作线程池统计 `/workers/stats` (GET) 的响应数据。"""
+    timer_pending: int = Field(..., description="在定时器中等待（如文件源按时间戳节流）的阶段任务数")
+    pools: Dict[str, WorkerPoolStatsData] = Field(..., description="按线程池名划分的统计: io / cpu / inference（scheduled 模式下无 inference）")
+
+# --- 告警 Schema ---
+class AlarmSnapshotData(BaseModel):
+    """告警的代表性快照（告警期间得分最高的一帧）。"""
+    frame_id: int = Field(..., description="快照所在帧的ID")
+    timestamp: float = Field(..., description="快照帧的时间（Unix 秒）")
+    score: float = Field(..., description="快照帧中该类别的最高置信度")
+    bbox: List[float] = Field(..., description="对应检测框 [x1, y1, x2, y2]（像素）")
+
+class AlarmData(BaseModel):
+    """一个告警的当前状态。"""
+    alarm_id: str = Field(..., description="告警的唯一ID")
+    stream_id: str = Field(..., description="产生告警的视频流ID")
+    label: str = Field(..., description="告警类别")
+    state: Literal["active", "cleared"] = Field(..., description="告警状态")
+    started_at: float = Field(..., description="告警开始时间（Unix 秒，即确认状态开始的时刻）")
+    updated_at: float = Field(..., description="最近一次事件的时间（Unix 秒）")
+    cleared_at: Optional[float] = Field(None, description="告警清除时间（Unix 秒），活动告警为 null")
+    duration_seconds: float = Field(..., description="告警已持续的时长（秒）")
+    peak_score: float = Field(..., description="告警期间的最高置信度")
+    last_score: float = Field(..., description="最近一次命中的置信度")
+    hit_frames: int = Field(..., description="告警期间出现该类别的推理帧数")
+    snapshot: Optional[AlarmSnapshotData] = Field(None, description="代表性快照信息")
+    snapshot_url: Optional[str] = Field(None, description="代表性快照图像（JPEG）的完整URL，尚无快照时为 null")
+
+class ActiveAlarmsResponseData(BaseModel):
+    """获取活动告警列表 `/alarms` (GET) 的响应数据。"""
+    active_alarms_count: int = Field(..., description="当前活动的告警总数")
+    alarms: List[AlarmData] = Field([], description="所有活动告警，按开始时间排序")
+
+# --- 告警录像 Schema ---
+class ClipData(BaseModel):
+    """一个告警录像片段的索引记录。"""
+    clip_id: str = Field(..., description="片段的唯一ID")
+    stream_id: str = Field(..., description="视频流ID")
+    source: Optional[str] = Field(None, description="视频流的原始视频源")
+    status: Literal["recording", "complete", "interrupted"] = Field(
+        ..., description="片段状态：'recording' 录制中 / 'complete' 已完成 / 'interrupted' 因服务异常退出而中断"
+    )
+    started_at: float = Field(..., description="片段第一帧的时间（Unix 秒，含告警前的预录部分）")
+    ended_at: Optional[float] = Field(None, description="片段结束时间（Unix 秒），录制中为 null")
+    duration_seconds: Optional[float] = Field(None, description="片段时长（秒），录制中为 null")
+    alarm_ids: List[str] = Field([], description="片段覆盖的告警ID")
+    labels: List[str] = Field([], description="片段覆盖的告警类别")
+    frames: int = Field(0, description="片段帧数（录制完成后更新）")
+    bytes: int = Field(0, description="片段文件大小（字节，录制完成后更新）")
+    frames_dropped: int = Field(0, description="因写入积压而丢弃的帧数")
+    format: str = Field("mjpeg", description="片段格式：MJPEG 裸流（JPEG 帧首尾相接）")
+    download_url: Optional[str] = Field(None, description="下载片段文件的完整URL")
+
+class ClipListResponseData(BaseModel):
+    """查询告警录像片段 `/clips` (GET) 的响应数据。"""
+    count: int = Field(..., description="本页返回的片段数")
+    clips: List[ClipData] = Field([], description="片段列表，按开始时间倒序")
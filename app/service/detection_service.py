@@ -2,15 +2,25 @@
 import asyncio
 import uuid
 from datetime import datetime, timedelta
-from typing import Dict, List, Any
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple
 
 from fastapi import HTTPException, status
 
 from app.cfg.config import AppSettings
 from app.cfg.logging import app_logger
+from app.core.broadcaster import FrameBroadcaster, FrameSubscription
+from app.core.clip_writer import INDEX_FILENAME, ClipIndex, ClipWriter
+from app.core.frame_pool import FrameMemoryBudget
+from app.core.frame_trace import TraceExporter
+from app.core.inference_scheduler import InferenceScheduler
+from app.core.metrics import MetricsRegistry
 from app.core.model_manager import ModelPool
 from app.core.pipeline import VideoStreamPipeline
-from app.schema.detection_schema import ActiveStreamInfo, StreamStartRequest
+from app.core.worker_pool import WorkerPools
+from app.schema.detection_schema import (
+    ActiveStreamInfo, StreamStartRequest, StreamStatsResponseData, SchedulerStatsResponseData, RoiUpdateResponseData,
+    AlarmData, ClipData, StreamLatencyResponseData, WorkerPoolsStatsResponseData
+)
 
 
 class DetectionService:
@@ -18,13 +28,29 @@ class DetectionService:
     封装核心业务逻辑的服务类 (Hailo版)。
     """
 
-    def __init__(self, settings: AppSettings, model_pool: ModelPool):
+    def __init__(self, settings: AppSettings, model_pool: ModelPool, worker_pools: WorkerPools,
+                 scheduler: Optional[InferenceScheduler] = None):
         app_logger.info("正在初始化 DetectionService (Hailo版)...")
         self.settings = settings
         self.model_pool = model_pool
+        # 所有视频流的阶段任务共享的有界线程池
+        self.worker_pools = worker_pools
+        self.scheduler = scheduler
+        # 所有视频流的帧缓冲池共享同一份内存预算
+        self.frame_budget = FrameMemoryBudget(int(settings.app.frame_pool_memory_budget_mb * 2 ** 20))
         self.active_streams: Dict[str, VideoStreamPipeline] = {}
         self.stream_infos: Dict[str, ActiveStreamInfo] = {}
         self.stream_lock = asyncio.Lock()
+        # 所有视频流共享的告警事件广播器（SSE 订阅全部流的告警）
+        self.alarm_broadcaster = FrameBroadcaster(settings.app.stream_max_queue_size)
+        # 告警录像片段索引：已有索引（此前运行录制的片段）时启动即打开，供查询并把未正常结束的片段标记为中断；
+        # 否则与所有视频流共享的录像写入线程一起，在首个启用录像的流启动时才创建
+        index_path = settings.app.recording_dir / INDEX_FILENAME
+        self.clip_index: Optional[ClipIndex] = ClipIndex(index_path) if index_path.exists() else None
+        self.clip_writer: Optional[ClipWriter] = None
+        # 可选的逐帧追踪记录抽样导出（所有视频流共享一个 JSONL 文件）
+        self.trace_exporter = TraceExporter(settings.app.trace_export_path, settings.app.trace_export_sample_rate) \
+            if settings.app.trace_export_enabled else None
 
     async def start_stream(self, req: StreamStartRequest) -> ActiveStreamInfo:
         """启动一个新的视频流处理任务。"""
@@ -32,44 +58,72 @@ class DetectionService:
         lifetime = req.lifetime_minutes if req.lifetime_minutes is not None else self.settings.app.stream_default_lifetime_minutes
 
         async with self.stream_lock:
-            frame_queue = asyncio.Queue(maxsize=self.settings.app.stream_max_queue_size)
+            if len(self.active_streams) >= self.settings.app.max_streams:
+                app_logger.warning(f"活动视频流数量已达上限 ({self.settings.app.max_streams})，拒绝启动新流。")
+                raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, "活动视频流数量已达上限，请稍后再试。")
+
+            broadcaster = FrameBroadcaster(self.settings.app.stream_max_queue_size)
+            recording = req.recording if req.recording is not None else self.settings.app.recording_enabled
+            if recording and self.clip_writer is None:
+                self.clip_writer = await asyncio.to_thread(self._start_clip_writer)
 
-            # 注意：pipeline.start() 是一个阻塞方法，它会等待流水线结束或失败
-            # 因此，我们需要在一个独立的asyncio任务中运行它
             pipeline = VideoStreamPipeline(
                 settings=self.settings,
                 stream_id=stream_id,
                 video_source=req.source,
-                output_queue=frame_queue,
-                model_pool=self.model_pool
+                broadcaster=broadcaster,
+                model_pool=self.model_pool,
+                worker_pools=self.worker_pools,
+                scheduler=self.scheduler,
+                analysis_fps=req.analysis_fps,
+                source_type=req.source_type,
+                frame_budget=self.frame_budget,
+                motion_gate=req.motion_gate,
+                adaptive_fps=req.adaptive_fps,
+                tracking=req.tracking,
+                tiled=req.tiled,
+                rois=req.rois,
+                alarms=req.alarms,
+                alarm_broadcaster=self.alarm_broadcaster,
+                recording=req.recording,
+                clip_writer=self.clip_writer,
+                trace_exporter=self.trace_exporter
             )
-            # 在后台任务中运行 pipeline.start()
-            asyncio.create_task(asyncio.to_thread(pipeline.start))
-
-            # 修改点：等待流水线中的所有线程真正启动
-            # 给予一个合理的超时时间，例如 5 秒
-            try:
-                await asyncio.to_thread(pipeline.threads_started_event.wait, timeout=5.0)
-            except TimeoutError:
-                app_logger.error(f"【流水线 {stream_id}】启动超时，线程未在预期时间内启动。")
-                raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, "服务正忙或无法启动处理线程，请稍后再试。")
-
-
-            # 修正点：检查线程列表是否为空，以及是否有任何一个线程在运行
-            # 这里的检查现在应该在 threads_started_event.wait 成功后执行
-            if not pipeline.threads or not any(t.is_alive() for t in pipeline.threads):
-                raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, "服务正忙或无法启动处理线程，请稍后再试。")
+            # pipeline.start() 只做获取模型、打开视频源等有限时长的准备工作，随后各阶段在共享线程池上运行，
+            # 不再为每路流占用一个默认执行器线程
+            if not await asyncio.to_thread(pipeline.start):
+                raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, "服务正忙或无法启动视频流，请稍后再试。")
 
             self.active_streams[stream_id] = pipeline
             started_at = datetime.now()
             expires_at = None if lifetime == -1 else started_at + timedelta(minutes=lifetime)
             stream_info = ActiveStreamInfo(stream_id=stream_id, source=req.source, started_at=started_at,
-                                           expires_at=expires_at, lifetime_minutes=lifetime)
+                                           expires_at=expires_at, lifetime_minutes=lifetime,
+                                           analysis_fps=pipeline.analysis_fps,
+                                           source_type=pipeline.source_type,
+                                           motion_gate=pipeline.motion_gate is not None,
+                                           adaptive_fps=pipeline.rate_controller is not None,
+                                           tracking=pipeline.tracker is not None,
+                                           tiled=pipeline.tiler is not None,
+                                           rois=pipeline.roi.polygons if pipeline.roi is not None else [],
+                                           alarms=pipeline.alarm_engine is not None,
+                                           recording=pipeline.clip_recorder is not None)
             self.stream_infos[stream_id] = stream_info
 
-            app_logger.info(f"🚀 视频流处理线程组已启动: ID={stream_id}, 源={req.source}")
+            app_logger.info(f"🚀 视频流流水线已启动: ID={stream_id}, 源={req.source}")
             return stream_info
 
+    def _start_clip_writer(self) -> ClipWriter:
+        """创建并启动录像写入线程（尚无片段索引时同时创建录像目录与索引）。"""
+        recording_dir = self.settings.app.recording_dir
+        if self.clip_index is None:
+            self.clip_index = ClipIndex(recording_dir / INDEX_FILENAME)
+        writer = ClipWriter(recording_dir, self.clip_index,
+                            int(self.settings.app.recording_writer_max_pending_mb * 2 ** 20))
+        writer.start()
+        app_logger.info(f"✅ 告警录像写入线程已启动，录像目录: {self.settings.app.recording_dir}")
+        return writer
+
     async def stop_stream(self, stream_id: str) -> bool:
         """停止一个指定的视频流。"""
         async with self.stream_lock:
@@ -84,8 +138,21 @@ class DetectionService:
         app_logger.info(f"✅ 视频流流水线已请求停止: ID={stream_id}")
         return True
 
+    async def update_stream_roi(self, stream_id: str, rois: List[List[Tuple[float, float]]]) -> RoiUpdateResponseData:
+        """运行时替换指定流的感兴趣区域，无需重启流水线。"""
+        async with self.stream_lock:
+            pipeline = self.active_streams.get(stream_id)
+            if not pipeline:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"ID为 '{stream_id}' 的视频流未找到。")
+            pipeline.set_roi(rois)
+            polygons = pipeline.roi.polygons if pipeline.roi is not None else []
+            stream_info = self.stream_infos.get(stream_id)
+            if stream_info is not None:
+                stream_info.rois = polygons
+        return RoiUpdateResponseData(stream_id=stream_id, rois=polygons)
+
     async def get_stream_feed(self, stream_id: str):
-        """从指定流水线的输出队列获取帧。"""
+        """以观看者身份订阅指定流水线的广播器，逐帧推送已编码的画面。"""
         async with self.stream_lock:
             pipeline = self.active_streams.get(stream_id)
 
@@ -93,37 +160,179 @@ class DetectionService:
             app_logger.warning(f"客户端尝试连接一个不存在或已停止的流: {stream_id}")
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Stream not found or already stopped.")
 
-        frame_queue = pipeline.output_queue
+        # 每个观看者持有独立的订阅（游标），新帧发布时由流水线线程直接唤醒
+        subscription = pipeline.broadcaster.subscribe()
+        # 登记为订阅者，流水线只在有人观看时才绘制并编码画面
+        viewers = pipeline.add_subscriber()
+        app_logger.info(f"观看者已连接到流 {stream_id}，当前观看者数量: {viewers}")
         try:
             while True:
-                # 修正点：检查是否所有后台线程都已停止
-                # 额外的检查：如果 stop_event 被设置了，也应该停止推送
-                if pipeline.stop_event.is_set() or (not pipeline.threads or (not any(t.is_alive() for t in pipeline.threads) and frame_queue.empty())):
-                    app_logger.info(f"检测到流 {stream_id} 的所有后台线程已停止，正常关闭推送。")
+                frame_bytes = await subscription.next_frame()
+                if frame_bytes is None:
+                    app_logger.info(f"流 {stream_id} 已结束，正常关闭推送。")
                     break
-
-
-                try:
-                    frame_bytes = await asyncio.wait_for(frame_queue.get(), timeout=1.0)
-                    if frame_bytes is None:
-                        continue
-                    yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-                    frame_queue.task_done()
-                except asyncio.TimeoutError:
-                    continue
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+                # 生成器恢复执行时该帧已交给连接写出，记录首个观看者的写出时刻
+                pipeline.tracer.on_write(subscription.cursor)
 
         except asyncio.CancelledError:
-            app_logger.info(f"客户端从流 {stream_id} 断开连接。")
-            await self.stop_stream(stream_id)
+            # 只断开该观看者，流水线继续为其他观看者和告警服务
+            app_logger.info(f"客户端从流 {stream_id} 断开连接（该观看者因落后共跳过 {subscription.skipped} 帧）。")
             raise
+        finally:
+            subscription.close()
+            pipeline.remove_subscriber()
+
+    async def open_detection_events(self, stream_id: str) -> AsyncIterator[str]:
+        """
+        订阅指定流的纯检测结果事件（不含图像），返回逐条产出 JSON 字符串的异步迭代器。
+        流不存在时立即抛出 404，而不是在响应开始后才失败。
+        """
+        async with self.stream_lock:
+            pipeline = self.active_streams.get(stream_id)
+
+        if not pipeline:
+            app_logger.warning(f"客户端尝试订阅一个不存在或已停止的流的检测事件: {stream_id}")
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"ID为 '{stream_id}' 的视频流未找到。")
+
+        subscription = pipeline.event_broadcaster.subscribe()
+        app_logger.info(f"检测事件订阅者已连接到流 {stream_id}。")
+        return self._iter_detection_events(stream_id, subscription)
+
+    async def _iter_detection_events(self, stream_id: str, subscription: FrameSubscription) -> AsyncIterator[str]:
+        try:
+            while True:
+                event = await subscription.next_frame()
+                if event is None:
+                    break
+                yield event
+        finally:
+            subscription.close()
+            app_logger.info(f"检测事件订阅者已从流 {stream_id} 断开（因落后共跳过 {subscription.skipped} 条事件）。")
+
+    async def get_stream_stats(self, stream_id: str) -> StreamStatsResponseData:
+        """获取指定视频流流水线的运行统计。"""
+        async with self.stream_lock:
+            pipeline = self.active_streams.get(stream_id)
+
+        if not pipeline:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"ID为 '{stream_id}' 的视频流未找到。")
+        return StreamStatsResponseData(stream_id=stream_id, **pipeline.get_stats())
+
+    async def get_stream_latency(self, stream_id: str) -> StreamLatencyResponseData:
+        """获取指定视频流逐帧追踪的分段延迟统计。"""
+        async with self.stream_lock:
+            pipeline = self.active_streams.get(stream_id)
+
+        if not pipeline:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"ID为 '{stream_id}' 的视频流未找到。")
+        return StreamLatencyResponseData(stream_id=stream_id, **pipeline.get_latency_stats())
+
+    async def get_active_alarms(self, stream_id: Optional[str] = None) -> List[AlarmData]:
+        """获取活动告警列表；指定 stream_id 时只返回该流的告警（流不存在时抛出 404）。"""
+        async with self.stream_lock:
+            if stream_id is not None:
+                if stream_id not in self.active_streams:
+                    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"ID为 '{stream_id}' 的视频流未找到。")
+                pipelines = [self.active_streams[stream_id]]
+            else:
+                pipelines = list(self.active_streams.values())
+
+        alarms = [alarm for p in pipelines if p.alarm_engine is not None for alarm in p.alarm_engine.active_alarms()]
+        alarms.sort(key=lambda a: a["started_at"])
+        return [AlarmData(**alarm) for alarm in alarms]
+
+    async def get_alarm_snapshot(self, alarm_id: str) -> bytes:
+        """获取指定活动告警的代表性快照 JPEG。"""
+        async with self.stream_lock:
+            pipelines = list(self.active_streams.values())
+
+        for pipeline in pipelines:
+            if pipeline.alarm_engine is not None:
+                image = pipeline.alarm_engine.snapshot_image(alarm_id)
+                if image is not None:
+                    return image
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"ID为 '{alarm_id}' 的活动告警或其快照未找到。")
+
+    def open_alarm_events(self) -> AsyncIterator[str]:
+        """订阅所有视频流的告警事件，返回逐条产出 JSON 字符串的异步迭代器。"""
+        subscription = self.alarm_broadcaster.subscribe()
+        app_logger.info("告警事件订阅者已连接。")
+        return self._iter_alarm_events(subscription)
+
+    async def _iter_alarm_events(self, subscription: FrameSubscription) -> AsyncIterator[str]:
+        try:
+            while True:
+                event = await subscription.next_frame()
+                if event is None:
+                    break
+                yield event
+        finally:
+            subscription.close()
+            app_logger.info(f"告警事件订阅者已断开（因落后共跳过 {subscription.skipped} 条事件）。")
+
+    @staticmethod
+    def _clip_data(clip: dict) -> ClipData:
+        ended_at = clip.get("ended_at")
+        duration = round(ended_at - clip["started_at"], 3) if ended_at is not None else None
+        return ClipData(duration_seconds=duration, **{k: v for k, v in clip.items() if k != "path"})
+
+    async def list_clips(self, stream_id: Optional[str] = None, label: Optional[str] = None,
+                         since: Optional[float] = None, until: Optional[float] = None,
+                         limit: int = 50, offset: int = 0) -> List[ClipData]:
+        """按流、类别与时间范围查询告警录像片段（索引查询在线程中执行，不阻塞事件循环）。"""
+        if self.clip_index is None:
+            return []
+        clips = await asyncio.to_thread(self.clip_index.query, stream_id, label, since, until, limit, offset)
+        return [self._clip_data(clip) for clip in clips]
+
+    async def get_clip(self, clip_id: str) -> Tuple[ClipData, str]:
+        """获取片段的索引记录与文件路径，不存在时抛出 404。"""
+        clip = await asyncio.to_thread(self.clip_index.get, clip_id) if self.clip_index is not None else None
+        if clip is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"ID为 '{clip_id}' 的录像片段未找到。")
+        return self._clip_data(clip), clip["path"]
+
+    def get_scheduler_stats(self) -> SchedulerStatsResponseData:
+        """获取全局推理调度器的统计（未启用调度模式时 enabled=False）。"""
+        if self.scheduler is None:
+            return SchedulerStatsResponseData(enabled=False)
+        return SchedulerStatsResponseData(enabled=True, **self.scheduler.get_stats())
+
+    def get_worker_pool_stats(self) -> WorkerPoolsStatsResponseData:
+        """获取共享工作线程池的统计（各线程池的利用率与排队情况）。"""
+        return WorkerPoolsStatsResponseData(**self.worker_pools.get_stats())
+
+    def render_metrics(self) -> str:
+        """按 Prometheus 文本格式汇总所有视频流、模型池、共享线程池、推理调度器与录像写入线程的指标。"""
+        registry = MetricsRegistry(prefix="detection_")
+        pipelines = list(self.active_streams.values())
+        registry.gauge("active_streams", "当前活动的视频流数", len(pipelines))
+        for pipeline in pipelines:
+            pipeline.collect_metrics(registry)
+        self.model_pool.collect_metrics(registry)
+        self.worker_pools.collect_metrics(registry)
+        if self.scheduler is not None:
+            scheduler = self.scheduler.get_stats()
+            registry.gauge("scheduler_pending_frames", "推理调度器中等待组批的帧数", scheduler["pending"])
+            registry.counter("scheduler_batches", "推理调度器已执行的微批数", scheduler["batches_dispatched"])
+            registry.counter("scheduler_frames", "推理调度器已执行的帧数", scheduler["frames_dispatched"])
+        if self.clip_writer is not None:
+            clips = self.clip_writer.stats()
+            registry.gauge("clip_writer_open_clips", "正在录制的片段数", clips["open_clips"])
+            registry.gauge("clip_writer_pending_bytes", "录像写入队列中待写入的字节数",
+                           int(clips["pending_mb"] * 2 ** 20))
+            registry.counter("clip_writer_bytes_written", "录像写入线程已写入磁盘的字节数", clips["bytes_written"])
+            registry.counter("clip_writer_frames_dropped", "写入队列积压超限而丢弃的录像帧数", clips["frames_dropped"])
+        registry.gauge("alarm_event_subscribers", "告警事件订阅者数", self.alarm_broadcaster.subscription_count)
+        return registry.render()
 
     async def get_all_active_streams_info(self) -> List[ActiveStreamInfo]:
         """获取所有当前活动流的信息列表。"""
         async with self.stream_lock:
             # 清理已经意外死掉的流
-            dead_stream_ids = [sid for sid, p in self.active_streams.items() if
-                               not p.threads or not any(t.is_alive() for t in p.threads)]
+            dead_stream_ids = [sid for sid, p in self.active_streams.items() if not p.is_running]
             for sid in dead_stream_ids:
                 self.active_streams.pop(sid, None)
                 self.stream_infos.pop(sid, None)
@@ -152,4 +361,13 @@ class DetectionService:
         if all_stream_ids:
             stop_tasks = [self.stop_stream(stream_id) for stream_id in all_stream_ids]
             await asyncio.gather(*stop_tasks)
-            app_logger.info(f"✅ 所有 {len(all_stream_ids)} 个活动流已清理完毕。")
\ No newline at end of file
+            app_logger.info(f"✅ 所有 {len(all_stream_ids)} 个活动流已清理完毕。")
+        # 各流的 clear 事件已发布，结束所有告警事件订阅
+        self.alarm_broadcaster.close()
+        # 各流已结束各自的片段，写完队列中剩余的帧
+        if self.clip_writer is not None:
+            await asyncio.to_thread(self.clip_writer.stop)
+        if self.clip_index is not None:
+            self.clip_index.close()
+        if self.trace_exporter is not None:
+            self.trace_exporter.close()
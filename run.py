@@ -1,13 +1,14 @@
 # run.py
 import os
 import socket
-from typing import Optional
+from pathlib import Path
+from typing import List, Optional
 
 import typer
 import uvicorn
 from dotenv import load_dotenv
 
-from app.cfg.config import get_app_settings, AppSettings, BASE_DIR
+from app.cfg.config import get_app_settings, AppSettings, BASE_DIR, DATA_DIR
 from app.cfg.logging import app_logger as logger, setup_logging
 
 load_dotenv()
@@ -124,5 +125,120 @@ def start_server(
         raise typer.Exit(code=1)
 
 
+def _parse_list(value: Optional[str], cast) -> Optional[List]:
+    """解析逗号分隔的参数列表，未提供时返回 None。"""
+    if not value:
+        return None
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+
+@app.command(name="bench")
+def run_bench(
+        ctx: typer.Context,
+        suite: str = typer.Option("default", "--suite", "-s", help="内置场景集: smoke / default(逐个参数扫描) / full(笛卡尔积)。"),
+        streams: Optional[str] = typer.Option(None, "--streams", help="扫描的视频流数，逗号分隔，如 '1,2,4'。"),
+        queue_sizes: Optional[str] = typer.Option(None, "--queue-sizes", help="扫描的阶段邮箱容量，逗号分隔。"),
+        resolutions: Optional[str] = typer.Option(None, "--resolutions", help="扫描的分辨率，如 '720p,1920x1080'。"),
+        fps: float = typer.Option(25.0, "--fps", help="合成视频源帧率，0表示不节流。"),
+        motion: float = typer.Option(0.1, "--motion", help="运动色块占画面面积的比例（0~1）。"),
+        mode: str = typer.Option("pipelined", "--mode", help="推理模式: sync / pipelined / scheduled。"),
+        latency_ms: float = typer.Option(20.0, "--latency-ms", help="合成后端的推理延迟中位数（毫秒）。"),
+        jitter_ms: float = typer.Option(5.0, "--jitter-ms", help="合成后端的延迟抖动（毫秒）。"),
+        distribution: str = typer.Option("lognormal", "--distribution", help="延迟分布: uniform / normal / lognormal。"),
+        viewers: int = typer.Option(1, "--viewers", help="每路流的模拟观看者数，0表示不编码画面。"),
+        motion_gate: bool = typer.Option(False, "--motion-gate", help="启用运动门控。"),
+        duration: float = typer.Option(10.0, "--duration", "-d", help="每个场景的计量时长（秒）。"),
+        warmup: float = typer.Option(2.0, "--warmup", help="每个场景的预热时长（秒）。"),
+        output: Optional[Path] = typer.Option(None, "--output", "-o", help="结果 JSON 路径，默认写入 data/bench/。"),
+        compare: Optional[Path] = typer.Option(None, "--compare", "-c", help="与之对比的历史结果 JSON（如上一次提交的结果）。"),
+):
+    """
+    使用合成视频源与合成推理后端运行离线流水线基准测试，输出吞吐、延迟分位数、丢帧率、CPU 与内存占用。
+    """
+    # 延迟导入：基准测试依赖的流水线模块较重，不影响 start 命令的启动
+    from app.bench.report import build_report, compare_reports, default_output_path, format_result, load_report, \
+        write_report
+    from app.bench.runner import run_suite
+    from app.bench.scenarios import BenchScenario, build_suite, parse_resolution, sweep
+
+    settings: AppSettings = ctx.obj
+    try:
+        base = BenchScenario(fps=fps, motion=motion, inference_mode=mode, latency_ms=latency_ms,
+                             latency_jitter_ms=jitter_ms, latency_distribution=distribution, viewers=viewers,
+                             motion_gate=motion_gate, duration_seconds=duration, warmup_seconds=warmup)
+        axes = {
+            name: values for name, values in (
+                ("streams", _parse_list(streams, int)),
+                ("queue_size", _parse_list(queue_sizes, int)),
+                ("resolution", _parse_list(resolutions, parse_resolution)),
+            ) if values
+        }
+        scenarios = sweep(base, axes) if axes else build_suite(suite, base)
+        baseline = load_report(compare) if compare is not None else None
+    except (ValueError, OSError) as e:
+        logger.error(f"❌ 基准测试参数无效: {e}")
+        raise typer.Exit(code=2)
+
+    suite_name = "custom" if axes else suite
+    total = sum(s.warmup_seconds + s.duration_seconds for s in scenarios)
+    typer.echo(f"🚀 开始基准测试: 场景集 {suite_name}，共 {len(scenarios)} 个场景，预计耗时约 {total:.0f}s")
+    results = run_suite(settings, scenarios, on_result=lambda s, r: typer.echo(format_result(s.name, r)))
+
+    report = build_report(suite_name, results)
+    path = write_report(report, output or default_output_path(DATA_DIR / "bench", report))
+    typer.echo(f"💾 结果已写入: {path}")
+    if baseline is not None:
+        for line in compare_reports(report, baseline):
+            typer.echo(line)
+
+
+
+@app.command(name="load")
+def run_load_test(
+        url: Optional[str] = typer.Option(None, "--url", help="目标服务地址，不填时在本机启动使用合成后端的服务。"),
+        source: Optional[str] = typer.Option(None, "--source", help="视频源，不填时生成一段本地视频文件。"),
+        churn: int = typer.Option(4, "--churn", "-n", help="并发执行 start → 观看 → stop 循环的工作协程数。"),
+        hold: float = typer.Option(1.0, "--hold", help="每个循环中观看画面的时长（秒）。"),
+        viewers: int = typer.Option(8, "--viewers", "-m", help="长连接 MJPEG 观看者数。"),
+        viewer_streams: int = typer.Option(1, "--viewer-streams", help="供长连接观看者使用的视频流数。"),
+        duration: float = typer.Option(30.0, "--duration", "-d", help="施压时长（秒）。"),
+        mode: str = typer.Option("pipelined", "--mode", help="本地服务的推理模式: sync / pipelined / scheduled。"),
+        latency_ms: float = typer.Option(20.0, "--latency-ms", help="本地服务合成后端的推理延迟（毫秒）。"),
+        fps: float = typer.Option(15.0, "--fps", help="生成的视频文件帧率。"),
+        resolution: str = typer.Option("360p", "--resolution", help="生成的视频文件分辨率，如 '720p' 或 '1280x720'。"),
+        output: Optional[Path] = typer.Option(None, "--output", "-o", help="结果 JSON 路径，默认写入 data/bench/。"),
+        keep_logs: bool = typer.Option(False, "--keep-logs", help="保留生成的视频文件与本地服务日志所在的临时目录。"),
+):
+    """
+    通过 HTTP 对真实服务施压：并发启停视频流并保持大量 MJPEG 观看者，输出请求耗时、首帧时间、
+    每个观看者的实际帧率，以及（本地服务时）线程 / 子进程 / 视频流的泄漏检查。
+    """
+    from app.bench.loadgen import LoadConfig, format_load_result, run_load
+    from app.bench.report import build_report, default_output_path, write_report
+    from app.bench.scenarios import parse_resolution
+
+    try:
+        width, height = parse_resolution(resolution)
+        config = LoadConfig(url=url, source=source, churn_workers=churn, churn_hold_seconds=hold, viewers=viewers,
+                            viewer_streams=viewer_streams, duration_seconds=duration, inference_mode=mode,
+                            latency_ms=latency_ms, video_fps=fps, video_width=width, video_height=height,
+                            keep_workdir=keep_logs)
+    except ValueError as e:
+        logger.error(f"❌ 负载测试参数无效: {e}")
+        raise typer.Exit(code=2)
+
+    try:
+        result = run_load(config, log=typer.echo)
+    except RuntimeError as e:
+        logger.error(f"❌ 负载测试失败: {e}")
+        raise typer.Exit(code=1)
+    for line in format_load_result(result):
+        typer.echo(line)
+
+    report = build_report("load", [{"name": "load", "params": config.model_dump(), "result": result}])
+    path = write_report(report, output or default_output_path(DATA_DIR / "bench", report))
+    typer.echo(f"💾 结果已写入: {path}")
+
+
 if __name__ == "__main__":
     app()
\ No newline at end of file
@@ -0,0 +1,87 @@
+import os
+import sys
+import timeit
+
+# 允许从项目根目录之外直接运行此脚本
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+
+from app.core.detections import DetectionBatch, score_threshold_table
+
+NAMES = ["smoke", "fire"]
+THRESHOLDS = {"smoke": 0.35, "fire": 0.5}
+MIN_AREA = 400.0
+THRESHOLD_TABLE = score_threshold_table(NAMES, THRESHOLDS, 0.5)
+
+
+def make_dicts(n: int, rng: np.random.Generator):
+    """生成与 DeGirum 输出格式一致的检测结果（含 numpy 标量，模拟真实后端）。"""
+    xy = rng.uniform(0, 1200, size=(n, 2)).astype(np.float32)
+    wh = rng.uniform(5, 200, size=(n, 2)).astype(np.float32)
+    boxes = np.concatenate([xy, xy + wh], axis=1)
+    scores = rng.uniform(0.2, 1.0, size=n).astype(np.float32)
+    class_ids = rng.integers(0, 2, size=n)
+    return [{"bbox": list(b), "score": s, "category_id": int(c), "label": NAMES[c]}
+            for b, s, c in zip(boxes, scores, class_ids)]
+
+
+# --- 旧路径：逐框查字典 ---
+def dict_path(detections):
+    kept = []
+    for det in detections:
+        box = det.get('bbox')
+        if not box:
+            continue
+        if det.get('score', 0.0) < THRESHOLDS.get(det.get('label'), 0.5):
+            continue
+        x1, y1, x2, y2 = map(int, box)
+        if (x2 - x1) * (y2 - y1) < MIN_AREA:
+            continue
+        kept.append(det)
+    counts = {}
+    serialized = []
+    for det in kept:
+        counts[det['label']] = counts.get(det['label'], 0) + 1
+        x1, y1, x2, y2 = map(int, det['bbox'])  # 绘制前的坐标转换
+        serialized.append({"bbox": [round(float(v), 1) for v in det['bbox']], "score": round(float(det['score']), 4),
+                           "category_id": int(det['category_id']), "label": str(det['label'])})
+    return counts, serialized
+
+
+# --- 新路径：转换一次，之后全部向量化 ---
+def batch_path(detections):
+    batch = DetectionBatch.from_dicts(detections, 0, NAMES)
+    batch = batch.filter_scores(THRESHOLD_TABLE).filter_min_area(MIN_AREA)
+    counts = batch.count_by_label()
+    boxes = batch.boxes.astype(np.int32).tolist()  # 绘制前的坐标转换
+    return counts, batch.to_dicts(), boxes
+
+
+def batch_ops_only(batch):
+    """不含转换的开销：后端直接产出数组（如 ONNX 向量化后处理）时的情形。"""
+    batch = batch.filter_scores(THRESHOLD_TABLE).filter_min_area(MIN_AREA)
+    counts = batch.count_by_label()
+    boxes = batch.boxes.astype(np.int32).tolist()
+    return counts, batch.to_dicts(), boxes
+
+
+if __name__ == '__main__':
+    # --- 配置参数 ---
+    BOX_COUNTS = [5, 50, 200, 1000]
+    REPEAT = 5
+
+    rng = np.random.default_rng(0)
+    print("🚀 对比逐框字典路径与 DetectionBatch 数组路径（过滤 + 计数 + 坐标转换 + 序列化）\n")
+    print(f"{'框数':>6} {'字典路径(us)':>14} {'批次路径(us)':>14} {'仅数组操作(us)':>16} {'加速比':>8}")
+    for n in BOX_COUNTS:
+        detections = make_dicts(n, rng)
+        batch = DetectionBatch.from_dicts(detections, 0, NAMES)
+        # 两条路径的结果应一致
+        assert dict_path(detections)[0] == batch_path(detections)[0]
+
+        number = max(20000 // n, 20)
+        t_dict = min(timeit.repeat(lambda: dict_path(detections), number=number, repeat=REPEAT)) / number * 1e6
+        t_batch = min(timeit.repeat(lambda: batch_path(detections), number=number, repeat=REPEAT)) / number * 1e6
+        t_ops = min(timeit.repeat(lambda: batch_ops_only(batch), number=number, repeat=REPEAT)) / number * 1e6
+        print(f"{n:>6} {t_dict:>14.1f} {t_batch:>14.1f} {t_ops:>16.1f} {t_dict / t_batch:>7.2f}x")
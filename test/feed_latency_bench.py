@@ -0,0 +1,126 @@
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+# 允许从项目根目录之外直接运行此脚本
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from app.core.broadcaster import FrameBroadcaster
+from app.core.frame_trace import latency_summary
+
+# 每帧负载的前 8 字节写入“编码完成”时刻的 perf_counter，客户端收到后计算额外延迟
+HEADER = struct.Struct("<d")
+
+
+def build_app(broadcaster: FrameBroadcaster) -> FastAPI:
+    """与 DetectionService.get_stream_feed 相同的推送方式：订阅广播器并逐帧写出 multipart 响应。"""
+    app = FastAPI()
+
+    @app.get("/feed")
+    async def feed():
+        async def frames():
+            subscription = broadcaster.subscribe()
+            try:
+                while True:
+                    frame_bytes = await subscription.next_frame()
+                    if frame_bytes is None:
+                        break
+                    yield (b'--frame\r\n'
+                           b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+            finally:
+                subscription.close()
+
+        return StreamingResponse(frames(), media_type="multipart/x-mixed-replace; boundary=frame")
+
+    return app
+
+
+def publisher(broadcaster: FrameBroadcaster, fps: float, frames: int, payload_size: int, start_event: threading.Event):
+    """模拟后处理线程：按固定帧率发布帧，发布时刻即“编码完成”时刻。"""
+    start_event.wait()
+    padding = b"\xff" * max(payload_size - HEADER.size, 0)
+    interval = 1.0 / fps
+    next_at = time.perf_counter()
+    for _ in range(frames):
+        next_at += interval
+        time.sleep(max(next_at - time.perf_counter(), 0))
+        broadcaster.publish(HEADER.pack(time.perf_counter()) + padding)
+    broadcaster.close()
+
+
+def viewer(url: str, latencies: list, payload_size: int):
+    """逐段读取 multipart 响应，解析每帧负载中的时间戳。"""
+    buffer = b""
+    marker = b"Content-Type: image/jpeg\r\n\r\n"
+    with httpx.stream("GET", url, timeout=30) as response:
+        for chunk in response.iter_raw():
+            received_at = time.perf_counter()
+            buffer += chunk
+            while True:
+                start = buffer.find(marker)
+                if start < 0 or len(buffer) < start + len(marker) + payload_size:
+                    break
+                body = start + len(marker)
+                (encoded_at,) = HEADER.unpack_from(buffer, body)
+                latencies.append(received_at - encoded_at)
+                buffer = buffer[body + payload_size:]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+if __name__ == '__main__':
+    # --- 配置参数 ---
+    VIEWERS = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    FPS = 25.0
+    FRAMES = 250
+    PAYLOAD_SIZE = 64 * 1024  # 约等于一帧 720p JPEG
+
+    broadcaster = FrameBroadcaster(capacity=30)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(build_app(broadcaster), host="127.0.0.1", port=port, log_level="error"))
+    server_thread = threading.Thread(target=server.run, daemon=True)
+    server_thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    print(f"🚀 测量编码完成到客户端收到之间的额外延迟: {VIEWERS} 个观看者, {FPS:g} FPS, {FRAMES} 帧")
+    start_event = threading.Event()
+    results = [[] for _ in range(VIEWERS)]
+    viewers = [threading.Thread(target=viewer, args=(f"http://127.0.0.1:{port}/feed", r, PAYLOAD_SIZE))
+               for r in results]
+    for t in viewers:
+        t.start()
+    # 等待所有观看者完成订阅后再开始发布
+    while broadcaster.subscription_count < VIEWERS:
+        time.sleep(0.01)
+    pub = threading.Thread(target=publisher, args=(broadcaster, FPS, FRAMES, PAYLOAD_SIZE, start_event))
+    pub.start()
+    start_event.set()
+    pub.join()
+    for t in viewers:
+        t.join()
+    server.should_exit = True
+    server_thread.join(timeout=5)
+
+    all_latencies = [v for r in results for v in r]
+    if not all_latencies:
+        print("❌ 未收到任何帧")
+        sys.exit(1)
+    for i, r in enumerate(results):
+        print(f"  观看者 {i}: 收到 {len(r)} 帧")
+    # 与 /stats/latency 和基准测试使用同一个分位数算法
+    summary = latency_summary(all_latencies)
+    print(f"✅ 延迟(ms): p50={summary['p50_ms']:.2f} p95={summary['p95_ms']:.2f} "
+          f"p99={summary['p99_ms']:.2f} max={summary['max_ms']:.2f}")
@@ -0,0 +1,91 @@
+import os
+import sys
+import timeit
+
+# 允许从项目根目录之外直接运行此脚本
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import cv2
+import numpy as np
+
+from app.core.postprocess import decode_yolov8, postprocess_yolov8
+
+NUM_PROPOSALS = 8400  # YOLOv8 640x640 输入的候选框数量
+NUM_CLASSES = 2
+CONF_THRESHOLD = 0.25
+IOU_THRESHOLD = 0.45
+SPURIOUS_PER_FRAME = 50
+
+
+def make_output(batch: int, objects: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    生成形状为 [B, 4 + nc, 8400] 的模拟 YOLOv8 输出：
+    每帧若干个真实目标，每个目标周围有数十个相互重叠的高分候选框，另有少量零散的中等得分误检，其余为低分噪声。
+    """
+    output = np.zeros((batch, 4 + NUM_CLASSES, NUM_PROPOSALS), dtype=np.float32)
+    output[:, 0:2, :] = rng.uniform(0, 640, size=(batch, 2, NUM_PROPOSALS))
+    output[:, 2:4, :] = rng.uniform(4, 64, size=(batch, 2, NUM_PROPOSALS))
+    output[:, 4:, :] = rng.uniform(0.0, 0.1, size=(batch, NUM_CLASSES, NUM_PROPOSALS))
+    for b in range(batch):
+        spurious = rng.choice(NUM_PROPOSALS, size=SPURIOUS_PER_FRAME, replace=False)
+        output[b, 4 + rng.integers(0, NUM_CLASSES), spurious] = rng.uniform(0.25, 0.5, size=SPURIOUS_PER_FRAME)
+        for _ in range(objects):
+            cx, cy = rng.uniform(80, 560, size=2)
+            w, h = rng.uniform(40, 160, size=2)
+            cls = rng.integers(0, NUM_CLASSES)
+            idx = rng.choice(NUM_PROPOSALS, size=40, replace=False)
+            output[b, 0, idx] = cx + rng.normal(0, 3, size=40)
+            output[b, 1, idx] = cy + rng.normal(0, 3, size=40)
+            output[b, 2, idx] = w * rng.uniform(0.9, 1.1, size=40)
+            output[b, 3, idx] = h * rng.uniform(0.9, 1.1, size=40)
+            output[b, 4 + cls, idx] = rng.uniform(0.5, 0.95, size=40)
+    return output
+
+
+def legacy_postprocess(output: np.ndarray):
+    """原 `_postprocess`：逐帧解码，经 Python 列表调用类别无关的 cv2.dnn.NMSBoxes。"""
+    results = []
+    for frame_output in output:
+        predictions = frame_output.T
+        class_scores = predictions[:, 4:]
+        class_ids = np.argmax(class_scores, axis=1)
+        scores = class_scores[np.arange(len(class_ids)), class_ids]
+        keep = scores > CONF_THRESHOLD
+        predictions, scores, class_ids = predictions[keep], scores[keep], class_ids[keep]
+        xy, wh = predictions[:, 0:2], predictions[:, 2:4]
+        boxes = np.concatenate([xy - wh / 2, xy + wh / 2], axis=1)
+        indices = cv2.dnn.NMSBoxes(boxes.tolist(), scores.tolist(), CONF_THRESHOLD, IOU_THRESHOLD)
+        results.append(np.asarray(indices, dtype=np.int64).reshape(-1))
+    return results
+
+
+def check_against_opencv(output: np.ndarray):
+    """按类别 NMS 的结果应与 OpenCV 的 NMSBoxesBatched 一致（框数量相同）。"""
+    ours = postprocess_yolov8(output, CONF_THRESHOLD, IOU_THRESHOLD, max_det=NUM_PROPOSALS)
+    boxes, scores, class_ids, frame_index = decode_yolov8(output, CONF_THRESHOLD)
+    for b, batch in enumerate(ours):
+        sel = frame_index == b
+        xywh = np.concatenate([boxes[sel, :2], boxes[sel, 2:] - boxes[sel, :2]], axis=1)
+        ref = cv2.dnn.NMSBoxesBatched(xywh.tolist(), scores[sel].tolist(), class_ids[sel].tolist(),
+                                      CONF_THRESHOLD, IOU_THRESHOLD)
+        assert len(batch) == len(ref), f"帧 {b}: 本实现 {len(batch)} 个框, OpenCV {len(ref)} 个框"
+
+
+if __name__ == '__main__':
+    # --- 配置参数 ---
+    BATCH_SIZES = [1, 8, 32]
+    OBJECTS_PER_FRAME = 5
+    REPEAT = 5
+
+    rng = np.random.default_rng(0)
+    print(f"🚀 YOLOv8 后处理基准：每帧 {NUM_PROPOSALS} 个候选框，{OBJECTS_PER_FRAME} 个目标\n")
+    print(f"{'批大小':>6} {'旧实现(ms/帧)':>14} {'新实现(ms/帧)':>14} {'加速比':>8}")
+    for batch in BATCH_SIZES:
+        output = make_output(batch, OBJECTS_PER_FRAME, rng)
+        if cv2.__version__ >= "4.7" and hasattr(cv2.dnn, "NMSBoxesBatched"):
+            check_against_opencv(output)
+        number = max(200 // batch, 5)
+        t_old = min(timeit.repeat(lambda: legacy_postprocess(output), number=number, repeat=REPEAT)) / number / batch
+        t_new = min(timeit.repeat(lambda: postprocess_yolov8(output, CONF_THRESHOLD, IOU_THRESHOLD),
+                                  number=number, repeat=REPEAT)) / number / batch
+        print(f"{batch:>6} {t_old * 1000:>14.3f} {t_new * 1000:>14.3f} {t_old / t_new:>7.2f}x")
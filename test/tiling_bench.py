@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+
+# 允许从项目根目录之外直接运行此脚本
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+
+from app.cfg.config import get_app_settings
+from app.core.inference_backend import SyntheticBackend, load_model_input_size
+from app.core.tiling import FrameTiler
+
+
+def bench_tiling(backend: SyntheticBackend, tiler: FrameTiler, frame: np.ndarray, num_frames: int):
+    """
+    与流水线 sync 模式相同的分块推理路径：切图块 -> 一批送入 predict_batch -> 跨图块 NMS 合并。
+    返回 (墙钟秒数, 切块耗时, 合并耗时, 每帧图块数)。
+    """
+    split_s = merge_s = 0.0
+    num_tiles = 0
+    wall_start = time.perf_counter()
+    for frame_id in range(num_frames):
+        t0 = time.perf_counter()
+        tiles = tiler.split(frame)
+        t1 = time.perf_counter()
+        results = [r.results for r in backend.predict_batch((tile, None) for tile in tiles)]
+        t2 = time.perf_counter()
+        tiler.merge(results, frame.shape, frame_id, backend.labels)
+        t3 = time.perf_counter()
+        split_s += t1 - t0
+        merge_s += t3 - t2
+        num_tiles = len(tiles)
+    return time.perf_counter() - wall_start, split_s, merge_s, num_tiles
+
+
+if __name__ == '__main__':
+    # --- 配置参数 ---
+    RESOLUTIONS = [(1920, 1080), (2560, 1440), (3840, 2160)]
+    GRIDS = [(0, 0), (3, 2)]          # (0, 0) 表示按模型输入尺寸自动切分
+    OVERLAP = 0.2
+    NUM_FRAMES = 30
+    SYNTHETIC_LATENCY_MS = 10.0       # 模拟单个图块的设备推理延迟
+
+    settings = get_app_settings()
+    settings.hailo.synthetic_latency_ms = SYNTHETIC_LATENCY_MS
+    settings.hailo.synthetic_detection_rate = 0.5
+    settings.hailo.synthetic_seed = 0
+    backend = SyntheticBackend(settings)
+    tile_size = load_model_input_size(settings)
+
+    print(f"🚀 分块推理基准（合成后端，单图块延迟 {SYNTHETIC_LATENCY_MS}ms，图块边长 {tile_size}，重叠 {OVERLAP}）\n")
+    print(f"{'分辨率':>10} {'网格':>6} {'整帧':>4} {'图块/帧':>7} {'图块/秒':>8} {'帧/秒':>7} "
+          f"{'切块(ms/帧)':>11} {'合并(ms/帧)':>11}")
+    for w, h in RESOLUTIONS:
+        frame = np.random.default_rng(0).integers(0, 255, size=(h, w, 3), dtype=np.uint8)
+        for grid in GRIDS:
+            for full_frame in (True, False):
+                tiler = FrameTiler(tile_size, grid, OVERLAP, full_frame, settings.hailo.iou_threshold)
+                wall, split_s, merge_s, num_tiles = bench_tiling(backend, tiler, frame, NUM_FRAMES)
+                grid_label = "x".join(map(str, tiler.stats()["grid"]))
+                resolution = f"{w}x{h}"
+                print(f"{resolution:>10} {grid_label:>6} {'是' if full_frame else '否':>4} {num_tiles:>7} "
+                      f"{num_tiles * NUM_FRAMES / wall:>8.1f} {NUM_FRAMES / wall:>7.2f} "
+                      f"{split_s / NUM_FRAMES * 1000:>11.2f} {merge_s / NUM_FRAMES * 1000:>11.2f}")
@@ -0,0 +1,72 @@
+import os
+import resource
+import sys
+import time
+
+# 允许从项目根目录之外直接运行此脚本
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.cfg.config import get_app_settings
+from app.core.video_source import create_video_source
+
+
+def _cpu_seconds():
+    """当前进程及已回收子进程（ffmpeg）累计消耗的 CPU 时间。"""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def bench_source(settings, path, source_type, analysis_fps, max_frames):
+    """
+    以尽可能快的速度读取视频源（不做实时节流），按目标分析帧率采样，
+    返回 (实际送出帧数, 墙钟耗时, CPU耗时, 输出分辨率)。
+    """
+    source = create_video_source(settings, path, source_type, analysis_fps)
+    cpu_start, wall_start = _cpu_seconds(), time.perf_counter()
+    source.open()
+
+    delivered, next_due, shape = 0, None, None
+    interval = 1.0 / analysis_fps if analysis_fps > 0 else 0.0
+    while delivered < max_frames and source.grab():
+        pts = source.timestamp()
+        if interval > 0 and next_due is not None and pts < next_due - 1e-3:
+            continue
+        next_due = next_due + interval if next_due is not None and pts - next_due < interval else pts + interval
+        ret, frame = source.retrieve()
+        if ret:
+            delivered += 1
+            shape = frame.shape
+
+    source.release()
+    return delivered, time.perf_counter() - wall_start, _cpu_seconds() - cpu_start, shape
+
+
+if __name__ == '__main__':
+    # --- 配置参数 ---
+    SAMPLE_FILES = sys.argv[1:] or ["./test_1080p.mp4"]  # <<-- 本地样例视频文件
+    ANALYSIS_FPS_LIST = [0, 5]                           # 0 表示分析每一帧
+    SOURCE_TYPES = ["opencv", "ffmpeg"]
+    MAX_FRAMES = 300
+
+    settings = get_app_settings()
+    print("🚀 开始对比 OpenCV 与 FFmpeg 视频源的读帧开销...")
+    print(f"ℹ️ FFmpeg 输出宽度: {settings.app.ffmpeg_scale_width or '源分辨率'}\n")
+
+    for path in SAMPLE_FILES:
+        if not os.path.isfile(path):
+            print(f"❌ 错误: 样例文件不存在 {path}")
+            continue
+        print(f"🔍 {path}")
+        for fps in ANALYSIS_FPS_LIST:
+            for source_type in SOURCE_TYPES:
+                try:
+                    frames, wall, cpu, shape = bench_source(settings, path, source_type, fps, MAX_FRAMES)
+                except RuntimeError as e:
+                    print(f"  ⚠️ {source_type:<7} 分析帧率={fps or '全部'}: 无法运行 ({e})")
+                    continue
+                per_frame_cpu = cpu / frames * 1000 if frames else float("nan")
+                print(f"  {source_type:<7} 分析帧率={fps or '全部':<3} 分辨率={shape[1] if shape else '-'}x"
+                      f"{shape[0] if shape else '-'} 帧数={frames:<4} 墙钟={wall:6.2f}s "
+                      f"CPU={cpu:6.2f}s 每帧CPU={per_frame_cpu:6.2f}ms")
+        print()